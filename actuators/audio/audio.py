@@ -4,6 +4,7 @@ USB音频控制模块
 基于 pi5-usbaudio-tools 项目，提供文字播报功能
 """
 
+import contextvars
 import logging
 import subprocess
 import shlex
@@ -11,7 +12,7 @@ import signal
 import threading
 import time
 import os
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, Callable
 
 logger = logging.getLogger(__name__)
 
@@ -34,6 +35,8 @@ class AudioController:
         # 播报线程与控制
         self._play_thread: Optional[threading.Thread] = None
         self._generation_id: int = 0
+        # 播放开始回调（可选），在播放线程中调用
+        self.on_playback_started: Optional[Callable[[], None]] = None
         
         # 确保音频目录存在
         os.makedirs(self.audio_dir, exist_ok=True)
@@ -44,21 +47,12 @@ class AudioController:
         self.edge_voice = str(config.get('edge_voice', 'zh-CN-XiaoxiaoNeural'))
         self.edge_rate = str(config.get('edge_rate', '+0%'))
         self.edge_volume = str(config.get('edge_volume', '+0%'))
-        try:
-            # 与同目录模块相对导入（audio.py 与 edge_tts_api.py 位于同一目录）
-            from edge_tts_api import EdgeTTSApi  # type: ignore
-        except Exception:
-            # 兼容从包外导入的场景
-            from actuators.audio.edge_tts_api import EdgeTTSApi  # type: ignore
 
         # 后级增益（dB）
         self.gain_db = float(config.get('gain_db', 0.0))
-        self._edge_api = EdgeTTSApi(
-            voice=self.edge_voice,
-            rate=self.edge_rate,
-            volume=self.edge_volume,
-            gain_db=self.gain_db,
-        )
+        # edge_tts/aiohttp/miniaudio/numpy 导入较慢，首次播报或 preload_tts() 时才创建
+        self._edge_api = None
+        self._tts_lock = threading.Lock()
 
         logger.info(
             f"音频控制器初始化完成: card={self.card_index}, control={self.control_name}, tts=edge_tts voice={self.edge_voice}"
@@ -103,6 +97,52 @@ class AudioController:
             logger.error(f"设置音量时发生错误: {e}")
             return False
     
+    def _tts_api(self):
+        """在线 TTS 接口（首次调用时导入并创建）"""
+        with self._tts_lock:
+            if self._edge_api is None:
+                try:
+                    # 与同目录模块相对导入（audio.py 与 edge_tts_api.py 位于同一目录）
+                    from edge_tts_api import EdgeTTSApi  # type: ignore
+                except Exception:
+                    # 兼容从包外导入的场景
+                    from actuators.audio.edge_tts_api import EdgeTTSApi  # type: ignore
+                self._edge_api = EdgeTTSApi(
+                    voice=self.edge_voice,
+                    rate=self.edge_rate,
+                    volume=self.edge_volume,
+                    gain_db=self.gain_db,
+                )
+            return self._edge_api
+
+    def update_tts(self, edge_voice: Optional[str] = None, edge_rate: Optional[str] = None,
+                   edge_volume: Optional[str] = None, gain_db: Optional[float] = None) -> None:
+        """修改在线 TTS 参数（配置热加载），下一次播报起生效"""
+        with self._tts_lock:
+            if edge_voice is not None:
+                self.edge_voice = str(edge_voice)
+            if edge_rate is not None:
+                self.edge_rate = str(edge_rate)
+            if edge_volume is not None:
+                self.edge_volume = str(edge_volume)
+            if gain_db is not None:
+                self.gain_db = float(gain_db)
+            if self._edge_api is not None:
+                self._edge_api.voice = self.edge_voice
+                self._edge_api.rate = self.edge_rate
+                self._edge_api.volume = self.edge_volume
+                self._edge_api.gain_db = self.gain_db
+        logger.info(
+            f"在线TTS参数已更新: voice={self.edge_voice}, rate={self.edge_rate}, volume={self.edge_volume}, gain_db={self.gain_db}"
+        )
+
+    def preload_tts(self) -> None:
+        """提前加载在线 TTS（在后台线程中调用），避免首次播报时等待导入"""
+        try:
+            self._tts_api()
+        except Exception as e:
+            logger.warning(f"预加载在线TTS失败，将在首次播报时重试: {e}")
+
     def _play_text_worker(self, text: str, generation_id: int) -> None:
         """在后台线程中执行文本转音频并播放，避免阻塞MQTT回调线程"""
         try:
@@ -112,7 +152,7 @@ class AudioController:
             import tempfile
             import wave
 
-            audio_data, sample_rate = self._edge_api.sync_text_to_audio(text)  # type: ignore
+            audio_data, sample_rate = self._tts_api().sync_text_to_audio(text)  # type: ignore
             if audio_data is None or sample_rate is None:
                 logger.error("在线TTS转换失败")
                 return
@@ -145,6 +185,8 @@ class AudioController:
                     stderr=subprocess.DEVNULL,
                     start_new_session=True,
                 )
+            if self.on_playback_started is not None:
+                self.on_playback_started()
             logger.info(f"开始播报文字(在线): {text}")
         except Exception as e:
             logger.error(f"后台播放线程异常: {e}")
@@ -168,9 +210,10 @@ class AudioController:
                 self._generation_id += 1
                 generation_id = self._generation_id
 
-            # 启动后台线程执行TTS与播放
+            # 启动后台线程执行TTS与播放（复制调用方上下文，播放回调可读取追踪上下文）
+            context = contextvars.copy_context()
             worker = threading.Thread(
-                target=self._play_text_worker, args=(text, generation_id), daemon=True
+                target=context.run, args=(self._play_text_worker, text, generation_id), daemon=True
             )
             self._play_thread = worker
             worker.start()
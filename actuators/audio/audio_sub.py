@@ -5,74 +5,63 @@
 """
 
 import logging
-import configparser
 import os
 import sys
 from typing import Dict, Any
 
 # 添加项目根目录到路径
 sys.path.append(os.path.join(os.path.dirname(__file__), '..', '..', 'common'))
+import startup_profiler  # 先于其余模块导入，--profile-startup 时统计导入耗时
 
+import config_store
+from config_store import MQTT_COMMON, MQTT_SUBSCRIBER, Option, Schema
 from controller import AudioSubscriber
+from log_setup import setup_logging, load_logging_config
 
-def load_config(config_file: str) -> Dict[str, Any]:
-    """加载配置文件并扁平化为程序需要的键名与类型"""
-    parser = configparser.ConfigParser()
-    parser.read(config_file, encoding='utf-8')
-
-    cfg: Dict[str, Any] = {}
-
-    # MQTT 配置
-    if parser.has_section('mqtt'):
-        cfg['mqtt_broker'] = parser.get('mqtt', 'broker', fallback='localhost')
-        cfg['mqtt_port'] = parser.getint('mqtt', 'port', fallback=1883)
-        cfg['topic_prefix'] = parser.get('mqtt', 'topic_prefix', fallback='actuator')
-
+SCHEMA = Schema('audio', MQTT_COMMON + MQTT_SUBSCRIBER + (
+    Option('topic_prefix', 'mqtt', default='actuator'),
     # 音频配置
-    if parser.has_section('audio'):
-        cfg['card_index'] = parser.getint('audio', 'card_index', fallback=2)
-        cfg['control_name'] = parser.get('audio', 'control_name', fallback='Headphone')
-        cfg['audio_dir'] = parser.get('audio', 'audio_dir', fallback='./tmp')
-        # 在线 TTS 配置（强制在线）
-        cfg['edge_voice'] = parser.get('audio', 'edge_voice', fallback='zh-CN-XiaoxiaoNeural')
-        cfg['edge_rate'] = parser.get('audio', 'edge_rate', fallback='+0%')
-        cfg['edge_volume'] = parser.get('audio', 'edge_volume', fallback='+0%')
-        # 后级增益（dB）
-        try:
-            cfg['gain_db'] = parser.getfloat('audio', 'gain_db', fallback=0.0)
-        except ValueError:
-            cfg['gain_db'] = 0.0
+    Option('card_index', 'audio', type=int, default=2),
+    Option('control_name', 'audio', default='Headphone'),
+    Option('audio_dir', 'audio', default='./tmp'),
+    # 在线 TTS 配置（强制在线）
+    Option('edge_voice', 'audio', default='zh-CN-XiaoxiaoNeural'),
+    Option('edge_rate', 'audio', default='+0%'),
+    Option('edge_volume', 'audio', default='+0%'),
+    # 后级增益（dB）
+    Option('gain_db', 'audio', type=float, default=0.0),
+))
 
-    return cfg
+def load_config(config_file: str) -> Dict[str, Any]:
+    """加载配置文件并扁平化为程序需要的键名与类型"""
+    return config_store.load_config(config_file, SCHEMA)
 
-def setup_logging():
-    """设置日志配置"""
-    logging.basicConfig(
-        level=logging.INFO,
-        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-        handlers=[
-            logging.StreamHandler(),
-            logging.FileHandler('audio_actuator.log', encoding='utf-8')
-        ]
-    )
+def create_module(config_file: str, **overrides) -> AudioSubscriber:
+    """创建订阅者实例（供模块宿主以插件方式加载）"""
+    config = load_config(config_file)
+    config.update(overrides)
+    return AudioSubscriber(config)
 
 def main():
     """主函数"""
-    setup_logging()
+    profiler = startup_profiler.StartupProfiler('audio')
+    config_file = os.path.join(os.path.dirname(__file__), 'config.ini')
+    setup_logging(**load_logging_config(config_file))
     logger = logging.getLogger(__name__)
     
     try:
         # 加载配置
-        config_file = os.path.join(os.path.dirname(__file__), 'config.ini')
         config = load_config(config_file)
+        profiler.mark('读取配置')
         
         logger.info("音频执行器启动中...")
         
         # 创建音频订阅者
         subscriber = AudioSubscriber(config)
+        profiler.mark('创建模块')
         
         # 运行订阅者
-        subscriber.run()
+        profiler.run(subscriber, subscriber.run)
         
     except KeyboardInterrupt:
         logger.info("收到中断信号，正在退出...")
@@ -3,6 +3,7 @@
 import logging
 import os
 import sys
+import threading
 from typing import Dict, Any
 
 sys.path.append(os.path.join(os.path.dirname(__file__), '..', '..', 'common'))
@@ -14,6 +15,10 @@ logger = logging.getLogger(__name__)
 class AudioSubscriber(MQTTSubscriber):
     """订阅控制音频的MQTT消息"""
     
+    # 在线 TTS 参数：下一次播报起生效
+    TTS_CONFIG = ('edge_voice', 'edge_rate', 'edge_volume', 'gain_db')
+    RELOADABLE_CONFIG = MQTTSubscriber.RELOADABLE_CONFIG | set(TTS_CONFIG)
+    
     def __init__(self, config: Dict[str, Any]):
         super().__init__(config)
         
@@ -21,56 +26,71 @@ class AudioSubscriber(MQTTSubscriber):
         audio_conf = {
             'card_index': config.get('card_index', 2),
             'control_name': config.get('control_name', 'Headphone'),
-            'audio_dir': config.get('audio_dir', './tmp'),
+            'audio_dir': self.resolve_path(config.get('audio_dir', './tmp')),
+            'edge_voice': config.get('edge_voice', 'zh-CN-XiaoxiaoNeural'),
+            'edge_rate': config.get('edge_rate', '+0%'),
+            'edge_volume': config.get('edge_volume', '+0%'),
             'gain_db': config.get('gain_db', 0.0),
         }
         
         # 实例化音频控制器
         self.audio = AudioController(audio_conf)
+        # aplay 启动时记录输出（按键 → 声音），在播放线程中执行，追踪上下文由 speak_text 带入
+        self.audio.on_playback_started = lambda: self.tracer.mark('audio.play')
         
         # 订阅音频控制主题
-        self.add_subscription(f"{self.topic_prefix}/audio")
+        control_topic = f"{self.topic_prefix}/audio"
+        self.add_subscription(control_topic)
+        self.register_handler(control_topic, self._on_set_volume, field='action', value='set_volume')
+        self.register_handler(control_topic, self._on_speak, field='action', value='speak')
+        self.register_handler(control_topic, self._on_stop, field='action', value='stop')
+        self.register_handler(control_topic, self._on_unknown_action, field='action')
         logger.info("音频订阅者初始化完成")
 
-    def on_message(self, client, userdata, msg):
-        """提升可观测性：打印收到的原始消息"""
-        try:
-            payload_preview = msg.payload.decode('utf-8', errors='ignore')
-        except Exception:
-            payload_preview = str(msg.payload)
-        logger.info(f"收到消息: {msg.topic} -> {payload_preview}")
-        super().on_message(client, userdata, msg)
+    def apply_config(self, changes: Dict[str, Any]):
+        """热加载在线 TTS 参数"""
+        super().apply_config(changes)
+        tts = {key: value for key, value in changes.items() if key in self.TTS_CONFIG}
+        if tts:
+            self.audio.update_tts(**tts)
+
+    def on_startup_event(self, event: str):
+        """订阅完成后在后台预加载在线TTS，不推迟订阅"""
+        super().on_startup_event(event)
+        if event == 'subscribed':
+            threading.Thread(target=self.audio.preload_tts, name='tts-preload', daemon=True).start()
+
+    def _on_set_volume(self, topic: str, payload: Dict[str, Any]):
+        """设置音量"""
+        params = payload.get('params', {})
+        volume = params.get('volume')
+        if volume is not None:
+            logger.debug("准备设置音量: %s", volume)
+            success = self.audio.set_volume(int(volume))
+            self.tracer.mark('audio.volume')
+            logger.info("设置音量: %s%% - %s", volume, '成功' if success else '失败')
+        else:
+            logger.warning("设置音量缺少volume参数")
     
-    def handle_message(self, topic: str, payload: Dict[str, Any]):
-        """处理音频控制消息"""
-        action = payload.get('action')
+    def _on_speak(self, topic: str, payload: Dict[str, Any]):
+        """播报文字"""
         params = payload.get('params', {})
-        logger.info(f"解析消息 action={action}, params={params}")
-        
-        if action == 'set_volume':
-            volume = params.get('volume')
-            if volume is not None:
-                logger.info(f"准备设置音量: {volume}")
-                success = self.audio.set_volume(int(volume))
-                logger.info(f"设置音量: {volume}% - {'成功' if success else '失败'}")
-            else:
-                logger.warning("设置音量缺少volume参数")
-        
-        elif action == 'speak':
-            text = params.get('text')
-            if text:
-                logger.info(f"准备播报: {text}")
-                success = self.audio.speak_text(str(text))
-                logger.info(f"播报文字: {text} - {'成功' if success else '失败'}")
-            else:
-                logger.warning("播报文字缺少text参数")
-        
-        elif action == 'stop':
-            success = self.audio.stop_audio()
-            logger.info(f"停止播报 - {'成功' if success else '失败'}")
-        
+        text = params.get('text')
+        if text:
+            logger.debug("准备播报: %s", text)
+            success = self.audio.speak_text(str(text))
+            logger.info("播报文字: %s - %s", text, '成功' if success else '失败')
         else:
-            logger.warning(f"未知音频指令: {action}")
+            logger.warning("播报文字缺少text参数")
+    
+    def _on_stop(self, topic: str, payload: Dict[str, Any]):
+        """停止播报"""
+        success = self.audio.stop_audio()
+        logger.info("停止播报 - %s", '成功' if success else '失败')
+    
+    def _on_unknown_action(self, topic: str, payload: Dict[str, Any]):
+        """未知指令"""
+        logger.warning("未知音频指令: %s", payload.get('action'))
     
     def stop(self):
         """停止音频订阅者"""
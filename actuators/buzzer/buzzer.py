@@ -4,19 +4,21 @@ import time
 import threading
 from typing import Optional
 from interface import BuzzerInterface
+from lazy_import import lazy_import
 
 try:
-    from gpiozero import Buzzer
+    # gpiozero 导入较慢，创建蜂鸣器时才加载
+    gpiozero = lazy_import('gpiozero')
 except ImportError:  # 在没有硬件的环境下兼容
-    Buzzer = None
+    gpiozero = None
 
 class SimpleBuzzer(BuzzerInterface):
     """简单蜂鸣器控制类"""
 
     def __init__(self, pin: int):
-        if Buzzer is None:
+        if gpiozero is None:
             raise RuntimeError("未安装gpiozero库，无法控制蜂鸣器")
-        self.buzzer = Buzzer(pin)
+        self.buzzer = gpiozero.Buzzer(pin)
         self._running = False
         self._thread: Optional[threading.Thread] = None
 
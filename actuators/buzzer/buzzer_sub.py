@@ -1,25 +1,34 @@
 # -*- coding: utf-8 -*-
 """蜂鸣器 MQTT 订阅主程序"""
 import logging
+import os
 import sys
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', '..', 'common'))
+import startup_profiler  # 先于其余模块导入，--profile-startup 时统计导入耗时
+
 from config import ConfigManager
 from controller import BuzzerSubscriber
+from log_setup import setup_logging, load_logging_config
 
-def setup_logging() -> None:
-    logging.basicConfig(
-        level=logging.INFO,
-        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
-    )
+def create_module(config_file: str = "config.ini", **overrides) -> BuzzerSubscriber:
+    """创建订阅者实例（供模块宿主以插件方式加载）"""
+    config = ConfigManager(config_file).get_all_config()
+    config.update(overrides)
+    return BuzzerSubscriber(config)
 
 def main():
+    profiler = startup_profiler.StartupProfiler('buzzer')
     try:
         config_manager = ConfigManager()
         config = config_manager.get_all_config()
-        setup_logging()
+        setup_logging(**load_logging_config(config_manager.config_file))
         logger = logging.getLogger(__name__)
+        profiler.mark('读取配置')
         logger.info("启动蜂鸣器订阅者...")
         subscriber = BuzzerSubscriber(config)
-        subscriber.run()
+        profiler.mark('创建模块')
+        profiler.run(subscriber, subscriber.run)
     except FileNotFoundError as e:
         print(f"配置文件错误: {e}")
         sys.exit(1)
@@ -13,6 +13,8 @@ logger = logging.getLogger(__name__)
 
 class BuzzerSubscriber(MQTTSubscriber):
     """订阅控制蜂鸣器的MQTT消息"""
+    RELOADABLE_CONFIG = MQTTSubscriber.RELOADABLE_CONFIG | {'beep_duration', 'repeat'}
+
     def __init__(self, config: Dict[str, Any]):
         super().__init__(config)
         buzzer_conf = {
@@ -23,23 +25,33 @@ class BuzzerSubscriber(MQTTSubscriber):
         self.buzzer = SimpleBuzzer(buzzer_conf['pin'])
         self.beep_duration = buzzer_conf['beep_duration']
         self.repeat = buzzer_conf['repeat']
-        self.add_subscription(f"{self.topic_prefix}/buzzer")
+        control_topic = f"{self.topic_prefix}/buzzer"
+        self.add_subscription(control_topic)
+        self.register_handler(control_topic, self._on_beep, field='action', value=True)
+        self.register_handler(control_topic, self._on_stop, field='action', value=False)
+        self.register_handler(control_topic, self._on_unknown_action, field='action')
         logger.info("Buzzer订阅者初始化完成")
 
-    def handle_message(self, topic: str, payload: Dict[str, Any]):
-        action = payload.get('action')
-        if action is True:
-            params = payload.get('params', {})
-            interval = float(params.get('interval', self.beep_duration))
-            times = int(params.get('times', self.repeat))
-            logger.info(
-                f"执行蜂鸣指令: interval={interval}, times={times}")
-            self.buzzer.beep_async(duration=interval, repeat=times)
-        elif action is False:
-            logger.info("停止蜂鸣指令")
-            self.buzzer.stop()
-        else:
-            logger.warning(f"未知指令: {payload}")
+    def apply_config(self, changes: Dict[str, Any]):
+        """热加载默认蜂鸣参数"""
+        super().apply_config(changes)
+        self.beep_duration = changes.get('beep_duration', self.beep_duration)
+        self.repeat = changes.get('repeat', self.repeat)
+
+    def _on_beep(self, topic: str, payload: Dict[str, Any]):
+        params = payload.get('params', {})
+        interval = float(params.get('interval', self.beep_duration))
+        times = int(params.get('times', self.repeat))
+        logger.info(
+            f"执行蜂鸣指令: interval={interval}, times={times}")
+        self.buzzer.beep_async(duration=interval, repeat=times)
+
+    def _on_stop(self, topic: str, payload: Dict[str, Any]):
+        logger.info("停止蜂鸣指令")
+        self.buzzer.stop()
+
+    def _on_unknown_action(self, topic: str, payload: Dict[str, Any]):
+        logger.warning(f"未知指令: {payload}")
 
     def stop(self):
         super().stop()
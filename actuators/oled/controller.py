@@ -3,16 +3,18 @@
 OLED 订阅者模块 - 接收manager控制消息
 """
 import logging
-import json
-import time
+import os
+import sys
 import threading
-import paho.mqtt.client as mqtt
+from typing import Dict, Any
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', '..', 'common'))
+from mqtt_base import MQTTSubscriber
 from oled import OLEDDisplay
 
-class OLEDSubscriber:
+class OLEDSubscriber(MQTTSubscriber):
     def __init__(self, config):
-        self.broker = config['broker']
-        self.port = config['port']
+        super().__init__(config)
         self.control_topic = config['topic']  # 控制消息topic
         self.oled = OLEDDisplay(
             i2c_port=config['i2c_port'],
@@ -21,15 +23,8 @@ class OLEDSubscriber:
             width=config['width'],
             height=config['height']
         )
-        self.client = mqtt.Client()
-        self.client.on_connect = self.on_connect
-        self.client.on_message = self.on_message
         self.logger = logging.getLogger(__name__)
         
-        # 保存最新数据
-        self.latest_temperature = None
-        self.latest_humidity = None
-        
         # 设置小猫眨眼回调，用于重新绘制分屏显示
         self.oled.set_blink_callback(self._redraw_split_display)
         
@@ -38,16 +33,41 @@ class OLEDSubscriber:
         self.time_timer = None       # 时间显示定时器
         self.time_update_interval = 1  # 时间更新间隔1秒
         self.default_timer = None    # 恢复默认界面定时器
+        
+        # 最近一次有效的温湿度（只在校验通过后更新）；启用最新值缓存时用快照中的有效读数预热
+        self.latest_temperature = None
+        self.latest_humidity = None
+        self._warm_start_temperature_humidity()
+        
+        # 订阅控制主题并按 action 注册处理器
+        self.add_subscription(self.control_topic)
+        self.register_handler(self.control_topic, self._on_switch_to_temperature,
+                              field='action', value='switch_to_temperature')
+        self.register_handler(self.control_topic, self._on_switch_to_default,
+                              field='action', value='switch_to_default')
+        self.register_handler(self.control_topic, self._on_update_temperature_humidity,
+                              field='action', value='update_temperature_humidity')
+        self.register_handler(self.control_topic, self._on_unknown_action, field='action')
 
-    def on_connect(self, client, userdata, flags, rc):
+    def _warm_start_temperature_humidity(self):
+        """从最新值缓存（重启前的快照）取温湿度，缓存中的最近一条无效时不使用"""
+        if self.last_values is None:
+            return
+        entry = self.last_values.get(self.control_topic, 'update_temperature_humidity')
+        if entry is None:
+            return
+        temperature = entry.params.get('temperature')
+        humidity = entry.params.get('humidity')
+        if temperature is not None and humidity is not None:
+            self.latest_temperature = temperature
+            self.latest_humidity = humidity
+
+    def on_connect(self, client, userdata, flags, rc, properties=None):
+        super().on_connect(client, userdata, flags, rc, properties)
         if rc == 0:
-            self.logger.info("MQTT连接成功，订阅控制主题: %s", self.control_topic)
-            client.subscribe(self.control_topic)
             # 初始显示时间（默认无人状态）
             self.oled.show_time()
             self._start_time_display()
-        else:
-            self.logger.error("MQTT连接失败，返回码: %s", rc)
     
     def _start_time_display(self):
         """启动时间显示定时器（每秒更新）"""
@@ -77,77 +97,69 @@ class OLEDSubscriber:
             self.time_timer.cancel()
             self.time_timer = None
 
-    def on_message(self, client, userdata, msg):
-        try:
-            payload = json.loads(msg.payload.decode('utf-8'))
-            topic = msg.topic
-            
-            if topic == self.control_topic:
-                # 处理控制消息
-                action = payload.get('action')
-                params = payload.get('params', {})
-                
-                self.logger.info(f"收到OLED控制消息: {action} - {params}")
-                
-                if action == 'switch_to_temperature':
-                    # 切换到温湿度显示模式
-                    self.show_temp_mode = True
-                    self._stop_time_display()  # 停止时间显示
-                    self.oled.start_cat_animation()  # 开始小猫眼睛闪烁动画
-                    
-                    # 如果有最新的温湿度数据，立即显示
-                    if self.latest_temperature is not None and self.latest_humidity is not None:
-                        self.oled.show_split_display(self.latest_temperature, self.latest_humidity)
-                        self.logger.info(f"切换到温湿度显示模式: {self.latest_temperature}°C, {self.latest_humidity}%")
-                    else:
-                        self.logger.info("切换到温湿度显示模式，等待数据...")
-                    
-                    # 设置定时器恢复到默认界面
-                    duration = params.get('duration', 600)  # 默认10分钟
-                    if duration > 0:
-                        # 取消之前的定时器（如果存在）
-                        if self.default_timer:
-                            self.default_timer.cancel()
-                            self.logger.debug("取消之前的恢复默认界面定时器")
-                        
-                        # 创建新的定时器
-                        self.default_timer = threading.Timer(duration, self._switch_to_default)
-                        self.default_timer.start()
-                        self.logger.info(f"设置 {duration} 秒后恢复默认界面")
-                    
-                elif action == 'switch_to_default':
-                    # 切换到默认界面（时间显示）
-                    self.show_temp_mode = False
-                    self._stop_time_display()  # 停止时间显示
-                    self.oled.stop_cat_animation()  # 停止小猫眼睛闪烁
-                    self.oled.show_time()
-                    self._start_time_display()  # 开始时间显示定时器
-                    self.logger.info("切换到默认界面（时间显示）")
-                    
-                elif action == 'update_temperature_humidity':
-                    # 显示温湿度数据
-                    temperature = params.get('temperature')
-                    humidity = params.get('humidity')
-                    
-                    if temperature is not None and humidity is not None:
-                        self.latest_temperature = temperature
-                        self.latest_humidity = humidity
-                        
-                        if self.show_temp_mode:
-                            self.oled.show_split_display(temperature, humidity)
-                            self.logger.info(f"更新温湿度显示: {temperature}°C, {humidity}%")
-                        else:
-                            self.logger.debug(f"收到温湿度数据但不在显示模式: {temperature}°C, {humidity}%")
-                    else:
-                        self.logger.warning(f"温湿度数据无效: {params}")
-                        
-                else:
-                    self.logger.warning(f"未知的OLED控制动作: {action}")
+    def _on_switch_to_temperature(self, topic: str, payload: Dict[str, Any]):
+        """切换到温湿度显示模式"""
+        params = payload.get('params', {})
+        self.logger.debug("收到OLED控制消息: switch_to_temperature - %s", params)
+        
+        self.show_temp_mode = True
+        self._stop_time_display()  # 停止时间显示
+        self.oled.start_cat_animation()  # 开始小猫眼睛闪烁动画
+        
+        # 如果有最新的温湿度数据，立即显示
+        if self.latest_temperature is not None and self.latest_humidity is not None:
+            self.oled.show_split_display(self.latest_temperature, self.latest_humidity)
+            # 画面已刷新到屏幕（运动 → 像素）；等待数据时没有绘制，不计入
+            self.tracer.mark('oled.render')
+            self.logger.info("切换到温湿度显示模式: %s°C, %s%%", self.latest_temperature, self.latest_humidity)
+        else:
+            self.logger.info("切换到温湿度显示模式，等待数据...")
+        
+        # 设置定时器恢复到默认界面；duration 为 0 时保持温湿度界面，直到下一条 switch_to_temperature 或 switch_to_default
+        duration = params.get('duration', 600)  # 默认10分钟
+        # 取消之前的定时器（如果存在）
+        if self.default_timer:
+            self.default_timer.cancel()
+            self.default_timer = None
+            self.logger.debug("取消之前的恢复默认界面定时器")
+        if duration > 0:
+            # 创建新的定时器
+            self.default_timer = threading.Timer(duration, self._switch_to_default)
+            self.default_timer.start()
+            self.logger.info("设置 %s 秒后恢复默认界面", duration)
+    
+    def _on_switch_to_default(self, topic: str, payload: Dict[str, Any]):
+        """切换到默认界面（时间显示）"""
+        self.logger.debug("收到OLED控制消息: switch_to_default - %s", payload.get('params', {}))
+        self.show_temp_mode = False
+        self._stop_time_display()  # 停止时间显示
+        self.oled.stop_cat_animation()  # 停止小猫眼睛闪烁
+        self.oled.show_time()
+        self._start_time_display()  # 开始时间显示定时器
+        self.logger.info("切换到默认界面（时间显示）")
+    
+    def _on_update_temperature_humidity(self, topic: str, payload: Dict[str, Any]):
+        """更新温湿度数据"""
+        params = payload.get('params', {})
+        self.logger.debug("收到OLED控制消息: update_temperature_humidity - %s", params)
+        temperature = params.get('temperature')
+        humidity = params.get('humidity')
+        
+        if temperature is not None and humidity is not None:
+            self.latest_temperature = temperature
+            self.latest_humidity = humidity
+            if self.show_temp_mode:
+                self.oled.show_split_display(temperature, humidity)
+                self.tracer.mark('oled.render')
+                self.logger.debug("更新温湿度显示: %s°C, %s%%", temperature, humidity)
             else:
-                self.logger.warning(f"收到未知topic的消息: {topic}")
-                
-        except Exception as e:
-            self.logger.error(f"处理消息时出错: {e}")
+                self.logger.debug("收到温湿度数据但不在显示模式: %s°C, %s%%", temperature, humidity)
+        else:
+            self.logger.warning("温湿度数据无效: %s", params)
+    
+    def _on_unknown_action(self, topic: str, payload: Dict[str, Any]):
+        """未知动作"""
+        self.logger.warning("未知的OLED控制动作: %s", payload.get('action'))
     
     def _switch_to_default(self):
         """切换到默认界面"""
@@ -165,19 +177,18 @@ class OLEDSubscriber:
 
     def run(self):
         self.logger.info("启动OLED订阅者...")
-        try:
-            self.client.connect(self.broker, self.port, 60)
-            self.client.loop_forever()
-        except KeyboardInterrupt:
-            self.logger.info("收到键盘中断信号")
-        finally:
-            # 清理所有定时器
-            if self.time_timer:
-                self.time_timer.cancel()
-                self.logger.info("已取消时间显示定时器")
-            if self.default_timer:
-                self.default_timer.cancel()
-                self.logger.info("已取消恢复默认界面定时器")
-            self.oled.stop_cat_animation()  # 停止小猫眼睛闪烁
-            self.client.disconnect()
-            self.logger.info("OLED订阅者已停止") 
\ No newline at end of file
+        super().run()
+
+    def stop(self):
+        """停止OLED订阅者，清理所有定时器"""
+        if self.time_timer:
+            self.time_timer.cancel()
+            self.time_timer = None
+            self.logger.info("已取消时间显示定时器")
+        if self.default_timer:
+            self.default_timer.cancel()
+            self.default_timer = None
+            self.logger.info("已取消恢复默认界面定时器")
+        self.oled.stop_cat_animation()  # 停止小猫眼睛闪烁
+        super().stop()
+        self.logger.info("OLED订阅者已停止")
@@ -2,20 +2,26 @@
 """
 OLED 显示控制模块
 """
-from luma.core.interface.serial import i2c
-from luma.oled.device import sh1106, ssd1306
-from PIL import ImageFont, ImageDraw, Image
 import datetime
 import threading
 import time
 
+from lazy_import import lazy_import
+
+# luma 与 PIL 导入较慢，首次使用时才加载
+luma_serial = lazy_import('luma.core.interface.serial')
+luma_device = lazy_import('luma.oled.device')
+Image = lazy_import('PIL.Image')
+ImageDraw = lazy_import('PIL.ImageDraw')
+ImageFont = lazy_import('PIL.ImageFont')
+
 class OLEDDisplay:
     def __init__(self, i2c_port, address, driver, width, height, font_path=None):
-        serial = i2c(port=i2c_port, address=address)
+        serial = luma_serial.i2c(port=i2c_port, address=address)
         if driver == "sh1106":
-            self.device = sh1106(serial, width=width, height=height)
+            self.device = luma_device.sh1106(serial, width=width, height=height)
         else:
-            self.device = ssd1306(serial, width=width, height=height)
+            self.device = luma_device.ssd1306(serial, width=width, height=height)
         self.width = width
         self.height = height
         self.font = ImageFont.truetype(font_path or "/usr/share/fonts/truetype/wqy/wqy-zenhei.ttc", 18)
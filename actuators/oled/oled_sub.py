@@ -3,25 +3,34 @@
 OLED 显示主程序
 """
 import logging
+import os
 import sys
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', '..', 'common'))
+import startup_profiler  # 先于其余模块导入，--profile-startup 时统计导入耗时
+
 from config import ConfigManager
 from controller import OLEDSubscriber
+from log_setup import setup_logging, load_logging_config
 
-def setup_logging():
-    logging.basicConfig(
-        level=logging.INFO,
-        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
-    )
+def create_module(config_file: str = "config.ini", **overrides) -> OLEDSubscriber:
+    """创建订阅者实例（供模块宿主以插件方式加载）"""
+    config = ConfigManager(config_file).get_all_config()
+    config.update(overrides)
+    return OLEDSubscriber(config)
 
 def main():
+    profiler = startup_profiler.StartupProfiler('oled')
     try:
         config_manager = ConfigManager()
         config = config_manager.get_all_config()
-        setup_logging()
+        setup_logging(**load_logging_config(config_manager.config_file))
         logger = logging.getLogger(__name__)
+        profiler.mark('读取配置')
         logger.info("启动OLED显示订阅者...")
         subscriber = OLEDSubscriber(config)
-        subscriber.run()
+        profiler.mark('创建模块')
+        profiler.run(subscriber, subscriber.run)
     except FileNotFoundError as e:
         print(f"配置文件错误: {e}")
         sys.exit(1)
@@ -0,0 +1,324 @@
+# -*- coding: utf-8 -*-
+"""
+MQTT 基类与业务管理器的微基准测试
+使用进程内假代理（common/fake_broker.py），不需要 mosquitto。
+
+用法:
+    python3 bench_mqtt.py                      # 运行全部基准，并与 baseline.json 比较（存在时）
+    python3 bench_mqtt.py --save               # 运行并保存为新的基线
+    python3 bench_mqtt.py -k publish           # 只运行名称包含 publish 的基准
+    python3 bench_mqtt.py --threshold 0.3      # 单次耗时超过基线 30% 视为回退
+
+存在回退时退出码为 1，可在部署前的检查脚本中使用。
+"""
+
+import argparse
+import json
+import logging
+import os
+import platform
+import statistics
+import sys
+import time
+from typing import Any, Callable, Dict, List, Tuple
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_ROOT = os.path.join(BENCH_DIR, '..')
+sys.path.append(os.path.join(REPO_ROOT, 'common'))
+sys.path.append(os.path.join(REPO_ROOT, 'manager', 'oled_manager'))
+sys.path.append(os.path.join(REPO_ROOT, 'manager', 'auto_screen_switch_manager'))
+
+from fake_broker import FakeBroker, FakeClient, FakeMessage
+from mqtt_base import MQTTBase, MQTTSubscriber
+
+DEFAULT_BASELINE = os.path.join(BENCH_DIR, 'baseline.json')
+
+# 基准注册表：名称 -> setup 函数，setup 返回 (操作, 清理函数)
+BENCHMARKS: Dict[str, Callable[[], Tuple[Callable[[], Any], Callable[[], None]]]] = {}
+
+
+def benchmark(name: str):
+    def register(setup):
+        BENCHMARKS[name] = setup
+        return setup
+    return register
+
+
+# ---- 公共环境 ----
+
+def make_config(broker: FakeBroker, **overrides) -> Dict[str, Any]:
+    config = {
+        'mqtt_client': FakeClient(broker),
+        'install_signal_handlers': False,
+        'sensor_id': 'bench',
+        'module_name': 'bench',
+        'status_topic_prefix': '',
+    }
+    config.update(overrides)
+    return config
+
+
+def start(*modules: MQTTBase) -> Callable[[], None]:
+    """连接并等待 CONNACK/订阅完成，返回清理函数"""
+    for module in modules:
+        module.connect()
+    deadline = time.monotonic() + 5.0
+    while not all(m.client.is_connected() for m in modules):
+        if time.monotonic() > deadline:
+            raise RuntimeError("假代理连接超时")
+        time.sleep(0.01)
+    # 等待 SUBACK 回调
+    time.sleep(0.2)
+
+    def teardown():
+        for module in modules:
+            module.stop()
+    return teardown
+
+
+class NullSubscriber(MQTTSubscriber):
+    """空处理器订阅者，作为管道末端"""
+
+    def __init__(self, config: Dict[str, Any], topic: str):
+        super().__init__(config)
+        self.received = 0
+        self.add_subscription(topic)
+        self.register_handler(topic, self._on_message)
+
+    def _on_message(self, topic: str, payload: Dict[str, Any]):
+        self.received += 1
+
+
+def json_message(topic: str, message: Dict[str, Any]) -> FakeMessage:
+    return FakeMessage(topic, json.dumps(message).encode('utf-8'), qos=1)
+
+
+# ---- 发布端 ----
+
+@benchmark('publish_message.json')
+def bench_publish_message():
+    broker = FakeBroker()
+    base = MQTTBase(make_config(broker))
+    teardown = start(base)
+    message = {'action': 'switch_to_temperature', 'params': {'message': 'Motion Detected!', 'duration': 600}}
+    return lambda: base.publish_message('actuator/oled', message, qos=1), teardown
+
+
+@benchmark('publish_message.queue')
+def bench_publish_message_queue():
+    broker = FakeBroker()
+    base = MQTTBase(make_config(broker, publish_queue=True, publish_queue_size=100000))
+    teardown = start(base)
+    message = {'action': 'set_volume', 'params': {'volume': 50}}
+    return lambda: base.publish_message('actuator/audio', message, qos=1, coalesce_key='volume'), teardown
+
+
+@benchmark('publish_sensor_data.json')
+def bench_publish_sensor_data():
+    broker = FakeBroker()
+    base = MQTTBase(make_config(broker, sensor_type='temperature_humidity'))
+    teardown = start(base)
+    data = {'temperature': 23.4, 'humidity': 45.6}
+    return lambda: base.publish_sensor_data(data, retain=True), teardown
+
+
+@benchmark('publish_sensor_data.compact')
+def bench_publish_sensor_data_compact():
+    broker = FakeBroker()
+    base = MQTTBase(make_config(broker, sensor_type='temperature_humidity', payload_codec='compact'))
+    teardown = start(base)
+    data = {'temperature': 23.4, 'humidity': 45.6}
+    return lambda: base.publish_sensor_data(data, retain=True), teardown
+
+
+# ---- 订阅端 ----
+
+@benchmark('on_message.route')
+def bench_on_message_route():
+    broker = FakeBroker()
+    sub = MQTTSubscriber(make_config(broker))
+    sub.add_subscription('actuator/oled')
+    sub.register_handler('actuator/oled', lambda t, p: None, field='action', value='update_temperature_humidity')
+    teardown = start(sub)
+    msg = json_message('actuator/oled', {'action': 'update_temperature_humidity',
+                                         'params': {'temperature': 23.4, 'humidity': 45.6, 'timestamp': time.time()}})
+    return lambda: sub.on_message(sub.client, None, msg), teardown
+
+
+@benchmark('on_message.unrouted')
+def bench_on_message_unrouted():
+    broker = FakeBroker()
+    sub = MQTTSubscriber(make_config(broker))
+    sub.add_subscription('actuator/audio')
+    sub.register_handler('actuator/audio', lambda t, p: None, field='action', value='speak')
+    teardown = start(sub)
+    msg = json_message('actuator/audio', {'action': 'set_volume', 'params': {'volume': 50}})
+    return lambda: sub.on_message(sub.client, None, msg), teardown
+
+
+# ---- 业务管理器 ----
+
+@benchmark('oled_manager.pir_motion')
+def bench_oled_manager_pir():
+    from oled_manager import OLEDManager
+    broker = FakeBroker()
+    manager = OLEDManager(make_config(broker, module_name='oled_manager', topic_prefix='sensor'))
+    teardown = start(manager)
+    msg = json_message('sensor/pir_motion/bench', {'type': 'pir_motion', 'params': {'motion_detected': True},
+                                                   'timestamp': int(time.time())})
+    return lambda: manager.on_message(manager.client, None, msg), teardown
+
+
+@benchmark('oled_manager.temperature_humidity')
+def bench_oled_manager_temperature():
+    from oled_manager import OLEDManager
+    broker = FakeBroker()
+    manager = OLEDManager(make_config(broker, module_name='oled_manager', topic_prefix='sensor'))
+    teardown = start(manager)
+    msg = json_message('sensor/temperature_humidity/bench',
+                       {'type': 'temperature_humidity', 'params': {'temperature': 23.4, 'humidity': 45.6},
+                        'timestamp': int(time.time())})
+    return lambda: manager.on_message(manager.client, None, msg), teardown
+
+
+@benchmark('auto_screen_switch.pir_motion')
+def bench_auto_screen_switch_pir():
+    from auto_screen_switch_manager import AutoScreenSwitchManager
+    broker = FakeBroker()
+    manager = AutoScreenSwitchManager(make_config(broker, module_name='auto_screen_switch', topic_prefix='sensor'))
+    teardown = start(manager)
+    msg = json_message('sensor/pir_motion/bench', {'type': 'pir_motion', 'params': {'motion_detected': True},
+                                                   'timestamp': int(time.time())})
+    return lambda: manager.on_message(manager.client, None, msg), teardown
+
+
+# ---- 端到端管道 ----
+
+@benchmark('pipeline.pir_to_oled')
+def bench_pipeline_pir_to_oled():
+    """PIR 发布 → 假代理 → OLED管理器 → 假代理 → OLED 订阅端（空处理器）"""
+    from oled_manager import OLEDManager
+    broker = FakeBroker()
+    pir = MQTTBase(make_config(broker, module_name='pir', sensor_type='pir_motion', flat_topic_mirror=False))
+    manager = OLEDManager(make_config(broker, module_name='oled_manager', topic_prefix='sensor'))
+    oled = NullSubscriber(make_config(broker, module_name='oled'), 'actuator/oled')
+    teardown = start(manager, oled, pir)
+    data = {'motion_detected': True}
+
+    def op():
+        pir.publish_sensor_data(data)
+    return op, teardown
+
+
+# ---- 运行与比较 ----
+
+def measure(op: Callable[[], Any], min_time: float, repeat: int) -> Dict[str, float]:
+    """自动确定每轮次数使单轮耗时不少于 min_time，取多轮的最优值与中位数"""
+    number = 1
+    while True:
+        started = time.perf_counter()
+        for _ in range(number):
+            op()
+        elapsed = time.perf_counter() - started
+        if elapsed >= min_time / 4:
+            break
+        number *= 4
+    number = max(1, int(number * min_time / max(elapsed, 1e-9)))
+
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        for _ in range(number):
+            op()
+        samples.append((time.perf_counter() - started) / number)
+    best = min(samples)
+    return {
+        'ns_per_op': best * 1e9,
+        'ns_per_op_median': statistics.median(samples) * 1e9,
+        'ops_per_sec': 1.0 / best if best > 0 else 0.0,
+        'iterations': number * repeat,
+    }
+
+
+def run(names: List[str], min_time: float, repeat: int) -> Dict[str, Dict[str, float]]:
+    results = {}
+    for name in names:
+        op, teardown = BENCHMARKS[name]()
+        try:
+            results[name] = measure(op, min_time, repeat)
+        finally:
+            teardown()
+        print(f"{name:<40}{results[name]['ns_per_op'] / 1000:>10.1f} µs/op"
+              f"{results[name]['ops_per_sec']:>12.0f} ops/s")
+    return results
+
+
+def compare(results: Dict[str, Dict[str, float]], baseline: Dict[str, Any], threshold: float) -> List[str]:
+    """与基线比较，返回回退的基准名称"""
+    regressions = []
+    base_results = baseline.get('results', {})
+    print(f"\n与基线比较（{baseline.get('meta', {}).get('created', '?')}，阈值 +{threshold:.0%}）:")
+    for name, result in results.items():
+        base = base_results.get(name)
+        if base is None:
+            print(f"  {name:<40}（基线中没有）")
+            continue
+        change = result['ns_per_op'] / base['ns_per_op'] - 1.0
+        flag = ''
+        if change > threshold:
+            flag = '  <-- 回退'
+            regressions.append(name)
+        print(f"  {name:<40}{base['ns_per_op'] / 1000:>9.1f} → {result['ns_per_op'] / 1000:>9.1f} µs"
+              f"  {change:+7.1%}{flag}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description='MQTT 基类与业务管理器微基准测试')
+    parser.add_argument('-k', '--filter', default='', help='只运行名称包含该字符串的基准')
+    parser.add_argument('--baseline', default=DEFAULT_BASELINE, help='基线文件路径')
+    parser.add_argument('--save', action='store_true', help='把本次结果保存为基线')
+    parser.add_argument('--threshold', type=float, default=0.2, help='回退阈值（相对基线的增幅）')
+    parser.add_argument('--min-time', type=float, default=0.2, help='每轮最短耗时（秒）')
+    parser.add_argument('--repeat', type=int, default=5, help='轮数')
+    parser.add_argument('--log-level', default='WARNING', help='运行期间的日志级别（INFO 可评估日志开销）')
+    parser.add_argument('--list', action='store_true', help='列出全部基准')
+    args = parser.parse_args()
+
+    if args.list:
+        print('\n'.join(BENCHMARKS))
+        return
+
+    logging.basicConfig(level=getattr(logging, args.log_level.upper(), logging.WARNING),
+                        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    names = [name for name in BENCHMARKS if args.filter in name]
+    results = run(names, args.min_time, args.repeat)
+
+    regressions: List[str] = []
+    if args.save:
+        baseline: Dict[str, Any] = {'results': {}}
+        if os.path.exists(args.baseline):
+            with open(args.baseline, encoding='utf-8') as f:
+                baseline = json.load(f)
+        baseline['meta'] = {
+            'created': time.strftime('%Y-%m-%d %H:%M:%S'),
+            'python': platform.python_version(),
+            'machine': platform.machine(),
+            'platform': platform.platform(),
+        }
+        # 只运行部分基准时保留其余基准的旧基线
+        baseline.setdefault('results', {}).update(results)
+        with open(args.baseline, 'w', encoding='utf-8') as f:
+            json.dump(baseline, f, ensure_ascii=False, indent=2)
+        print(f"\n基线已保存: {args.baseline}")
+    elif os.path.exists(args.baseline):
+        with open(args.baseline, encoding='utf-8') as f:
+            regressions = compare(results, json.load(f), args.threshold)
+
+    if regressions:
+        print(f"\n发现 {len(regressions)} 项回退: {', '.join(regressions)}")
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,452 @@
+# -*- coding: utf-8 -*-
+"""
+统一配置
+各模块的配置项用 Option 声明（所在段、键、类型、默认值），由 ConfigStore 读取：
+- 类型转换与必填检查集中在一处，出错时指明段名和键名
+- 按文件状态（修改时间、大小）缓存解析结果，同一进程中重复读取（入口脚本、模块宿主重启模块）不再重新解析
+- watch() 监视配置文件（Linux 上使用 inotify，其余平台轮询修改时间），文件变化后重新解析，回调发生变化的键
+
+    SCHEMA = Schema('buzzer', MQTT_COMMON + MQTT_SUBSCRIBER + (
+        Option('topic_prefix', 'mqtt'),
+        Option('pin', 'buzzer', type=int),
+    ))
+    config = ConfigStore('config.ini', SCHEMA).load()
+"""
+
+import configparser
+import logging
+import os
+import select
+import struct
+import sys
+import threading
+import time
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+REQUIRED = object()
+
+
+class ConfigError(ValueError):
+    """配置项缺失或类型错误"""
+
+
+def parse_bool(value: str) -> bool:
+    """与 ConfigParser.getboolean 相同的取值（1/yes/true/on，0/no/false/off）"""
+    state = configparser.ConfigParser.BOOLEAN_STATES.get(str(value).strip().lower())
+    if state is None:
+        raise ValueError(f"不是布尔值: {value}")
+    return state
+
+
+def hex_int(value: str) -> int:
+    """十六进制整数（如 I2C 地址 0x3C）"""
+    return int(value, 16)
+
+
+def fraction(value: str):
+    """整数或分数（如 ADS1115 增益 2/3），整数值返回 int"""
+    numerator, sep, denominator = value.strip().partition('/')
+    if not sep:
+        return int(numerator)
+    number = int(numerator) / int(denominator)
+    return int(number) if number.is_integer() else number
+
+
+class Option:
+    """一个配置项：[section] option 读取为配置字典中的 key"""
+
+    __slots__ = ('key', 'section', 'option', 'type', 'default')
+
+    def __init__(self, key: str, section: str, option: Optional[str] = None,
+                 type: Callable[[str], Any] = str, default: Any = REQUIRED):
+        """
+        Args:
+            key: 配置字典中的键名
+            section: 配置文件中的段名
+            option: 配置文件中的键名，默认与 key 相同
+            type: 转换函数（str/int/float/bool 或自定义函数），bool 按 parse_bool 解析
+            default: 缺省值，不指定时为必填项
+        """
+        self.key = key
+        self.section = section
+        self.option = option or key
+        self.type = parse_bool if type is bool else type
+        self.default = default
+
+    def read(self, parser: configparser.ConfigParser) -> Any:
+        if not parser.has_option(self.section, self.option):
+            if self.default is REQUIRED:
+                raise ConfigError(f"缺少配置项 [{self.section}] {self.option}")
+            return self.default
+        raw = parser.get(self.section, self.option)
+        try:
+            return self.type(raw)
+        except (TypeError, ValueError, ZeroDivisionError) as e:
+            raise ConfigError(f"配置项 [{self.section}] {self.option} = {raw!r} 无效: {e}") from None
+
+
+class Schema:
+    """一个模块的全部配置项"""
+
+    def __init__(self, name: str, options: Iterable[Option]):
+        self.name = name
+        self.options: Tuple[Option, ...] = tuple(options)
+
+    def parse(self, parser: configparser.ConfigParser) -> Dict[str, Any]:
+        return {option.key: option.read(parser) for option in self.options}
+
+
+# ---- 各模块共用的 [mqtt] 配置项（缺省值与 MQTTBase 中的默认值一致） ----
+
+# 连接参数（模块宿主的共享连接也使用）
+MQTT_CONNECTION = (
+    Option('mqtt_broker', 'mqtt', 'broker', default='localhost'),
+    Option('mqtt_port', 'mqtt', 'port', int, 1883),
+    # 备用代理列表（host:port，逗号分隔，按顺序故障切换），留空时只使用 broker:port
+    Option('mqtt_brokers', 'mqtt', 'brokers', default=''),
+    Option('connect_timeout', 'mqtt', type=float, default=5.0),
+    Option('mqtt_protocol', 'mqtt', 'protocol', default='3.1.1'),
+    Option('session_expiry', 'mqtt', type=int, default=0),
+    Option('topic_alias_maximum', 'mqtt', type=int, default=16),
+)
+
+MQTT_COMMON = MQTT_CONNECTION + (
+    Option('metrics_interval', 'mqtt', type=float, default=0),
+    Option('metrics_textfile', 'mqtt', default=''),
+    Option('tracing', 'mqtt', type=bool, default=False),
+    Option('trace_sample_rate', 'mqtt', type=float, default=1.0),
+    Option('message_expiry', 'mqtt', default=''),
+    Option('message_ids', 'mqtt', type=bool, default=False),
+    Option('dedup_window', 'mqtt', type=float, default=0),
+    Option('dedup_size', 'mqtt', type=int, default=1024),
+    # 配置热加载：监视配置文件，可热加载的配置项修改后立即生效
+    Option('config_reload', 'mqtt', type=bool, default=False),
+    Option('align_ticks', 'mqtt', type=bool, default=False),
+)
+
+# 传感器（发布者）
+MQTT_PUBLISHER = (
+    Option('topic_prefix', 'mqtt'),
+    # 负载编码（json/msgpack/cbor/compact），可按主题覆盖，订阅端自动识别
+    Option('payload_codec', 'mqtt', default='json'),
+    Option('topic_codecs', 'mqtt', default=''),
+    # 主题布局：hierarchical 发布到 {topic_prefix}/{sensor_type}/{sensor_id}
+    Option('topic_layout', 'mqtt', default='hierarchical'),
+    Option('flat_topic_mirror', 'mqtt', type=bool, default=True),
+    Option('sensor_id', 'mqtt', default=''),
+    # 持久化发件箱：代理不可达时暂存传感器数据，重连后补发；留空表示不启用
+    Option('outbox_path', 'mqtt', default=''),
+    Option('outbox_max_messages', 'mqtt', type=int, default=10000),
+    Option('outbox_batch_size', 'mqtt', type=int, default=50),
+)
+
+# 出站发布队列
+MQTT_PUBLISH_QUEUE = (
+    Option('publish_queue', 'mqtt', type=bool, default=False),
+    Option('publish_coalesce', 'mqtt', type=bool, default=False),
+    Option('publish_queue_size', 'mqtt', type=int, default=256),
+    Option('publish_batch_size', 'mqtt', type=int, default=32),
+    Option('publish_flush_interval', 'mqtt', type=float, default=0.05),
+)
+
+# 执行器与管理器（订阅者）
+MQTT_SUBSCRIBER = (
+    Option('last_value_snapshot', 'mqtt', default=''),
+    Option('last_value_snapshot_interval', 'mqtt', type=float, default=60),
+    # 处理器线程池：耗时的处理器不占用 MQTT 网络线程
+    Option('handler_workers', 'mqtt', type=int, default=0),
+    Option('handler_order_key', 'mqtt', default='topic'),
+    Option('inbound_policies', 'mqtt', default=''),
+)
+
+
+# ---- 解析缓存 ----
+
+_cache: Dict[Tuple[str, Schema], Tuple[tuple, Dict[str, Any]]] = {}
+_cache_lock = threading.Lock()
+
+
+def _file_stamp(path: str) -> Optional[tuple]:
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return (st.st_mtime_ns, st.st_size, st.st_ino)
+
+
+def _parse_file(path: str, schema: Schema) -> Dict[str, Any]:
+    parser = configparser.ConfigParser()
+    parser.read(path, encoding='utf-8')
+    return schema.parse(parser)
+
+
+class ConfigStore:
+    """按 Schema 读取一个配置文件"""
+
+    def __init__(self, path: str, schema: Schema, must_exist: bool = True):
+        """
+        Args:
+            path: 配置文件路径
+            schema: 配置项声明
+            must_exist: 文件不存在时是否报错；为 False 时全部使用缺省值
+        """
+        self.path = os.path.abspath(path)
+        self.schema = schema
+        self.must_exist = must_exist
+        self._values: Optional[Dict[str, Any]] = None
+        self._failed_stamp: Optional[tuple] = None
+        self._callbacks: List[Callable[[Dict[str, Any]], None]] = []
+        self._lock = threading.Lock()
+
+    def _read(self) -> Dict[str, Any]:
+        """解析文件（文件未变化时使用缓存）"""
+        stamp = _file_stamp(self.path)
+        if stamp is None and self.must_exist:
+            raise FileNotFoundError(f"配置文件不存在: {self.path}")
+        key = (self.path, self.schema)
+        with _cache_lock:
+            cached = _cache.get(key)
+        if cached is not None and cached[0] == stamp:
+            return cached[1]
+        values = _parse_file(self.path, self.schema)
+        with _cache_lock:
+            _cache[key] = (stamp, values)
+        return values
+
+    def load(self) -> Dict[str, Any]:
+        """返回配置字典（副本，调用方可以修改）"""
+        with self._lock:
+            if self._values is None:
+                self._values = self._read()
+            return dict(self._values)
+
+    def reload(self) -> Dict[str, Any]:
+        """
+        重新读取文件
+
+        Returns:
+            发生变化的配置项 {键: 新值}；文件未变化或解析失败（保留原配置）时为空
+        """
+        with self._lock:
+            stamp = _file_stamp(self.path)
+            if stamp is not None and stamp == self._failed_stamp:
+                return {}
+            try:
+                values = self._read()
+            except (OSError, ConfigError, configparser.Error) as e:
+                # 同一版本的文件只报告一次，修正后再重新读取
+                self._failed_stamp = stamp
+                logging.error(f"重新读取配置文件 {self.path} 失败，保留原配置: {e}")
+                return {}
+            self._failed_stamp = None
+            old, self._values = self._values or {}, values
+        return {key: value for key, value in values.items() if old.get(key, REQUIRED) != value}
+
+    def watch(self, callback: Callable[[Dict[str, Any]], None]):
+        """配置文件变化后在监视线程中调用 callback(变化的配置项)"""
+        self.load()
+        with self._lock:
+            self._callbacks.append(callback)
+        _watcher.add(self)
+
+    def unwatch(self, callback: Callable[[Dict[str, Any]], None]):
+        with self._lock:
+            if callback in self._callbacks:
+                self._callbacks.remove(callback)
+            empty = not self._callbacks
+        if empty:
+            _watcher.remove(self)
+
+    def _check(self):
+        changes = self.reload()
+        if not changes:
+            return
+        with self._lock:
+            callbacks = list(self._callbacks)
+        for callback in callbacks:
+            try:
+                callback(changes)
+            except Exception as e:
+                logging.error(f"应用配置 {self.path} 的变化时出错: {e}")
+
+
+class ConfigManager:
+    """模块配置管理器基类，子类声明 SCHEMA"""
+
+    SCHEMA: Schema
+
+    def __init__(self, config_file: str = "config.ini"):
+        """
+        Args:
+            config_file: 配置文件路径（不存在时抛出 FileNotFoundError）
+        """
+        self.config_file = config_file
+        self.store = ConfigStore(config_file, self.SCHEMA)
+        self.store.load()
+        self._parser: Optional[configparser.ConfigParser] = None
+
+    @property
+    def config(self) -> configparser.ConfigParser:
+        """原始 ConfigParser（首次访问时解析，用于修改并写回配置文件）"""
+        if self._parser is None:
+            self._parser = configparser.ConfigParser()
+            self._parser.read(self.config_file, encoding='utf-8')
+        return self._parser
+
+    def save_config(self) -> None:
+        """把 config 写回配置文件"""
+        try:
+            with open(self.config_file, 'w', encoding='utf-8') as f:
+                self.config.write(f)
+        except Exception as e:
+            raise IOError(f"保存配置文件失败: {e}")
+
+    def get_all_config(self) -> Dict[str, Any]:
+        """获取所有配置（附带 config_store，供 MQTTBase 热加载）"""
+        config = self.store.load()
+        config['config_store'] = self.store
+        return config
+
+
+def load_config(config_file: str, schema: Schema, must_exist: bool = False) -> Dict[str, Any]:
+    """按 Schema 读取配置文件，返回附带 config_store 的配置字典（文件不存在时使用缺省值）"""
+    store = ConfigStore(config_file, schema, must_exist=must_exist)
+    config = store.load()
+    config['config_store'] = store
+    return config
+
+
+# ---- 文件监视 ----
+
+_IN_ATTRIB = 0x00000004
+_IN_CLOSE_WRITE = 0x00000008
+_IN_MOVED_TO = 0x00000080
+_IN_CREATE = 0x00000100
+_WATCH_MASK = _IN_ATTRIB | _IN_CLOSE_WRITE | _IN_MOVED_TO | _IN_CREATE
+_EVENT_HEADER = struct.Struct('iIII')
+
+
+class _Inotify:
+    """最小的 inotify 封装（ctypes 调用 libc），监视目录以覆盖编辑器先写临时文件再改名的保存方式"""
+
+    def __init__(self):
+        # 只在开启热加载时用到，不在启动时导入
+        import ctypes
+        import ctypes.util
+        libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6', use_errno=True)
+        self._libc = libc
+        self.fd = libc.inotify_init1(os.O_NONBLOCK | getattr(os, 'O_CLOEXEC', 0))
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), 'inotify_init1 失败')
+        self._dirs: Dict[str, int] = {}
+
+    def add_dir(self, directory: str) -> bool:
+        if directory in self._dirs:
+            return True
+        wd = self._libc.inotify_add_watch(self.fd, os.fsencode(directory), _WATCH_MASK)
+        if wd < 0:
+            return False
+        self._dirs[directory] = wd
+        return True
+
+    def remove_dir(self, directory: str):
+        wd = self._dirs.pop(directory, None)
+        if wd is not None:
+            self._libc.inotify_rm_watch(self.fd, wd)
+
+    def read_names(self, timeout: float) -> List[str]:
+        """等待事件，返回发生变化的文件名（不含目录）"""
+        ready, _, _ = select.select([self.fd], [], [], timeout)
+        if not ready:
+            return []
+        try:
+            data = os.read(self.fd, 65536)
+        except BlockingIOError:
+            return []
+        names = []
+        offset = 0
+        while offset + _EVENT_HEADER.size <= len(data):
+            _, _, _, length = _EVENT_HEADER.unpack_from(data, offset)
+            offset += _EVENT_HEADER.size
+            names.append(os.fsdecode(data[offset:offset + length].rstrip(b'\0')))
+            offset += length
+        return names
+
+    def close(self):
+        os.close(self.fd)
+
+
+class _FileWatcher:
+    """所有 ConfigStore 共用的监视线程，没有被监视的文件时退出"""
+
+    # 收到事件后等待文件写完的时间；没有 inotify 时的轮询间隔；有 inotify 时兜底检查的间隔
+    DEBOUNCE = 0.2
+    POLL_INTERVAL = 2.0
+    SAFETY_INTERVAL = 30.0
+
+    def __init__(self):
+        self._stores: List[ConfigStore] = []
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._inotify: Optional[_Inotify] = None
+
+    def add(self, store: ConfigStore):
+        with self._lock:
+            if store not in self._stores:
+                self._stores.append(store)
+            if self._thread is None:
+                self._inotify = self._open_inotify()
+                self._thread = threading.Thread(target=self._run, name='config-watch', daemon=True)
+                self._thread.start()
+            if self._inotify is not None and not self._inotify.add_dir(os.path.dirname(store.path)):
+                logging.warning(f"无法监视 {store.path} 所在目录，改为每 {self.SAFETY_INTERVAL:g} 秒检查一次")
+
+    def remove(self, store: ConfigStore):
+        with self._lock:
+            if store in self._stores:
+                self._stores.remove(store)
+            directory = os.path.dirname(store.path)
+            if self._inotify is not None and all(os.path.dirname(s.path) != directory for s in self._stores):
+                self._inotify.remove_dir(directory)
+
+    @staticmethod
+    def _open_inotify() -> Optional[_Inotify]:
+        if not sys.platform.startswith('linux'):
+            return None
+        try:
+            return _Inotify()
+        except (OSError, AttributeError) as e:
+            logging.debug("inotify 不可用，轮询配置文件: %s", e)
+            return None
+
+    def _run(self):
+        interval = self.SAFETY_INTERVAL if self._inotify is not None else self.POLL_INTERVAL
+        next_check = time.monotonic() + interval
+        due: Optional[float] = None
+        while True:
+            with self._lock:
+                if not self._stores:
+                    if self._inotify is not None:
+                        self._inotify.close()
+                        self._inotify = None
+                    self._thread = None
+                    return
+                stores = list(self._stores)
+                inotify = self._inotify
+            now = time.monotonic()
+            wait = min(next_check, due if due is not None else next_check) - now
+            if inotify is not None:
+                names = inotify.read_names(max(0.0, min(wait, 1.0)))
+                if any(os.path.basename(store.path) in names for store in stores):
+                    due = time.monotonic() + self.DEBOUNCE
+            else:
+                time.sleep(max(0.0, min(wait, 1.0)))
+            now = time.monotonic()
+            if (due is not None and now >= due) or now >= next_check:
+                due = None
+                next_check = now + interval
+                for store in stores:
+                    store._check()
+
+
+_watcher = _FileWatcher()
@@ -0,0 +1,279 @@
+# -*- coding: utf-8 -*-
+"""
+MQTT 连接管理
+带抖动的指数退避、多代理故障切换，并由独立网络线程驱动 paho 客户端，
+启动时代理暂时不可达也不会退出，恢复后自动重连
+"""
+
+import logging
+import random
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import paho.mqtt.client as mqtt
+
+logger = logging.getLogger(__name__)
+
+
+def parse_brokers(spec: Any, default_host: str = 'localhost', default_port: int = 1883) -> List[Tuple[str, int]]:
+    """
+    解析代理列表
+
+    Args:
+        spec: 形如 "192.168.1.10:1883, 192.168.1.11" 的字符串或 [(host, port)] 列表，
+              为空时使用默认代理
+        default_host: 默认代理地址
+        default_port: 未写端口时使用的端口
+
+    Returns:
+        [(host, port)] 列表，按故障切换顺序排列
+    """
+    if not spec:
+        return [(default_host, int(default_port))]
+    if not isinstance(spec, str):
+        return [(host, int(port)) for host, port in spec]
+
+    brokers = []
+    for item in spec.replace(';', ',').split(','):
+        item = item.strip()
+        if not item:
+            continue
+        host, sep, port = item.rpartition(':')
+        if not sep or not port.isdigit():
+            host, port = item, default_port
+        brokers.append((host, int(port)))
+    return brokers or [(default_host, int(default_port))]
+
+
+class Backoff:
+    """带抖动的指数退避
+
+    第 n 次重试的上限为 initial * multiplier**n（不超过 maximum），
+    实际延迟在 [上限 * (1 - jitter), 上限] 内随机取值，避免多个模块同时重连。
+    """
+
+    def __init__(self, initial: float = 0.5, maximum: float = 30.0, multiplier: float = 2.0, jitter: float = 0.5):
+        self.initial = max(0.01, float(initial))
+        self.maximum = max(self.initial, float(maximum))
+        self.multiplier = max(1.0, float(multiplier))
+        self.jitter = min(1.0, max(0.0, float(jitter)))
+        self.attempts = 0
+
+    @classmethod
+    def from_config(cls, config: Dict[str, Any]) -> 'Backoff':
+        """从配置字典创建（reconnect_delay / reconnect_max_delay / reconnect_jitter）"""
+        return cls(initial=config.get('reconnect_delay', 0.5),
+                   maximum=config.get('reconnect_max_delay', 30.0),
+                   jitter=config.get('reconnect_jitter', 0.5))
+
+    def next(self) -> float:
+        """下一次重试前的等待时间（秒）"""
+        ceiling = min(self.maximum, self.initial * self.multiplier ** min(self.attempts, 32))
+        self.attempts += 1
+        return random.uniform(ceiling * (1.0 - self.jitter), ceiling)
+
+    def reset(self):
+        """连接成功后重置"""
+        self.attempts = 0
+
+
+class ConnectionManager:
+    """MQTT 连接管理器
+
+    网络线程循环调用 client.loop()，连接失败或断开后按退避时间等待，
+    再依次尝试代理列表中的下一个代理。paho 回调都在该线程中执行，
+    其它线程需要操作客户端时可通过 call_soon 转交。
+    """
+
+    def __init__(self, client: mqtt.Client, brokers: List[Tuple[str, int]], keepalive: int = 60,
+                 connect_timeout: float = 5.0, backoff: Optional[Backoff] = None,
+                 name: str = 'mqtt-network', connect_properties=None):
+        """
+        初始化连接管理器
+
+        Args:
+            client: paho 客户端
+            brokers: [(host, port)] 代理列表
+            keepalive: 心跳间隔（秒）
+            connect_timeout: TCP 连接超时（秒）
+            backoff: 退避策略
+            name: 网络线程名称
+            connect_properties: MQTT v5 CONNECT 属性（如 SessionExpiryInterval），3.1.1 时为 None
+        """
+        self.client = client
+        self.brokers = list(brokers)
+        self.keepalive = int(keepalive)
+        self.connect_timeout = float(connect_timeout)
+        self.backoff = backoff or Backoff()
+        self.name = name
+        self.connect_properties = connect_properties
+
+        self._index = 0
+        self._socket_open = False
+        self._rotate = False
+        self._stopping = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._deferred: List[Tuple[float, Callable, tuple]] = []
+        self._deferred_lock = threading.Lock()
+        self._started_at: Optional[float] = None
+        self._down_since: Optional[float] = None
+
+        self._apply_connect_timeout()
+
+        # 统计信息
+        self.connects = 0
+        self.reconnects = 0
+        self.connect_failures = 0
+        self.disconnects = 0
+        self.failovers = 0
+        self.initial_connect_time: Optional[float] = None
+        self.last_time_to_reconnect: Optional[float] = None
+        self.max_time_to_reconnect = 0.0
+        self.total_downtime = 0.0
+
+    def _apply_connect_timeout(self):
+        """设置 TCP 连接超时（paho 2.x 为公开属性，1.6 为内部属性）"""
+        try:
+            if hasattr(type(self.client), 'connect_timeout'):
+                self.client.connect_timeout = self.connect_timeout
+            elif hasattr(self.client, '_connect_timeout'):
+                self.client._connect_timeout = self.connect_timeout
+        except (AttributeError, ValueError) as e:
+            logger.debug(f"无法设置连接超时: {e}")
+
+    @property
+    def current_broker(self) -> Tuple[str, int]:
+        """当前（或正在尝试的）代理"""
+        return self.brokers[self._index]
+
+    def start(self):
+        """启动网络线程（不阻塞，连接在后台建立）"""
+        if self._thread and self._thread.is_alive():
+            return
+        self._stopping.clear()
+        self._started_at = time.monotonic()
+        self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 3.0):
+        """断开连接并停止网络线程"""
+        self._stopping.set()
+        try:
+            self.client.disconnect()
+        except Exception as e:
+            logger.debug(f"断开连接时发生错误: {e}")
+        if self._thread and self._thread.is_alive() and self._thread is not threading.current_thread():
+            self._thread.join(timeout=timeout)
+        self._thread = None
+        self._socket_open = False
+
+    def call_soon(self, func: Callable, *args, delay: float = 0.0):
+        """在网络线程中执行函数（可延迟）"""
+        with self._deferred_lock:
+            self._deferred.append((time.monotonic() + delay, func, args))
+
+    def _run_deferred(self):
+        if not self._deferred:
+            return
+        now = time.monotonic()
+        with self._deferred_lock:
+            due = [item for item in self._deferred if item[0] <= now]
+            self._deferred = [item for item in self._deferred if item[0] > now]
+        for _, func, args in due:
+            try:
+                func(*args)
+            except Exception as e:
+                logger.error(f"网络线程任务执行出错: {e}")
+
+    def _run(self):
+        """网络线程主循环"""
+        while not self._stopping.is_set():
+            if not self._socket_open and not self.connect_once():
+                self._wait_backoff()
+                continue
+
+            rc = self.client.loop(timeout=1.0)
+            self._run_deferred()
+            if rc != mqtt.MQTT_ERR_SUCCESS:
+                self._socket_open = False
+                if self._stopping.is_set():
+                    break
+                self.mark_down()
+                self._wait_backoff()
+
+    def connect_once(self) -> bool:
+        """尝试连接当前代理，失败时切换到下一个代理"""
+        if self._rotate:
+            self._next_broker()
+        host, port = self.current_broker
+        try:
+            logger.info(f"正在连接到MQTT代理: {host}:{port}")
+            if self.connect_properties is not None:
+                self.client.connect(host, port, self.keepalive, properties=self.connect_properties)
+            else:
+                self.client.connect(host, port, self.keepalive)
+            self._socket_open = True
+            # 收到 CONNACK 之前再次失败时换下一个代理
+            self._rotate = True
+            return True
+        except Exception as e:
+            self.connect_failures += 1
+            self.mark_down()
+            logger.warning(f"连接MQTT代理 {host}:{port} 失败: {e}")
+            self._next_broker()
+            return False
+
+    def _next_broker(self):
+        self._rotate = False
+        if len(self.brokers) > 1:
+            self._index = (self._index + 1) % len(self.brokers)
+            self.failovers += 1
+            logger.info(f"切换到备用MQTT代理: {self.current_broker[0]}:{self.current_broker[1]}")
+
+    def _wait_backoff(self):
+        delay = self.backoff.next()
+        logger.info(f"{delay:.1f}秒后重试连接")
+        self._stopping.wait(delay)
+
+    def mark_down(self):
+        """记录断线时刻（用于计算重连耗时）"""
+        if self._down_since is None and self.connects:
+            self._down_since = time.monotonic()
+            self.disconnects += 1
+
+    def on_connack(self, rc: int):
+        """CONNACK 回调（由 on_connect 调用）"""
+        if rc != 0:
+            return
+        now = time.monotonic()
+        self._rotate = False
+        self.backoff.reset()
+        if self.connects == 0:
+            self.initial_connect_time = now - (self._started_at or now)
+        elif self._down_since is not None:
+            elapsed = now - self._down_since
+            self.reconnects += 1
+            self.last_time_to_reconnect = elapsed
+            self.max_time_to_reconnect = max(self.max_time_to_reconnect, elapsed)
+            self.total_downtime += elapsed
+            logger.info(f"已重新连接，耗时 {elapsed:.2f}秒（累计重连 {self.reconnects} 次）")
+        self._down_since = None
+        self.connects += 1
+
+    def stats(self) -> Dict[str, Any]:
+        """获取连接统计"""
+        host, port = self.current_broker
+        return {
+            'broker': f"{host}:{port}",
+            'connected': self.client.is_connected(),
+            'connects': self.connects,
+            'reconnects': self.reconnects,
+            'connect_failures': self.connect_failures,
+            'disconnects': self.disconnects,
+            'failovers': self.failovers,
+            'initial_connect_time': self.initial_connect_time,
+            'last_time_to_reconnect': self.last_time_to_reconnect,
+            'max_time_to_reconnect': self.max_time_to_reconnect,
+            'total_downtime': self.total_downtime,
+        }
@@ -0,0 +1,92 @@
+# -*- coding: utf-8 -*-
+"""
+重复消息抑制
+QoS 1 只保证至少一次：发布端重连后重发未确认的消息、会话恢复后代理补投，都会让订阅端收到同一条消息多次。
+订阅端按 (主题, 消息ID) 或 (主题, 负载摘要) 在时间窗口内去重，重复的消息在交给处理器前丢弃。
+没有消息 ID 的消息只在代理重发（DUP 标志）时按负载摘要去重，内容相同的两次命令照常处理。
+"""
+
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Optional
+
+# 消息 ID 字段名（3.1.1 写入负载顶层，v5 写入用户属性）
+MSG_ID = 'msg_id'
+
+
+def new_message_id() -> str:
+    """生成消息 ID（12 位十六进制）"""
+    return os.urandom(6).hex()
+
+
+def payload_digest(payload: bytes) -> bytes:
+    """负载摘要（16 字节 BLAKE2b）"""
+    return hashlib.blake2b(payload, digest_size=16).digest()
+
+
+class DedupCache:
+    """带时间窗口的有界缓存：记录最近见过的消息键（按首次出现顺序淘汰），窗口内再次出现即为重复"""
+
+    def __init__(self, window: float = 30.0, max_size: int = 1024):
+        """
+        初始化去重缓存
+
+        Args:
+            window: 时间窗口（秒），从首次收到开始计算，超过后同一消息视为新消息
+            max_size: 最多记录的消息数，超出时淘汰最早的
+        """
+        self.window = float(window)
+        self.max_size = max(1, int(max_size))
+        self._seen: "OrderedDict[Hashable, float]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @classmethod
+    def from_config(cls, config: Dict[str, Any]) -> Optional['DedupCache']:
+        """从配置字典创建（dedup_window / dedup_size），dedup_window 为 0 时返回 None"""
+        window = float(config.get('dedup_window', 0))
+        if window <= 0:
+            return None
+        return cls(window, config.get('dedup_size', 1024))
+
+    def _expire(self, now: float):
+        # 按记录顺序清除已过窗口的键（持锁调用）
+        while self._seen:
+            oldest_key, first_seen = next(iter(self._seen.items()))
+            if now - first_seen < self.window:
+                break
+            del self._seen[oldest_key]
+
+    def remember(self, key: Hashable):
+        """只记录消息键（不判断重复、不计入命中统计），之后窗口内带 DUP 标志的重发可以匹配到"""
+        now = time.monotonic()
+        with self._lock:
+            self._expire(now)
+            self._seen.pop(key, None)
+            self._seen[key] = now
+            if len(self._seen) > self.max_size:
+                self._seen.popitem(last=False)
+
+    def seen(self, key: Hashable) -> bool:
+        """检查并记录消息键，窗口内重复返回 True"""
+        now = time.monotonic()
+        with self._lock:
+            self._expire(now)
+            if key in self._seen:
+                self.hits += 1
+                return True
+            self._seen[key] = now
+            if len(self._seen) > self.max_size:
+                self._seen.popitem(last=False)
+            self.misses += 1
+            return False
+
+    def __len__(self) -> int:
+        return len(self._seen)
+
+    def stats(self) -> Dict[str, int]:
+        return {'hit': self.hits, 'miss': self.misses}
@@ -0,0 +1,214 @@
+# -*- coding: utf-8 -*-
+"""
+进程内假代理
+不依赖 mosquitto，在内存中完成订阅匹配、保留消息和投递，用于基准测试和离线调试。
+FakeClient 实现 MQTTBase 用到的 paho 客户端接口，通过配置 mqtt_client 传入：
+
+    broker = FakeBroker()
+    publisher = SomePublisher({..., 'mqtt_client': FakeClient(broker)})
+
+消息在发布者线程中同步投递给订阅者（不经过网络线程），QoS>0 的确认也立即完成，
+测得的是本仓库代码自身的开销。CONNACK 和 SUBACK 与 paho 一样在下一次 loop() 中回调。
+"""
+
+import itertools
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+import paho.mqtt.client as mqtt
+
+from message_router import TopicTrie
+
+
+class FakeMessage:
+    """paho MQTTMessage 的最小替身"""
+
+    __slots__ = ('topic', 'payload', 'qos', 'retain', 'mid', 'properties', 'dup')
+
+    def __init__(self, topic: str, payload: bytes, qos: int = 0, retain: bool = False, mid: int = 0,
+                 properties=None, dup: bool = False):
+        self.topic = topic
+        self.payload = payload
+        self.qos = qos
+        self.retain = retain
+        self.mid = mid
+        self.properties = properties
+        self.dup = dup
+
+
+class FakeMessageInfo:
+    """paho MQTTMessageInfo 的最小替身（发布即确认）"""
+
+    __slots__ = ('mid', 'rc')
+
+    def __init__(self, mid: int, rc: int = mqtt.MQTT_ERR_SUCCESS):
+        self.mid = mid
+        self.rc = rc
+
+    def is_published(self) -> bool:
+        return self.rc == mqtt.MQTT_ERR_SUCCESS
+
+    def wait_for_publish(self, timeout: Optional[float] = None):
+        if self.rc != mqtt.MQTT_ERR_SUCCESS:
+            raise RuntimeError(mqtt.error_string(self.rc))
+
+
+class FakeBroker:
+    """内存代理：主题过滤器匹配、保留消息、同步投递"""
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        # 过滤器 -> {客户端: qos}
+        self._subscriptions: Dict[str, Dict['FakeClient', int]] = {}
+        self._trie = TopicTrie()
+        self._retained: Dict[str, Tuple[bytes, int]] = {}
+        self.available = True
+        self.published = 0
+        self.delivered = 0
+
+    def _rebuild(self):
+        trie = TopicTrie()
+        for topic_filter in self._subscriptions:
+            trie.insert(topic_filter, topic_filter)
+        self._trie = trie
+
+    def subscribe(self, client: 'FakeClient', topic_filter: str, qos: int):
+        with self._lock:
+            new_filter = topic_filter not in self._subscriptions
+            self._subscriptions.setdefault(topic_filter, {})[client] = qos
+            if new_filter:
+                self._rebuild()
+            retained = [(topic, payload, rqos) for topic, (payload, rqos) in self._retained.items()
+                        if topic_filter in self._trie.match(topic)]
+        for topic, payload, rqos in retained:
+            client._deliver(FakeMessage(topic, payload, min(qos, rqos), retain=True))
+
+    def unsubscribe(self, client: 'FakeClient', topic_filter: str):
+        with self._lock:
+            subscribers = self._subscriptions.get(topic_filter)
+            if subscribers and client in subscribers:
+                del subscribers[client]
+                if not subscribers:
+                    del self._subscriptions[topic_filter]
+                    self._rebuild()
+
+    def drop_client(self, client: 'FakeClient'):
+        with self._lock:
+            for topic_filter in [f for f, subs in self._subscriptions.items() if client in subs]:
+                self.unsubscribe(client, topic_filter)
+
+    def publish(self, topic: str, payload: bytes, qos: int, retain: bool, properties=None):
+        """路由并同步投递；同一客户端多个过滤器匹配时只投递一次（取最高 QoS），v5 属性原样转发"""
+        with self._lock:
+            self.published += 1
+            if retain:
+                if payload:
+                    self._retained[topic] = (payload, qos)
+                else:
+                    self._retained.pop(topic, None)
+            targets: Dict[FakeClient, int] = {}
+            for topic_filter in self._trie.match(topic):
+                for client, sub_qos in self._subscriptions.get(topic_filter, {}).items():
+                    targets[client] = max(targets.get(client, 0), sub_qos)
+        for client, sub_qos in targets.items():
+            self.delivered += 1
+            client._deliver(FakeMessage(topic, payload, min(qos, sub_qos), properties=properties))
+
+
+class FakeClient:
+    """paho 客户端替身，连接到 FakeBroker"""
+
+    def __init__(self, broker: FakeBroker, client_id: str = ''):
+        self.broker = broker
+        self.client_id = client_id
+        self.connect_timeout = 5.0
+        self.userdata = None
+        self.on_connect = None
+        self.on_disconnect = None
+        self.on_publish = None
+        self.on_message = None
+        self.on_subscribe = None
+        self._connected = False
+        self._connack_pending = False
+        self._subacks: List[Tuple[int, int]] = []
+        self._mids = itertools.count(1)
+
+    # ---- 连接 ----
+
+    def connect(self, host: str = 'localhost', port: int = 1883, keepalive: int = 60):
+        """建立连接；与 paho 一样，on_connect 在下一次 loop() 中回调"""
+        if not self.broker.available:
+            raise ConnectionRefusedError("FakeBroker 不可用")
+        self._connack_pending = True
+        return mqtt.MQTT_ERR_SUCCESS
+
+    def reconnect(self):
+        return self.connect()
+
+    def loop(self, timeout: float = 1.0) -> int:
+        """网络循环：投递 CONNACK，其余消息已在发布时同步投递"""
+        if self._connack_pending:
+            self._connack_pending = False
+            self._connected = True
+            if self.on_connect:
+                self.on_connect(self, self.userdata, {'session present': 0}, 0)
+            return mqtt.MQTT_ERR_SUCCESS
+        if not self._connected:
+            return mqtt.MQTT_ERR_NO_CONN
+        if self._subacks:
+            subacks, self._subacks = self._subacks, []
+            for mid, qos in subacks:
+                if self.on_subscribe:
+                    self.on_subscribe(self, self.userdata, mid, (qos,))
+            return mqtt.MQTT_ERR_SUCCESS
+        time.sleep(min(timeout, 0.05))
+        return mqtt.MQTT_ERR_SUCCESS
+
+    def loop_start(self):
+        self.loop()
+
+    def loop_stop(self):
+        pass
+
+    def disconnect(self):
+        was_connected = self._connected
+        self._connected = False
+        self._connack_pending = False
+        self.broker.drop_client(self)
+        if was_connected and self.on_disconnect:
+            self.on_disconnect(self, self.userdata, 0)
+        return mqtt.MQTT_ERR_SUCCESS
+
+    def is_connected(self) -> bool:
+        return self._connected
+
+    # ---- 发布与订阅 ----
+
+    def publish(self, topic: str, payload: Any = None, qos: int = 0, retain: bool = False,
+                properties=None) -> FakeMessageInfo:
+        if not self._connected:
+            return FakeMessageInfo(0, mqtt.MQTT_ERR_NO_CONN)
+        if isinstance(payload, str):
+            payload = payload.encode('utf-8')
+        mid = next(self._mids)
+        self.broker.publish(topic, payload or b'', qos, retain, properties)
+        if self.on_publish:
+            self.on_publish(self, self.userdata, mid)
+        return FakeMessageInfo(mid)
+
+    def subscribe(self, topic: str, qos: int = 0) -> Tuple[int, int]:
+        if not self._connected:
+            return mqtt.MQTT_ERR_NO_CONN, None
+        mid = next(self._mids)
+        self.broker.subscribe(self, topic, qos)
+        self._subacks.append((mid, qos))
+        return mqtt.MQTT_ERR_SUCCESS, mid
+
+    def unsubscribe(self, topic: str) -> Tuple[int, int]:
+        self.broker.unsubscribe(self, topic)
+        return mqtt.MQTT_ERR_SUCCESS, next(self._mids)
+
+    def _deliver(self, message: FakeMessage):
+        if self._connected and self.on_message:
+            self.on_message(self, self.userdata, message)
@@ -0,0 +1,349 @@
+# -*- coding: utf-8 -*-
+"""
+消息处理执行器
+有界工作线程池：同一键（主题或动作）的消息严格按序执行，不同键之间并发执行；
+可按槽位（主题或动作）设置丢弃策略，积压的同类消息只保留最新的若干条
+"""
+
+import logging
+import threading
+import time
+from collections import deque
+from typing import Any, Callable, Deque, Dict, Hashable, List, Optional, Set, Tuple
+
+from message_router import TopicTrie
+
+logger = logging.getLogger(__name__)
+
+# 丢弃策略
+KEEP_ALL = 'keep-all'          # 全部保留，队列满时拒绝新消息
+KEEP_LATEST = 'keep-latest'    # 同一槽位只保留最新一条
+DROP_OLDEST = 'drop-oldest'    # 同一槽位最多保留 N 条，超出时丢弃最旧的
+POLICIES = (KEEP_ALL, KEEP_LATEST, DROP_OLDEST)
+
+
+class TimingStats:
+    """简单的耗时统计（次数/总计/最大值）"""
+
+    __slots__ = ('count', 'total', 'max')
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def observe(self, seconds: float):
+        self.count += 1
+        self.total += seconds
+        if seconds > self.max:
+            self.max = seconds
+
+    def snapshot(self) -> Dict[str, float]:
+        return {
+            'count': self.count,
+            'avg': self.total / self.count if self.count else 0.0,
+            'max': self.max,
+        }
+
+
+class KeyedExecutor:
+    """按键保序的有界执行器
+
+    每个键维护一个先进先出队列，同一时刻每个键最多只有一个任务在执行；
+    空闲工作线程从“就绪键”队列中轮流取任务，因此慢任务只阻塞自己的键。
+
+    提交时可指定槽位和每槽位上限：同一槽位尚未执行的任务超过上限时，
+    最旧的任务被作废（惰性删除，工作线程取到时直接跳过），新任务排到队尾。
+    上限为 1 即 keep-latest。
+    """
+
+    def __init__(self, workers: int = 2, max_queue: int = 1000, name: str = 'mqtt-handler'):
+        """
+        初始化执行器
+
+        Args:
+            workers: 工作线程数
+            max_queue: 所有键排队任务总数上限，超出时拒绝新任务
+            name: 线程名前缀
+        """
+        self.workers = max(1, int(workers))
+        self.max_queue = max(1, int(max_queue))
+        self.name = name
+
+        self._cond = threading.Condition()
+        # 任务为列表 [func, args, enqueued_at, slot]，作废时 func 置为 None
+        self._queues: Dict[Hashable, Deque[list]] = {}
+        # 槽位 -> 尚未执行的任务（按提交顺序）
+        self._slots: Dict[Hashable, Deque[list]] = {}
+        self._ready: Deque[Hashable] = deque()
+        self._active: Set[Hashable] = set()
+        self._depth = 0
+        self._stopping = False
+        self._threads = []
+
+        # 指标
+        self.submitted = 0
+        self.completed = 0
+        self.rejected = 0
+        self.collapsed = 0
+        self.failed = 0
+        self.max_depth = 0
+        self.wait_time = TimingStats()
+        self.handler_time = TimingStats()
+
+    @property
+    def depth(self) -> int:
+        """当前排队任务数"""
+        return self._depth
+
+    def start(self):
+        """启动工作线程"""
+        if self._threads:
+            return
+        self._stopping = False
+        for index in range(self.workers):
+            thread = threading.Thread(target=self._worker, name=f"{self.name}-{index}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        logger.info(f"消息处理执行器已启动: workers={self.workers}, max_queue={self.max_queue}")
+
+    def stop(self, timeout: float = 3.0):
+        """停止工作线程，已排队的任务会被执行完"""
+        with self._cond:
+            self._stopping = True
+            self._cond.notify_all()
+        deadline = time.monotonic() + timeout
+        for thread in self._threads:
+            thread.join(timeout=max(0.0, deadline - time.monotonic()))
+        self._threads = []
+        logger.info(f"消息处理执行器已停止，统计: {self.stats()}")
+
+    def submit(self, key: Hashable, func: Callable[..., Any], *args,
+               slot: Optional[Hashable] = None, slot_limit: int = 0) -> bool:
+        """
+        提交任务
+
+        Args:
+            key: 保序键，同键任务按提交顺序串行执行
+            func: 任务函数
+            *args: 任务参数
+            slot: 丢弃策略槽位，为 None 时不做合并
+            slot_limit: 该槽位最多保留的待执行任务数（1 即只保留最新）
+
+        Returns:
+            是否已接受
+        """
+        with self._cond:
+            if self._stopping:
+                return False
+
+            pending = None
+            if slot is not None and slot_limit > 0:
+                pending = self._slots.get(slot)
+                if pending is None:
+                    pending = deque()
+                    self._slots[slot] = pending
+                while len(pending) >= slot_limit:
+                    self._cancel(pending.popleft())
+
+            if self._depth >= self.max_queue:
+                if pending is not None and not pending:
+                    del self._slots[slot]
+                self.rejected += 1
+                if self.rejected % 100 == 1:
+                    logger.warning(f"消息处理队列已满，丢弃新消息（累计丢弃 {self.rejected} 条）")
+                return False
+
+            queue = self._queues.get(key)
+            if queue is None:
+                queue = deque()
+                self._queues[key] = queue
+            task = [func, args, time.monotonic(), slot if pending is not None else None]
+            queue.append(task)
+            if pending is not None:
+                pending.append(task)
+            self._depth += 1
+            self.submitted += 1
+            if self._depth > self.max_depth:
+                self.max_depth = self._depth
+
+            if len(queue) == 1 and key not in self._active:
+                self._ready.append(key)
+                self._cond.notify()
+        return True
+
+    def _cancel(self, task: list):
+        """作废尚未执行的任务（调用方持有锁）"""
+        task[0] = None
+        task[1] = ()
+        self._depth -= 1
+        self.collapsed += 1
+
+    def _release_slot(self, task: list):
+        """任务开始执行后从槽位中移除（调用方持有锁）"""
+        slot = task[3]
+        pending = self._slots.get(slot)
+        if not pending:
+            return
+        if pending[0] is task:
+            pending.popleft()
+        else:
+            # 槽位跨越多个保序键时执行顺序可能与提交顺序不同
+            try:
+                pending.remove(task)
+            except ValueError:
+                pass
+        if not pending:
+            del self._slots[slot]
+
+    def _next_task(self) -> Optional[tuple]:
+        """从就绪键中取出下一个有效任务（调用方持有锁）"""
+        while self._ready:
+            key = self._ready.popleft()
+            queue = self._queues[key]
+            while queue and queue[0][0] is None:
+                queue.popleft()
+            if not queue:
+                del self._queues[key]
+                continue
+            task = queue.popleft()
+            if task[3] is not None:
+                self._release_slot(task)
+            self._active.add(key)
+            self._depth -= 1
+            return key, task
+        return None
+
+    def _worker(self):
+        """工作线程主循环"""
+        while True:
+            with self._cond:
+                item = None
+                while item is None:
+                    while not self._ready and not (self._stopping and self._depth == 0):
+                        self._cond.wait()
+                    if not self._ready:
+                        return
+                    item = self._next_task()
+                key, (func, args, enqueued_at, _) = item
+
+            started = time.monotonic()
+            try:
+                func(*args)
+            except Exception as e:
+                self.failed += 1
+                logger.error(f"消息处理任务执行出错: {e}")
+            finished = time.monotonic()
+
+            with self._cond:
+                self.wait_time.observe(started - enqueued_at)
+                self.handler_time.observe(finished - started)
+                self.completed += 1
+                self._active.discard(key)
+                queue = self._queues[key]
+                while queue and queue[0][0] is None:
+                    queue.popleft()
+                if queue:
+                    self._ready.append(key)
+                    self._cond.notify()
+                else:
+                    del self._queues[key]
+                if self._stopping and self._depth == 0:
+                    self._cond.notify_all()
+
+    def stats(self) -> Dict[str, Any]:
+        """获取执行器指标"""
+        return {
+            'queue_depth': self._depth,
+            'max_queue_depth': self.max_depth,
+            'active_keys': len(self._active),
+            'submitted': self.submitted,
+            'completed': self.completed,
+            'rejected': self.rejected,
+            'collapsed': self.collapsed,
+            'failed': self.failed,
+            'wait_time': self.wait_time.snapshot(),
+            'handler_time': self.handler_time.snapshot(),
+        }
+
+
+def parse_inbound_policies(spec: str, default_limit: int = 10) -> List[Tuple[str, str, int]]:
+    """
+    解析入站丢弃策略配置
+
+    Args:
+        spec: 形如 "set_volume=keep-latest, sensor/#=drop-oldest:5" 的字符串；
+              左侧含 / + # 时为主题过滤器，否则为消息的 action / type 取值
+        default_limit: drop-oldest 未指定条数时的默认上限
+
+    Returns:
+        [(匹配项, 策略, 每槽位上限)] 列表，keep-all 的上限为 0
+    """
+    rules = []
+    for item in (spec or '').replace(';', ',').split(','):
+        item = item.strip()
+        if not item:
+            continue
+        name, sep, policy = item.partition('=')
+        if not sep:
+            raise ValueError(f"无效的入站策略配置: {item}")
+        policy, _, limit = policy.strip().lower().partition(':')
+        if policy not in POLICIES:
+            raise ValueError(f"未知的入站策略: {policy}")
+        if policy == KEEP_LATEST:
+            slot_limit = 1
+        elif policy == DROP_OLDEST:
+            slot_limit = max(1, int(limit)) if limit else default_limit
+        else:
+            slot_limit = 0
+        rules.append((name.strip(), policy, slot_limit))
+    return rules
+
+
+class InboundPolicies:
+    """按主题或消息动作/类型查找丢弃策略
+
+    动作/类型规则优先于主题规则；槽位为 (主题, 取值) 或主题，
+    因此不同设备、不同动作的积压互不影响。
+    """
+
+    FIELDS = ('action', 'type')
+
+    def __init__(self, rules: List[Tuple[str, str, int]]):
+        self._values: Dict[Any, int] = {}
+        self._trie = TopicTrie()
+        self._has_topic_rules = False
+        self._cache: Dict[str, int] = {}
+        for name, _, slot_limit in rules:
+            if '/' in name or '+' in name or '#' in name:
+                self._trie.insert(name, slot_limit)
+                self._has_topic_rules = True
+            else:
+                self._values[name] = slot_limit
+
+    @classmethod
+    def from_config(cls, config: Dict[str, Any]) -> Optional['InboundPolicies']:
+        """从配置字典创建（inbound_policies / inbound_drop_oldest_limit），未配置时返回 None"""
+        rules = config.get('inbound_policies')
+        if not rules:
+            return None
+        if isinstance(rules, str):
+            rules = parse_inbound_policies(rules, int(config.get('inbound_drop_oldest_limit', 10)))
+        return cls(rules)
+
+    def lookup(self, topic: str, payload: Any) -> Tuple[Optional[Hashable], int]:
+        """返回 (槽位, 每槽位上限)，不需要合并时返回 (None, 0)"""
+        if self._values and isinstance(payload, dict):
+            for field in self.FIELDS:
+                value = payload.get(field)
+                if isinstance(value, str) and value in self._values:
+                    return (topic, value), self._values[value]
+        if self._has_topic_rules:
+            slot_limit = self._cache.get(topic)
+            if slot_limit is None:
+                matches = self._trie.match(topic)
+                slot_limit = matches[0] if matches else 0
+                self._cache[topic] = slot_limit
+            if slot_limit:
+                return topic, slot_limit
+        return None, 0
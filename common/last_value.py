@@ -0,0 +1,198 @@
+# -*- coding: utf-8 -*-
+"""
+最新值缓存
+订阅端按 (主题, 类型) 保存每类消息的最近一条，并按类型、类型+传感器ID 建立索引，
+管理器可直接查询"当前温度"等状态，不必等待下一次发布；可定期写入快照文件，重启后预热。
+"""
+
+import json
+import logging
+import os
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+# 负载中表示消息类型的字段（传感器数据为 type，控制命令为 action）
+KIND_FIELDS = ('type', 'action')
+
+
+class LastValue:
+    """缓存条目"""
+
+    __slots__ = ('topic', 'kind', 'sensor_id', 'payload', 'received_at', 'wall_time')
+
+    def __init__(self, topic: str, kind: Optional[str], sensor_id: Optional[str], payload: Dict[str, Any],
+                 received_at: float, wall_time: float):
+        self.topic = topic
+        self.kind = kind
+        self.sensor_id = sensor_id
+        self.payload = payload
+        self.received_at = received_at
+        self.wall_time = wall_time
+
+    @property
+    def age(self) -> float:
+        """距收到时的秒数"""
+        return time.monotonic() - self.received_at
+
+    @property
+    def params(self) -> Dict[str, Any]:
+        params = self.payload.get('params')
+        return params if isinstance(params, dict) else {}
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {'topic': self.topic, 'kind': self.kind, 'sensor_id': self.sensor_id,
+                'payload': self.payload, 'time': self.wall_time}
+
+
+def message_kind(payload: Dict[str, Any]) -> Optional[str]:
+    """消息类型：type 或 action 字段"""
+    for field in KIND_FIELDS:
+        value = payload.get(field)
+        if isinstance(value, str):
+            return value
+    return None
+
+
+class LastValueCache:
+    """最新值缓存（线程安全，查询均为 O(1)）"""
+
+    def __init__(self):
+        self._entries: Dict[Tuple[str, Optional[str]], LastValue] = {}
+        # 类型 -> 最近一条；(类型, 传感器ID) -> 最近一条
+        self._by_kind: Dict[str, LastValue] = {}
+        self._by_sensor: Dict[Tuple[str, str], LastValue] = {}
+        self._lock = threading.Lock()
+        self._dirty = False
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def update(self, topic: str, payload: Dict[str, Any], sensor_id: Optional[str] = None,
+               received_at: Optional[float] = None, wall_time: Optional[float] = None) -> LastValue:
+        """
+        记录一条消息
+
+        Args:
+            topic: 主题
+            payload: 已解码的消息
+            sensor_id: 传感器ID（分层主题的最后一级）
+            received_at: 收到时刻（time.monotonic()），默认为当前时刻
+            wall_time: 收到时的墙钟时间，默认为当前时间
+        """
+        kind = message_kind(payload)
+        entry = LastValue(topic, kind, sensor_id, payload,
+                          time.monotonic() if received_at is None else received_at,
+                          time.time() if wall_time is None else wall_time)
+        with self._lock:
+            self._entries[(topic, kind)] = entry
+            if kind is not None:
+                self._put_latest(self._by_kind, kind, entry)
+                if sensor_id is not None:
+                    self._put_latest(self._by_sensor, (kind, sensor_id), entry)
+            self._dirty = True
+        return entry
+
+    @staticmethod
+    def _put_latest(index: Dict, key, entry: LastValue):
+        current = index.get(key)
+        if current is None or current.received_at <= entry.received_at:
+            index[key] = entry
+
+    def get(self, topic: str, kind: Optional[str] = None) -> Optional[LastValue]:
+        """按主题（及类型）查询"""
+        return self._entries.get((topic, kind))
+
+    def latest(self, kind: str, sensor_id: Optional[str] = None) -> Optional[LastValue]:
+        """按类型（及传感器ID）查询最近一条，不限主题"""
+        if sensor_id is None:
+            return self._by_kind.get(kind)
+        return self._by_sensor.get((kind, sensor_id))
+
+    def value(self, kind: str, field: str, sensor_id: Optional[str] = None,
+              max_age: Optional[float] = None, default: Any = None) -> Any:
+        """
+        读取最近一条消息 params 中的字段
+
+        Args:
+            kind: 消息类型（如 temperature_humidity）
+            field: params 中的字段（如 temperature）
+            sensor_id: 传感器ID，不指定时取任一传感器的最近一条
+            max_age: 最大允许的数据年龄（秒），超过时返回 default
+            default: 无数据或数据过旧时的返回值
+        """
+        entry = self.latest(kind, sensor_id)
+        if entry is None or (max_age is not None and entry.age > max_age):
+            return default
+        return entry.params.get(field, default)
+
+    def age(self, kind: str, sensor_id: Optional[str] = None) -> Optional[float]:
+        """最近一条消息的年龄（秒），无数据时为 None"""
+        entry = self.latest(kind, sensor_id)
+        return entry.age if entry is not None else None
+
+    def is_stale(self, kind: str, max_age: float, sensor_id: Optional[str] = None) -> bool:
+        """无数据或最近一条超过 max_age 秒时为 True"""
+        age = self.age(kind, sensor_id)
+        return age is None or age > max_age
+
+    def entries(self) -> List[LastValue]:
+        with self._lock:
+            return list(self._entries.values())
+
+    # ---- 快照 ----
+
+    def save(self, path: str) -> bool:
+        """原子写入 JSON 快照，自上次保存后无变化时跳过"""
+        with self._lock:
+            if not self._dirty:
+                return False
+            records = [entry.to_dict() for entry in self._entries.values()]
+            self._dirty = False
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        try:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(records, f, ensure_ascii=False, default=str)
+            os.replace(tmp_path, path)
+            return True
+        except (OSError, TypeError, ValueError) as e:
+            logging.error(f"写入最新值快照失败: {e}")
+            self._dirty = True
+            return False
+
+    def load(self, path: str, max_age: Optional[float] = None) -> int:
+        """
+        从快照恢复（数据年龄按快照中的墙钟时间计算）
+
+        Args:
+            path: 快照文件
+            max_age: 忽略早于该秒数的条目
+
+        Returns:
+            恢复的条目数
+        """
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                records = json.load(f)
+        except FileNotFoundError:
+            return 0
+        except (OSError, ValueError) as e:
+            logging.warning(f"读取最新值快照失败，忽略: {e}")
+            return 0
+
+        now_wall, now_mono = time.time(), time.monotonic()
+        loaded = 0
+        for record in records:
+            try:
+                topic, payload, wall_time = record['topic'], record['payload'], float(record['time'])
+            except (KeyError, TypeError, ValueError):
+                continue
+            age = max(0.0, now_wall - wall_time)
+            if not isinstance(payload, dict) or (max_age is not None and age > max_age):
+                continue
+            self.update(topic, payload, record.get('sensor_id'),
+                        received_at=now_mono - age, wall_time=wall_time)
+            loaded += 1
+        with self._lock:
+            self._dirty = False
+        return loaded
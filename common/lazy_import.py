@@ -0,0 +1,43 @@
+# -*- coding: utf-8 -*-
+"""
+延迟导入
+硬件库（board、adafruit_*、luma）和图像库导入耗时较长，模块加载时只登记，首次访问属性时才执行模块代码：
+
+    board = lazy_import('board')
+    ...
+    pin = board.D26  # 此时才真正导入
+
+模块是否存在在登记时即检查，缺失时照常抛出 ImportError，原有的 try/except 降级逻辑不受影响；
+模块代码执行时的错误（如非树莓派平台上的 board）推迟到首次使用时抛出。
+"""
+
+import importlib.util
+import sys
+from types import ModuleType
+
+
+def lazy_import(name: str) -> ModuleType:
+    """
+    登记一个延迟导入的模块
+
+    Args:
+        name: 模块全名（可带包名，如 adafruit_ads1x15.ads1115，父包会立即导入）
+
+    Returns:
+        模块对象，首次访问属性时完成导入；已导入的模块直接返回
+    """
+    module = sys.modules.get(name)
+    if module is not None:
+        return module
+    spec = importlib.util.find_spec(name)
+    if spec is None:
+        raise ModuleNotFoundError(f"No module named '{name}'", name=name)
+    loader = importlib.util.LazyLoader(spec.loader)
+    spec.loader = loader
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[name] = module
+    loader.exec_module(module)
+    parent, _, child = name.rpartition('.')
+    if parent:
+        setattr(sys.modules[parent], child, module)
+    return module
@@ -0,0 +1,278 @@
+# -*- coding: utf-8 -*-
+"""
+统一日志配置
+替代各模块各自的 setup_logging / basicConfig：
+- 调用线程只把日志记录放入队列，格式化和文件写入由后台线程完成，SD 卡上的同步写入不再阻塞发布和消息回调
+- 按调用位置（文件+行号）限速：INFO 及以下级别超出速率时丢弃，下一条输出的记录中注明丢弃条数
+- 按调用位置采样：logger.debug("收到: %s", payload, extra={'log_every': 10}) 每 10 次输出 1 次
+- 环形缓冲区保留最近 N 条记录（可低于输出级别），收到 SIGUSR1 或调用 dump_ring() 时写出
+
+    from log_setup import setup_logging, load_logging_config
+    setup_logging(**load_logging_config('config.ini'))
+"""
+
+import atexit
+import collections
+import configparser
+import logging
+import logging.handlers
+import queue
+import signal
+import sys
+import threading
+import time
+from typing import Any, Deque, Dict, Optional, Tuple, Union
+
+DEFAULT_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+
+# 参数中含可变容器时在调用线程格式化，避免后台线程格式化时内容已被修改
+_MUTABLE_TYPES = (dict, list, set, bytearray)
+
+
+def _freeze(record: logging.LogRecord):
+    """必要时在调用线程固化消息文本（幂等）"""
+    args = record.args
+    if not args:
+        return
+    values = args.values() if isinstance(args, dict) else args
+    if any(isinstance(value, _MUTABLE_TYPES) for value in values):
+        record.msg = record.getMessage()
+        record.args = None
+
+
+class LazyQueueHandler(logging.handlers.QueueHandler):
+    """只入队不格式化的 QueueHandler（同一进程内的队列，不需要把记录转换为可序列化的文本）"""
+
+    def __init__(self, log_queue: queue.Queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        _freeze(record)
+        return record
+
+    def enqueue(self, record: logging.LogRecord):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            # 后台写入跟不上时丢弃，不阻塞调用线程
+            self.dropped += 1
+
+
+class CallSiteFilter(logging.Filter):
+    """按调用位置采样和限速（令牌桶），只作用于 max_level 及以下级别"""
+
+    def __init__(self, rate: float = 0.0, burst: int = 20, max_level: int = logging.INFO):
+        """
+        Args:
+            rate: 每个调用位置每秒允许的记录数，0 表示不限速
+            burst: 令牌桶容量（允许的突发条数）
+            max_level: 高于该级别的记录（WARNING 及以上）不限速
+        """
+        super().__init__()
+        self.rate = float(rate)
+        self.burst = max(1, int(burst))
+        self.max_level = max_level
+        # (文件, 行号) -> [令牌数, 上次补充时刻, 被丢弃条数]
+        self._buckets: Dict[Tuple[str, int], list] = {}
+        # (文件, 行号) -> 调用次数（采样）
+        self._counters: Dict[Tuple[str, int], int] = {}
+        self._lock = threading.Lock()
+        self.suppressed = 0
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno > self.max_level:
+            return True
+        site = (record.pathname, record.lineno)
+        every = getattr(record, 'log_every', None)
+        with self._lock:
+            if every and every > 1:
+                count = self._counters.get(site, 0)
+                self._counters[site] = count + 1
+                if count % every:
+                    return False
+            if self.rate <= 0:
+                return True
+            now = time.monotonic()
+            bucket = self._buckets.get(site)
+            if bucket is None:
+                bucket = self._buckets[site] = [float(self.burst), now, 0]
+            else:
+                bucket[0] = min(self.burst, bucket[0] + (now - bucket[1]) * self.rate)
+                bucket[1] = now
+            if bucket[0] < 1.0:
+                bucket[2] += 1
+                self.suppressed += 1
+                return False
+            bucket[0] -= 1.0
+            dropped, bucket[2] = bucket[2], 0
+        if dropped:
+            record.msg = f"{record.msg}（此前 {dropped} 条同位置日志因限速被丢弃）"
+        return True
+
+
+class RingBufferHandler(logging.Handler):
+    """保留最近 capacity 条记录，按需格式化写出"""
+
+    def __init__(self, capacity: int = 1000, level: int = logging.NOTSET):
+        super().__init__(level)
+        self.records: Deque[logging.LogRecord] = collections.deque(maxlen=max(1, int(capacity)))
+
+    def emit(self, record: logging.LogRecord):
+        _freeze(record)
+        self.records.append(record)
+
+    def dump(self, stream) -> int:
+        """把缓冲区中的记录写入 stream，返回条数"""
+        records = list(self.records)
+        for record in records:
+            try:
+                stream.write(self.format(record) + '\n')
+            except Exception:
+                self.handleError(record)
+        stream.flush()
+        return len(records)
+
+
+class _LoggingState:
+    def __init__(self):
+        self.listener: Optional[logging.handlers.QueueListener] = None
+        self.queue_handler: Optional[LazyQueueHandler] = None
+        self.ring: Optional[RingBufferHandler] = None
+        self.ring_dump = ''
+        self.atexit_registered = False
+
+
+_state = _LoggingState()
+
+
+def _parse_level(level: Union[int, str, None], default: int = logging.INFO) -> int:
+    if level is None or level == '':
+        return default
+    if isinstance(level, int):
+        return level
+    value = logging.getLevelName(str(level).strip().upper())
+    return value if isinstance(value, int) else default
+
+
+def setup_logging(level: Union[int, str] = logging.INFO, log_file: str = '', file_max_bytes: int = 1048576,
+                  file_backups: int = 3, rate_limit: float = 0.0, rate_burst: int = 20, ring_size: int = 0,
+                  ring_level: Union[int, str, None] = None, ring_dump: str = '', queue_size: int = 10000,
+                  fmt: str = DEFAULT_FORMAT) -> None:
+    """
+    配置根日志器（重复调用时替换上一次的配置）
+
+    Args:
+        level: 输出级别
+        log_file: 日志文件，留空只输出到终端；按 file_max_bytes 轮转，保留 file_backups 个旧文件
+        rate_limit: 每个调用位置每秒允许的 INFO/DEBUG 记录数，0 表示不限速
+        rate_burst: 限速允许的突发条数
+        ring_size: 环形缓冲区条数，0 表示不启用
+        ring_level: 环形缓冲区记录级别（可低于 level，如 DEBUG），默认与 level 相同
+        ring_dump: SIGUSR1 时写出环形缓冲区的文件，留空写到 stderr
+        queue_size: 待写入队列长度，写满时丢弃新记录
+        fmt: 日志格式
+    """
+    stop_logging()
+    level = _parse_level(level)
+    ring_level = _parse_level(ring_level, level) if ring_size else level
+    formatter = logging.Formatter(fmt)
+
+    outputs = []
+    stream_handler = logging.StreamHandler()
+    stream_handler.setFormatter(formatter)
+    outputs.append(stream_handler)
+    if log_file:
+        file_handler = logging.handlers.RotatingFileHandler(
+            log_file, maxBytes=max(0, int(file_max_bytes)), backupCount=max(0, int(file_backups)),
+            encoding='utf-8', delay=True)
+        file_handler.setFormatter(formatter)
+        outputs.append(file_handler)
+
+    log_queue: queue.Queue = queue.Queue(maxsize=max(1, int(queue_size)))
+    queue_handler = LazyQueueHandler(log_queue)
+    queue_handler.setLevel(level)
+    queue_handler.addFilter(CallSiteFilter(rate_limit, rate_burst))
+    listener = logging.handlers.QueueListener(log_queue, *outputs, respect_handler_level=True)
+
+    root = logging.getLogger()
+    for handler in root.handlers[:]:
+        root.removeHandler(handler)
+        handler.close()
+    root.setLevel(min(level, ring_level))
+    ring = None
+    if ring_size:
+        # 先于队列处理器：记录在调用线程中固化后再交给后台线程
+        ring = RingBufferHandler(ring_size, ring_level)
+        ring.setFormatter(formatter)
+        root.addHandler(ring)
+        _install_dump_signal()
+    root.addHandler(queue_handler)
+
+    listener.start()
+    _state.listener = listener
+    _state.queue_handler = queue_handler
+    _state.ring = ring
+    _state.ring_dump = ring_dump
+    if not _state.atexit_registered:
+        atexit.register(stop_logging)
+        _state.atexit_registered = True
+
+
+def stop_logging() -> None:
+    """停止后台写入线程（写完队列中剩余的记录）"""
+    listener, _state.listener = _state.listener, None
+    if listener is not None:
+        listener.stop()
+    handler = _state.queue_handler
+    if handler is not None and handler.dropped:
+        sys.stderr.write(f"日志队列已满，共丢弃 {handler.dropped} 条记录\n")
+        handler.dropped = 0
+
+
+def dump_ring(path: Optional[str] = None) -> int:
+    """
+    写出环形缓冲区中的记录
+
+    Args:
+        path: 输出文件（追加），默认使用 ring_dump 配置，都未配置时写到 stderr
+
+    Returns:
+        写出的条数，未启用环形缓冲区时为 0
+    """
+    ring = _state.ring
+    if ring is None:
+        return 0
+    path = path or _state.ring_dump
+    if not path:
+        return ring.dump(sys.stderr)
+    with open(path, 'a', encoding='utf-8') as f:
+        f.write(f"==== 日志环形缓冲区 {time.strftime('%Y-%m-%d %H:%M:%S')} ====\n")
+        return ring.dump(f)
+
+
+def _install_dump_signal():
+    if not hasattr(signal, 'SIGUSR1'):
+        return
+    try:
+        signal.signal(signal.SIGUSR1, lambda signum, frame: dump_ring())
+    except ValueError:
+        # 只能在主线程安装信号处理器
+        logging.debug("非主线程，未安装 SIGUSR1 日志转储")
+
+
+def load_logging_config(config_file: str) -> Dict[str, Any]:
+    """读取配置文件的 [logging] 段，返回 setup_logging 的参数（文件或段不存在时使用默认值）"""
+    parser = configparser.ConfigParser()
+    parser.read(config_file, encoding='utf-8')
+    return {
+        'level': parser.get('logging', 'level', fallback='INFO'),
+        'log_file': parser.get('logging', 'file', fallback=''),
+        'file_max_bytes': parser.getint('logging', 'file_max_bytes', fallback=1048576),
+        'file_backups': parser.getint('logging', 'file_backups', fallback=3),
+        'rate_limit': parser.getfloat('logging', 'rate_limit', fallback=10.0),
+        'rate_burst': parser.getint('logging', 'rate_burst', fallback=20),
+        'ring_size': parser.getint('logging', 'ring_size', fallback=0),
+        'ring_level': parser.get('logging', 'ring_level', fallback='') or None,
+        'ring_dump': parser.get('logging', 'ring_dump', fallback=''),
+    }
@@ -0,0 +1,202 @@
+# -*- coding: utf-8 -*-
+"""
+消息路由模块
+按 MQTT 主题过滤器（支持 + / # 通配符）和消息字段值（type / action 等）分发消息
+"""
+
+import json
+import logging
+from typing import Any, Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# 表示“该字段任意取值”的占位符
+ANY = object()
+
+
+class TopicTrie:
+    """MQTT 主题过滤器前缀树"""
+
+    __slots__ = ('children', 'values')
+
+    def __init__(self):
+        self.children: Dict[str, 'TopicTrie'] = {}
+        self.values: List[Any] = []
+
+    def insert(self, topic_filter: str, value: Any):
+        """插入主题过滤器及其关联值"""
+        node = self
+        for level in topic_filter.split('/'):
+            node = node.children.setdefault(level, TopicTrie())
+        node.values.append(value)
+
+    def match(self, topic: str) -> List[Any]:
+        """返回所有匹配该主题的过滤器关联值"""
+        results: List[Any] = []
+        levels = topic.split('/')
+        # 以 $ 开头的主题不被通配符匹配（MQTT 规范）
+        self._match(levels, 0, results, topic.startswith('$'))
+        return results
+
+    def _match(self, levels: List[str], index: int, results: List[Any], system_topic: bool):
+        wildcard_allowed = not (system_topic and index == 0)
+        if wildcard_allowed and '#' in self.children:
+            results.extend(self.children['#'].values)
+        if index == len(levels):
+            results.extend(self.values)
+            return
+        child = self.children.get(levels[index])
+        if child is not None:
+            child._match(levels, index + 1, results, system_topic)
+        if wildcard_allowed and '+' in self.children:
+            self.children['+']._match(levels, index + 1, results, system_topic)
+
+
+class _RouteEntry:
+    """单个主题过滤器下注册的处理器集合"""
+
+    __slots__ = ('topic_handlers', 'field_handlers', 'field_defaults')
+
+    def __init__(self):
+        # 不关心消息内容，收到该主题的消息即调用
+        self.topic_handlers: List[Callable] = []
+        # field -> {value -> [handler]}
+        self.field_handlers: Dict[str, Dict[Any, List[Callable]]] = {}
+        # field -> [handler]，该字段取值未被注册时调用
+        self.field_defaults: Dict[str, List[Callable]] = {}
+
+
+class MessageRouter:
+    """主题 + 字段值两级路由表
+
+    主题匹配结果按主题缓存，字段值分发为字典查找，
+    因此分发开销不随传感器类型、动作数量的增加而增长。
+    """
+
+    def __init__(self):
+        self._trie = TopicTrie()
+        self._entries: Dict[str, _RouteEntry] = {}
+        self._match_cache: Dict[str, List[_RouteEntry]] = {}
+        self._needle_cache: Dict[str, Optional[List[bytes]]] = {}
+
+    def __bool__(self) -> bool:
+        return bool(self._entries)
+
+    def add_route(self, topic_filter: str, handler: Callable[[str, Dict[str, Any]], Any],
+                  field: Optional[str] = None, value: Any = ANY):
+        """
+        注册路由
+
+        Args:
+            topic_filter: 主题过滤器，支持 + 和 # 通配符
+            handler: 处理函数，签名为 (topic, payload)
+            field: 按该字段的取值分发，为 None 时该主题的所有消息都交给 handler
+            value: 字段取值；为 ANY 时作为该字段未匹配取值的默认处理器
+        """
+        entry = self._entries.get(topic_filter)
+        if entry is None:
+            entry = _RouteEntry()
+            self._entries[topic_filter] = entry
+            self._trie.insert(topic_filter, entry)
+
+        if field is None:
+            entry.topic_handlers.append(handler)
+        elif value is ANY:
+            entry.field_defaults.setdefault(field, []).append(handler)
+        else:
+            entry.field_handlers.setdefault(field, {}).setdefault(value, []).append(handler)
+
+        self._match_cache.clear()
+        self._needle_cache.clear()
+
+    def _match(self, topic: str) -> List[_RouteEntry]:
+        entries = self._match_cache.get(topic)
+        if entries is None:
+            entries = self._trie.match(topic)
+            self._match_cache[topic] = entries
+        return entries
+
+    def _needles(self, topic: str) -> Optional[List[bytes]]:
+        """计算主题对应的预过滤关键字；返回 None 表示无法预过滤"""
+        if topic in self._needle_cache:
+            return self._needle_cache[topic]
+
+        needles: Optional[List[bytes]] = []
+        for entry in self._match(topic):
+            if entry.topic_handlers or entry.field_defaults:
+                needles = None
+                break
+            for values in entry.field_handlers.values():
+                for value in values:
+                    if isinstance(value, str) and not value.isascii():
+                        needles = None
+                        break
+                    needles.append(json.dumps(value).encode('ascii'))
+                if needles is None:
+                    break
+            if needles is None:
+                break
+
+        self._needle_cache[topic] = needles
+        return needles
+
+    def accepts(self, topic: str, raw: bytes) -> bool:
+        """
+        解码前的快速预过滤
+
+        只在原始负载中查找已注册的字段取值，找不到的消息一定不会被处理，
+        可在完整 JSON 解码前直接丢弃。
+
+        Args:
+            topic: 主题
+            raw: 原始负载
+
+        Returns:
+            消息是否可能被处理
+        """
+        if not self._match(topic):
+            return False
+        needles = self._needles(topic)
+        if needles is None:
+            return True
+        return any(needle in raw for needle in needles)
+
+    def dispatch(self, topic: str, payload: Dict[str, Any]) -> bool:
+        """
+        分发已解码的消息
+
+        Args:
+            topic: 主题
+            payload: 消息内容
+
+        Returns:
+            是否有处理器处理了该消息
+        """
+        handled = False
+        for entry in self._match(topic):
+            for handler in entry.topic_handlers:
+                handler(topic, payload)
+                handled = True
+
+            if not isinstance(payload, dict):
+                continue
+
+            for field, values in entry.field_handlers.items():
+                value = payload.get(field)
+                try:
+                    handlers = values.get(value)
+                except TypeError:
+                    handlers = None
+                if handlers is None:
+                    handlers = entry.field_defaults.get(field, [])
+                for handler in handlers:
+                    handler(topic, payload)
+                    handled = True
+
+            for field, handlers in entry.field_defaults.items():
+                if field in entry.field_handlers:
+                    continue
+                for handler in handlers:
+                    handler(topic, payload)
+                    handled = True
+        return handled
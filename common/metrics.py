@@ -0,0 +1,274 @@
+# -*- coding: utf-8 -*-
+"""
+运行指标
+计数器、直方图和回调型指标，可输出为 Prometheus 文本格式或 JSON 快照
+"""
+
+import bisect
+import os
+import threading
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+# 默认耗时分桶（秒），覆盖 0.5ms ~ 10s
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# 每个指标最多保留的标签组合数，超出部分合并到 _other，避免主题过多时无限增长
+MAX_SERIES = 200
+OTHER = '_other'
+
+
+def _escape(value: Any) -> str:
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _format_labels(labelnames: Tuple[str, ...], labelvalues: Tuple[Any, ...],
+                   extra: Iterable[Tuple[str, Any]] = ()) -> str:
+    pairs = list(zip(labelnames, labelvalues)) + list(extra)
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in pairs) + '}'
+
+
+def _format_value(value: float) -> str:
+    if value == float('inf'):
+        return '+Inf'
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class _Metric:
+    """带标签的指标基类"""
+
+    kind = 'untyped'
+
+    def __init__(self, name: str, help_text: str, labelnames: Tuple[str, ...] = ()):
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._series: Dict[Tuple[Any, ...], Any] = {}
+
+    def _key(self, labelvalues: Tuple[Any, ...]) -> Tuple[Any, ...]:
+        """调用方需持有锁"""
+        if len(labelvalues) != len(self.labelnames):
+            raise ValueError(f"指标 {self.name} 需要标签 {self.labelnames}，实际为 {labelvalues}")
+        if labelvalues in self._series or len(self._series) < MAX_SERIES:
+            return labelvalues
+        return (OTHER,) * len(labelvalues)
+
+    def header(self) -> List[str]:
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+
+
+class Counter(_Metric):
+    """单调递增计数器"""
+
+    kind = 'counter'
+
+    def inc(self, *labelvalues, amount: float = 1.0):
+        with self._lock:
+            key = self._key(labelvalues)
+            self._series[key] = self._series.get(key, 0.0) + amount
+
+    def value(self, *labelvalues) -> float:
+        return self._series.get(labelvalues, 0.0)
+
+    def render(self, extra: Iterable[Tuple[str, Any]] = ()) -> List[str]:
+        with self._lock:
+            items = list(self._series.items())
+        return [f"{self.name}{_format_labels(self.labelnames, key, extra)} {_format_value(value)}"
+                for key, value in items]
+
+    def snapshot(self) -> Any:
+        with self._lock:
+            if not self.labelnames:
+                return self._series.get((), 0.0)
+            return {'/'.join(map(str, key)) if len(key) > 1 else key[0]: value
+                    for key, value in self._series.items()}
+
+
+class _HistogramSeries:
+    __slots__ = ('counts', 'sum', 'count', 'max')
+
+    def __init__(self, n: int):
+        self.counts = [0] * n
+        self.sum = 0.0
+        self.count = 0
+        self.max = 0.0
+
+
+class Histogram(_Metric):
+    """分桶直方图（同时记录最大值，便于发现偶发的长尾）"""
+
+    kind = 'histogram'
+
+    def __init__(self, name: str, help_text: str, labelnames: Tuple[str, ...] = (),
+                 buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        super().__init__(name, help_text, labelnames)
+        self.buckets = tuple(sorted(buckets)) + (float('inf'),)
+
+    def observe(self, value: float, *labelvalues):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            key = self._key(labelvalues)
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = _HistogramSeries(len(self.buckets))
+            series.counts[index] += 1
+            series.sum += value
+            series.count += 1
+            if value > series.max:
+                series.max = value
+
+    def render(self, extra: Iterable[Tuple[str, Any]] = ()) -> List[str]:
+        extra = list(extra)
+        lines = []
+        with self._lock:
+            items = [(key, list(s.counts), s.sum, s.count) for key, s in self._series.items()]
+        for key, counts, total, count in items:
+            cumulative = 0
+            for bound, n in zip(self.buckets, counts):
+                cumulative += n
+                labels = _format_labels(self.labelnames + ('le',), key + (_format_value(bound),), extra)
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            labels = _format_labels(self.labelnames, key, extra)
+            lines.append(f"{self.name}_sum{labels} {_format_value(total)}")
+            lines.append(f"{self.name}_count{labels} {count}")
+        return lines
+
+    def _quantile(self, counts: List[int], count: int, q: float, maximum: float) -> float:
+        """在所在分桶内线性插值估算分位数（不超过实际最大值）"""
+        target = q * count
+        cumulative = 0
+        lower = 0.0
+        for bound, n in zip(self.buckets, counts):
+            if n and cumulative + n >= target:
+                upper = min(bound, maximum)
+                return lower + (upper - lower) * (target - cumulative) / n
+            cumulative += n
+            lower = bound
+        return maximum
+
+    def snapshot(self) -> Any:
+        result = {}
+        with self._lock:
+            for key, s in self._series.items():
+                name = '/'.join(map(str, key)) if len(key) > 1 else (key[0] if key else '')
+                result[name] = {
+                    'count': s.count,
+                    'avg': s.sum / s.count if s.count else 0.0,
+                    'p50': self._quantile(s.counts, s.count, 0.5, s.max),
+                    'p95': self._quantile(s.counts, s.count, 0.95, s.max),
+                    'max': s.max,
+                }
+        return result.get('', result) if not self.labelnames else result
+
+
+class CallbackMetric:
+    """读取时才求值的指标（队列深度、连接状态等），回调返回数值或 {标签值: 数值}"""
+
+    def __init__(self, name: str, help_text: str, func: Callable[[], Any], kind: str = 'gauge',
+                 labelname: Optional[str] = None):
+        self.name = name
+        self.help = help_text
+        self.func = func
+        self.kind = kind
+        self.labelname = labelname
+
+    def _values(self) -> Dict[Any, float]:
+        try:
+            value = self.func()
+        except Exception:
+            return {}
+        if value is None:
+            return {}
+        if isinstance(value, dict):
+            return {k: float(v) for k, v in value.items() if v is not None}
+        return {None: float(value)}
+
+    def header(self) -> List[str]:
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+
+    def render(self, extra: Iterable[Tuple[str, Any]] = ()) -> List[str]:
+        lines = []
+        for key, value in self._values().items():
+            if key is None:
+                labels = _format_labels((), (), extra)
+            else:
+                labels = _format_labels((self.labelname or 'name',), (key,), extra)
+            lines.append(f"{self.name}{labels} {_format_value(value)}")
+        return lines
+
+    def snapshot(self) -> Any:
+        values = self._values()
+        return values.get(None) if list(values) == [None] else values or None
+
+
+class MetricsRegistry:
+    """指标注册表"""
+
+    def __init__(self, labels: Optional[Dict[str, Any]] = None):
+        """
+        初始化注册表
+
+        Args:
+            labels: 附加到所有 Prometheus 样本上的常量标签（如 module、sensor_id）
+        """
+        self.labels = dict(labels or {})
+        self._metrics: Dict[str, Any] = {}
+        self._lock = threading.Lock()
+
+    def _register(self, metric):
+        with self._lock:
+            existing = self._metrics.get(metric.name)
+            if existing is not None:
+                return existing
+            self._metrics[metric.name] = metric
+            return metric
+
+    def counter(self, name: str, help_text: str, labelnames: Tuple[str, ...] = ()) -> Counter:
+        return self._register(Counter(name, help_text, labelnames))
+
+    def histogram(self, name: str, help_text: str, labelnames: Tuple[str, ...] = (),
+                  buckets: Tuple[float, ...] = DEFAULT_BUCKETS) -> Histogram:
+        return self._register(Histogram(name, help_text, labelnames, buckets))
+
+    def gauge_callback(self, name: str, help_text: str, func: Callable[[], Any],
+                       labelname: Optional[str] = None) -> CallbackMetric:
+        return self._register(CallbackMetric(name, help_text, func, 'gauge', labelname))
+
+    def counter_callback(self, name: str, help_text: str, func: Callable[[], Any],
+                         labelname: Optional[str] = None) -> CallbackMetric:
+        return self._register(CallbackMetric(name, help_text, func, 'counter', labelname))
+
+    def render_prometheus(self) -> str:
+        """Prometheus 文本格式（exposition format 0.0.4）"""
+        extra = sorted(self.labels.items())
+        lines = []
+        with self._lock:
+            metrics = list(self._metrics.values())
+        for metric in metrics:
+            samples = metric.render(extra)
+            if samples:
+                lines.extend(metric.header())
+                lines.extend(samples)
+        return '\n'.join(lines) + '\n'
+
+    def snapshot(self) -> Dict[str, Any]:
+        """JSON 快照：计数器为数值或 {标签: 数值}，直方图为 count/avg/p50/p95/max"""
+        with self._lock:
+            metrics = list(self._metrics.values())
+        result = {}
+        for metric in metrics:
+            value = metric.snapshot()
+            if value not in (None, {}):
+                result[metric.name] = value
+        return result
+
+    def write_textfile(self, path: str):
+        """原子写入 Prometheus 文本文件（供 node_exporter textfile collector 读取）"""
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write(self.render_prometheus())
+        os.replace(tmp_path, path)
@@ -0,0 +1,616 @@
+# -*- coding: utf-8 -*-
+"""
+模块宿主
+把多个传感器/执行器/管理器模块作为插件加载到同一个进程中：
+共用一条MQTT连接，进程内的消息直接回环投递，单个模块出错只重启该模块
+"""
+
+import importlib.util
+import itertools
+import logging
+import os
+import queue
+import signal
+import sys
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple
+
+import paho.mqtt.client as mqtt
+
+from connection_manager import Backoff, ConnectionManager, parse_brokers
+from message_router import TopicTrie
+import mqtt5
+from mqtt5 import TopicAliases
+
+logger = logging.getLogger(__name__)
+
+# 仓库根目录
+REPO_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+# 已知模块：名称 -> 入口脚本（相对仓库根目录），入口脚本需提供 create_module(config_file, **overrides)
+KNOWN_MODULES = {
+    'temperature_humidity': 'sensors/temperature_humidity/temperature_humidity_pub.py',
+    'pir': 'sensors/pir/pir_pub.py',
+    'potentiometer': 'sensors/potentiometer/potentiometer_pub.py',
+    'button': 'sensors/button/button_pub.py',
+    'oled': 'actuators/oled/oled_sub.py',
+    'audio': 'actuators/audio/audio_sub.py',
+    'buzzer': 'actuators/buzzer/buzzer_sub.py',
+    'oled_manager': 'manager/oled_manager/oled_manager.py',
+    'auto_screen_switch_manager': 'manager/auto_screen_switch_manager/auto_screen_switch_manager.py',
+}
+
+# 回环投递等待代理回显的时间窗口（秒）
+ECHO_WINDOW = 10.0
+
+
+def load_plugin(name: str, entry_path: str):
+    """
+    隔离加载插件入口脚本
+
+    各模块目录下有同名的扁平模块（config、controller、publisher、sensor 等），
+    加载完成后把该目录下的模块改名为 hostplugin_<name>.<模块名>，
+    下一个插件导入同名模块时不会拿到前一个插件的模块。
+
+    Args:
+        name: 插件名称
+        entry_path: 入口脚本路径
+
+    Returns:
+        入口模块对象
+    """
+    plugin_dir = os.path.dirname(os.path.abspath(entry_path))
+    prefix = f"hostplugin_{name}"
+    local_names = {os.path.splitext(f)[0] for f in os.listdir(plugin_dir) if f.endswith('.py')}
+    # 清除同名模块，保证导入的是本插件目录下的文件
+    stashed = {mod: sys.modules.pop(mod) for mod in local_names if mod in sys.modules}
+
+    sys.path.insert(0, plugin_dir)
+    try:
+        spec = importlib.util.spec_from_file_location(prefix, entry_path)
+        module = importlib.util.module_from_spec(spec)
+        sys.modules[prefix] = module
+        spec.loader.exec_module(module)
+    except Exception:
+        sys.modules.pop(prefix, None)
+        raise
+    finally:
+        sys.path.remove(plugin_dir)
+        for mod in local_names:
+            loaded = sys.modules.get(mod)
+            if loaded is not None and os.path.dirname(os.path.abspath(getattr(loaded, '__file__', '') or '')) == plugin_dir:
+                sys.modules[f"{prefix}.{mod}"] = sys.modules.pop(mod)
+        sys.modules.update(stashed)
+
+    # 运行期延迟导入的模块（如 edge_tts_api）仍能找到；同名模块已在上面改名，不受影响
+    if plugin_dir not in sys.path:
+        sys.path.append(plugin_dir)
+
+    if not hasattr(module, 'create_module'):
+        raise ImportError(f"插件 {name} 的入口脚本没有 create_module 函数: {entry_path}")
+    return module
+
+
+class _ViewConnection:
+    """客户端视图的连接管理接口：连接由宿主统一维护，模块的 connect/stop 只挂接/摘除视图"""
+
+    def __init__(self, shared: 'SharedConnection', view: 'SharedClientView'):
+        self._shared = shared
+        self._view = view
+
+    @property
+    def backoff(self) -> Backoff:
+        return self._shared.manager.backoff
+
+    @property
+    def current_broker(self) -> Tuple[str, int]:
+        return self._shared.manager.current_broker
+
+    def start(self):
+        self._shared.attach(self._view)
+
+    def stop(self, timeout: float = 3.0):
+        self._shared.detach(self._view)
+
+    def connect_once(self) -> bool:
+        return self._shared.client.is_connected()
+
+    def call_soon(self, func: Callable, *args, delay: float = 0.0):
+        self._shared.manager.call_soon(func, *args, delay=delay)
+
+    def on_connack(self, rc: int):
+        """连接统计由宿主的连接管理器记录"""
+
+    def mark_down(self):
+        """连接统计由宿主的连接管理器记录"""
+
+    def stats(self) -> Dict[str, Any]:
+        return self._shared.manager.stats()
+
+
+class SharedClientView:
+    """共享连接上的单个模块视图
+
+    提供模块用到的 paho 客户端接口（回调属性、publish、subscribe、unsubscribe、is_connected），
+    订阅只登记到宿主的路由表，发布时本进程内的订阅者直接回环投递。
+    """
+
+    def __init__(self, shared: 'SharedConnection', name: str):
+        self.shared = shared
+        self.name = name
+        self.connection = _ViewConnection(shared, self)
+        self.filters: Dict[str, int] = {}
+        self.on_connect: Optional[Callable] = None
+        self.on_disconnect: Optional[Callable] = None
+        self.on_publish: Optional[Callable] = None
+        self.on_message: Optional[Callable] = None
+        self.on_subscribe: Optional[Callable] = None
+
+    def __repr__(self) -> str:
+        return f"SharedClientView({self.name})"
+
+    def is_connected(self) -> bool:
+        return self.shared.client.is_connected()
+
+    def publish(self, topic: str, payload=None, qos: int = 0, retain: bool = False, properties=None):
+        return self.shared.publish(self, topic, payload, qos, retain, properties)
+
+    def subscribe(self, topic: str, qos: int = 0, *args, **kwargs):
+        return self.shared.subscribe(self, topic, qos)
+
+    def unsubscribe(self, topic: str, *args, **kwargs):
+        return self.shared.unsubscribe(self, topic)
+
+    def disconnect(self, *args, **kwargs):
+        self.shared.detach(self)
+        return mqtt.MQTT_ERR_SUCCESS
+
+
+class SharedConnection:
+    """宿主进程内唯一的MQTT连接
+
+    - 代理下发的消息按各视图的订阅过滤器分发，回调异常只影响出错的模块
+    - 本进程发布的消息通过回环线程直接投递给本进程的订阅者，
+      代理随后回显的同一消息被丢弃（回显抑制），不会重复处理
+    - 同一过滤器只向代理订阅一次，后订阅的模块从保留消息缓存中补发保留消息
+    """
+
+    def __init__(self, config: Dict[str, Any]):
+        self.client = mqtt5.create_client(config)
+        brokers = parse_brokers(config.get('mqtt_brokers'), config.get('mqtt_broker', 'localhost'),
+                                config.get('mqtt_port', 1883))
+        self.manager = ConnectionManager(
+            self.client, brokers,
+            keepalive=config.get('keepalive', 60),
+            connect_timeout=config.get('connect_timeout', 5.0),
+            backoff=Backoff.from_config(config),
+            name='host-mqtt-network',
+            connect_properties=mqtt5.connect_properties(config),
+        )
+        # MQTT v5 主题别名属于整条连接，由宿主统一分配（模块自身不分配）
+        alias_maximum = int(config.get('topic_alias_maximum', 16))
+        self.aliases: Optional[TopicAliases] = (
+            TopicAliases(alias_maximum) if mqtt5.is_v5(config) and alias_maximum > 0 else None)
+        self.client.on_connect = self._on_connect
+        self.client.on_disconnect = self._on_disconnect
+        self.client.on_message = self._on_message
+        self.client.on_publish = self._on_publish
+        self.client.on_subscribe = self._on_subscribe
+
+        self._lock = threading.RLock()
+        self._views: List[SharedClientView] = []
+        # 过滤器 -> 订阅了该过滤器的视图
+        self._filters: Dict[str, Set[SharedClientView]] = {}
+        self._trie = TopicTrie()
+        self._match_cache: Dict[str, List[SharedClientView]] = {}
+        # 本次连接中已向代理订阅的过滤器及其 QoS、已收到 SUBACK 的过滤器
+        self._real_subs: Dict[str, int] = {}
+        self._settled: Set[str] = set()
+        # mid -> (视图, 过滤器)
+        self._sub_mids: Dict[int, Tuple[SharedClientView, str]] = {}
+        self._fake_mids = itertools.count(1 << 20)
+        self._retained: Dict[str, mqtt.MQTTMessage] = {}
+        # (topic, payload) -> [过期时间]，等待代理回显的本地消息
+        self._echoes: Dict[Tuple[str, bytes], List[float]] = {}
+
+        self._loopback: "queue.Queue[Optional[Callable]]" = queue.Queue(maxsize=config.get('loopback_queue_size', 1000))
+        self._loopback_thread: Optional[threading.Thread] = None
+
+        # 统计信息
+        self.stats = {
+            'loopback_delivered': 0,
+            'loopback_dropped': 0,
+            'echo_suppressed': 0,
+            'remote_delivered': 0,
+            'callback_errors': 0,
+        }
+
+    # ---- 生命周期 ----
+
+    def start(self):
+        """启动网络线程与回环线程"""
+        if self._loopback_thread is None:
+            self._loopback_thread = threading.Thread(target=self._loopback_loop, name='host-loopback', daemon=True)
+            self._loopback_thread.start()
+        self.manager.start()
+
+    def stop(self):
+        """断开连接并停止回环线程"""
+        self.manager.stop()
+        if self._loopback_thread is not None:
+            self._loopback.put(None)
+            self._loopback_thread.join(timeout=2.0)
+            self._loopback_thread = None
+        logger.info(f"共享连接已停止，统计: {self.stats}")
+
+    def create_view(self, name: str) -> SharedClientView:
+        return SharedClientView(self, name)
+
+    def attach(self, view: SharedClientView):
+        """模块 connect() 时挂接视图；已连接时立即补发 on_connect，模块据此订阅"""
+        with self._lock:
+            if view not in self._views:
+                self._views.append(view)
+        if self.client.is_connected():
+            self._enqueue(lambda: self._call(view, view.on_connect, view, None, {}, 0))
+
+    def detach(self, view: SharedClientView):
+        """模块停止时摘除视图并退订不再需要的过滤器"""
+        with self._lock:
+            if view in self._views:
+                self._views.remove(view)
+            for topic_filter in list(view.filters):
+                self._remove_filter(view, topic_filter)
+
+    # ---- 回调分发 ----
+
+    def _call(self, view: SharedClientView, callback: Optional[Callable], *args):
+        """调用模块回调，异常只记录不向上传播"""
+        if callback is None:
+            return
+        try:
+            callback(*args)
+        except Exception as e:
+            self.stats['callback_errors'] += 1
+            logger.error(f"模块 {view.name} 回调出错: {e}")
+
+    def _on_connect(self, client, userdata, flags, rc, properties=None):
+        if rc == 0:
+            host, port = self.manager.current_broker
+            logger.info(f"宿主已连接到MQTT代理: {host}:{port}")
+            if self.aliases is not None:
+                self.aliases.reset(client, properties)
+            with self._lock:
+                self._real_subs.clear()
+                self._settled.clear()
+                self._sub_mids.clear()
+                self._retained.clear()
+        else:
+            logger.error(f"宿主MQTT连接失败，错误码: {rc}")
+        self.manager.on_connack(rc)
+        for view in list(self._views):
+            self._call(view, view.on_connect, view, userdata, flags, rc, properties)
+
+    def _on_disconnect(self, client, userdata, rc, *args):
+        if rc != 0:
+            logger.warning(f"宿主MQTT连接意外断开，错误码: {rc}")
+        for view in list(self._views):
+            self._call(view, view.on_disconnect, view, userdata, rc)
+
+    def _on_publish(self, client, userdata, mid, *args):
+        for view in list(self._views):
+            self._call(view, view.on_publish, view, userdata, mid)
+
+    def _on_subscribe(self, client, userdata, mid, granted_qos, *args):
+        with self._lock:
+            owner = self._sub_mids.pop(mid, None)
+            if owner is not None:
+                self._settled.add(owner[1])
+        if owner is not None:
+            self._call(owner[0], owner[0].on_subscribe, owner[0], userdata, mid, granted_qos)
+
+    def _on_message(self, client, userdata, msg):
+        payload = bytes(msg.payload)
+        if msg.retain:
+            with self._lock:
+                if payload:
+                    self._retained[msg.topic] = msg
+                else:
+                    self._retained.pop(msg.topic, None)
+        elif self._consume_echo(msg.topic, payload):
+            self.stats['echo_suppressed'] += 1
+            return
+        for view in self._match(msg.topic):
+            self.stats['remote_delivered'] += 1
+            self._call(view, view.on_message, view, userdata, msg)
+
+    # ---- 订阅 ----
+
+    def _rebuild_trie(self):
+        self._trie = TopicTrie()
+        for topic_filter in self._filters:
+            self._trie.insert(topic_filter, topic_filter)
+        self._match_cache.clear()
+
+    def _match(self, topic: str) -> List[SharedClientView]:
+        with self._lock:
+            views = self._match_cache.get(topic)
+            if views is None:
+                seen = []
+                for topic_filter in self._trie.match(topic):
+                    for view in self._filters.get(topic_filter, ()):
+                        if view not in seen:
+                            seen.append(view)
+                views = seen
+                self._match_cache[topic] = views
+            return views
+
+    def subscribe(self, view: SharedClientView, topic_filter: str, qos: int = 0):
+        """登记视图的订阅；过滤器已在本次连接中订阅过时不再向代理重复订阅"""
+        with self._lock:
+            view.filters[topic_filter] = qos
+            views = self._filters.setdefault(topic_filter, set())
+            if view not in views:
+                views.add(view)
+                self._rebuild_trie()
+
+            if self._real_subs.get(topic_filter, -1) >= qos:
+                mid = next(self._fake_mids)
+                replay = self._retained_for(topic_filter) if topic_filter in self._settled else []
+                self._enqueue(lambda: self._synthetic_suback(view, mid, qos, replay))
+                return mqtt.MQTT_ERR_SUCCESS, mid
+
+            result, mid = self.client.subscribe(topic_filter, qos)
+            if result == mqtt.MQTT_ERR_SUCCESS:
+                self._real_subs[topic_filter] = qos
+                self._sub_mids[mid] = (view, topic_filter)
+            return result, mid
+
+    def _retained_for(self, topic_filter: str) -> List[mqtt.MQTTMessage]:
+        trie = TopicTrie()
+        trie.insert(topic_filter, True)
+        return [msg for topic, msg in self._retained.items() if trie.match(topic)]
+
+    def _synthetic_suback(self, view: SharedClientView, mid: int, qos: int, replay: List[mqtt.MQTTMessage]):
+        self._call(view, view.on_subscribe, view, None, mid, (qos,))
+        for msg in replay:
+            self._call(view, view.on_message, view, None, msg)
+
+    def unsubscribe(self, view: SharedClientView, topic_filter: str):
+        with self._lock:
+            self._remove_filter(view, topic_filter)
+        return mqtt.MQTT_ERR_SUCCESS, next(self._fake_mids)
+
+    def _remove_filter(self, view: SharedClientView, topic_filter: str):
+        view.filters.pop(topic_filter, None)
+        views = self._filters.get(topic_filter)
+        if views is None:
+            return
+        views.discard(view)
+        if not views:
+            del self._filters[topic_filter]
+            self._real_subs.pop(topic_filter, None)
+            self._settled.discard(topic_filter)
+            if self.client.is_connected():
+                self.client.unsubscribe(topic_filter)
+        self._rebuild_trie()
+
+    # ---- 发布与回环 ----
+
+    def publish(self, view: SharedClientView, topic: str, payload, qos: int, retain: bool, properties=None):
+        """本进程订阅者走回环投递，同时发布到代理供其他进程/设备使用"""
+        if payload is None:
+            payload = b''
+        elif isinstance(payload, str):
+            payload = payload.encode('utf-8')
+        elif not isinstance(payload, (bytes, bytearray)):
+            payload = str(payload).encode('utf-8')
+        payload = bytes(payload)
+
+        if properties is not None and self.aliases is not None:
+            info = self.aliases.publish(self.client, topic, payload, qos, retain, properties)
+        elif properties is not None:
+            info = self.client.publish(topic, payload, qos=qos, retain=retain, properties=properties)
+        else:
+            info = self.client.publish(topic, payload, qos=qos, retain=retain)
+
+        if retain:
+            with self._lock:
+                if payload:
+                    msg = mqtt.MQTTMessage(topic=topic.encode('utf-8'))
+                    msg.payload, msg.qos, msg.retain = payload, qos, True
+                    self._retained[topic] = msg
+                else:
+                    self._retained.pop(topic, None)
+
+        targets = self._match(topic)
+        if targets:
+            if info.rc == mqtt.MQTT_ERR_SUCCESS:
+                self._expect_echo(topic, payload)
+            self._enqueue(lambda: self._deliver_local(targets, topic, payload, qos, properties))
+        return info
+
+    def _deliver_local(self, targets: List[SharedClientView], topic: str, payload: bytes, qos: int,
+                       properties=None):
+        msg = mqtt.MQTTMessage(topic=topic.encode('utf-8'))
+        msg.payload, msg.qos, msg.retain = payload, qos, False
+        # v5 属性（content-type、用户属性中的追踪上下文）随回环消息一起投递
+        msg.properties = properties
+        for view in targets:
+            if view in self._views:
+                self.stats['loopback_delivered'] += 1
+                self._call(view, view.on_message, view, None, msg)
+
+    def _expect_echo(self, topic: str, payload: bytes):
+        now = time.monotonic()
+        with self._lock:
+            if len(self._echoes) > 1024:
+                self._echoes = {k: v for k, v in self._echoes.items() if v and v[-1] > now}
+            self._echoes.setdefault((topic, payload), []).append(now + ECHO_WINDOW)
+
+    def _consume_echo(self, topic: str, payload: bytes) -> bool:
+        key = (topic, payload)
+        with self._lock:
+            deadlines = self._echoes.get(key)
+            if not deadlines:
+                return False
+            now = time.monotonic()
+            while deadlines and deadlines[0] < now:
+                deadlines.pop(0)
+            if not deadlines:
+                del self._echoes[key]
+                return False
+            deadlines.pop(0)
+            if not deadlines:
+                del self._echoes[key]
+            return True
+
+    def _enqueue(self, task: Callable):
+        try:
+            self._loopback.put_nowait(task)
+        except queue.Full:
+            self.stats['loopback_dropped'] += 1
+            if self.stats['loopback_dropped'] % 100 == 1:
+                logger.warning(f"回环队列已满，丢弃本地消息（累计丢弃 {self.stats['loopback_dropped']} 条）")
+
+    def _loopback_loop(self):
+        while True:
+            task = self._loopback.get()
+            if task is None:
+                break
+            try:
+                task()
+            except Exception as e:
+                logger.error(f"回环投递出错: {e}")
+
+
+class PluginRunner:
+    """单个插件的运行与监督：模块退出或出错后按退避时间重新创建并启动"""
+
+    # 持续运行超过该时长视为健康，重置退避
+    HEALTHY_SECONDS = 60.0
+
+    def __init__(self, name: str, module, config_file: str, overrides: Dict[str, Any], backoff: Backoff):
+        self.name = name
+        self.module = module
+        self.config_file = config_file
+        self.overrides = overrides
+        self.backoff = backoff
+        self.instance = None
+        self.restarts = 0
+        self._stopping = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._supervise, name=f"module-{self.name}", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 5.0):
+        self._stopping.set()
+        instance = self.instance
+        if instance is not None:
+            try:
+                instance.stop()
+            except Exception as e:
+                logger.error(f"停止模块 {self.name} 时出错: {e}")
+        if self._thread is not None:
+            self._thread.join(timeout=timeout)
+
+    def _supervise(self):
+        while not self._stopping.is_set():
+            started = time.monotonic()
+            try:
+                self.instance = self.module.create_module(self.config_file, **self.overrides)
+                logger.info(f"模块 {self.name} 已启动")
+                runner = getattr(self.instance, 'run', None) or self.instance.start
+                runner()
+            except Exception as e:
+                logger.error(f"模块 {self.name} 运行出错: {e}")
+            finally:
+                if self.instance is not None:
+                    try:
+                        self.instance.stop()
+                    except Exception as e:
+                        logger.debug(f"模块 {self.name} 清理时出错: {e}")
+
+            if self._stopping.is_set():
+                break
+            if time.monotonic() - started > self.HEALTHY_SECONDS:
+                self.backoff.reset()
+            self.restarts += 1
+            delay = self.backoff.next()
+            logger.warning(f"模块 {self.name} 已退出，{delay:.1f}秒后第 {self.restarts} 次重启")
+            self._stopping.wait(delay)
+        logger.info(f"模块 {self.name} 已停止")
+
+
+class ModuleHost:
+    """模块宿主：加载插件、维护共享连接、统一处理信号"""
+
+    def __init__(self, config: Dict[str, Any]):
+        """
+        初始化模块宿主
+
+        Args:
+            config: 配置字典，包含 MQTT 连接参数与 modules（[(名称, 入口脚本, 配置文件)]）
+        """
+        self.config = config
+        self.shared = SharedConnection(config)
+        self.runners: List[PluginRunner] = []
+        self._stop_event = threading.Event()
+
+    def load_modules(self):
+        """在主线程中依次加载插件；加载失败的插件被跳过，不影响其他模块"""
+        for name, entry, config_file in self.config.get('modules', []):
+            try:
+                module = load_plugin(name, entry)
+            except Exception as e:
+                logger.error(f"加载模块 {name} 失败，已跳过: {e}")
+                continue
+            overrides = {
+                'mqtt_client': self.shared.create_view(name),
+                'install_signal_handlers': False,
+                'module_name': name,
+                # 配置中的相对路径（outbox_path、audio_dir 等）按模块目录解析
+                'base_dir': os.path.dirname(os.path.abspath(config_file)),
+                # 模块生成的发布属性须与共享连接的协议版本一致
+                'mqtt_protocol': self.config.get('mqtt_protocol', '3.1.1'),
+            }
+            backoff = Backoff(initial=self.config.get('restart_delay', 5.0),
+                              maximum=self.config.get('restart_max_delay', 300.0))
+            self.runners.append(PluginRunner(name, module, config_file, overrides, backoff))
+            logger.info(f"已加载模块 {name}: {entry}")
+
+    def signal_handler(self, signum, frame):
+        logger.info(f"收到信号 {signum}，正在关闭所有模块...")
+        self._stop_event.set()
+
+    def run(self):
+        """启动共享连接与全部模块，阻塞直到收到退出信号"""
+        signal.signal(signal.SIGINT, self.signal_handler)
+        signal.signal(signal.SIGTERM, self.signal_handler)
+
+        self.load_modules()
+        if not self.runners:
+            logger.error("没有可运行的模块，退出")
+            return
+        self.shared.start()
+        for runner in self.runners:
+            runner.start()
+        logger.info(f"模块宿主已启动，共 {len(self.runners)} 个模块")
+
+        try:
+            while not self._stop_event.wait(1.0):
+                pass
+        finally:
+            self.stop()
+
+    def stop(self):
+        self._stop_event.set()
+        for runner in self.runners:
+            runner._stopping.set()
+        for runner in self.runners:
+            runner.stop()
+        self.shared.stop()
+        logger.info("模块宿主已停止")
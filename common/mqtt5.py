@@ -0,0 +1,322 @@
+# -*- coding: utf-8 -*-
+"""
+MQTT v5 支持
+mqtt_protocol = 5 时由 MQTTBase 使用：
+- 消息过期：按主题或消息动作/类型设置 MessageExpiryInterval，过期的命令由代理丢弃，不会在重连后补投
+- 主题别名：同一连接上重复发布的主题只在首次发送完整主题，之后只发送别名
+- 用户属性：编码名与追踪上下文放在属性中，不再写入负载
+"""
+
+import contextlib
+import json
+import logging
+import math
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+
+import paho.mqtt.client as mqtt
+from paho.mqtt.packettypes import PacketTypes
+from paho.mqtt.properties import Properties
+
+from message_router import TopicTrie
+
+# 用户属性名
+PROP_CODEC = 'codec'
+PROP_TRACE_ID = 'trace_id'
+PROP_TRACE = 'trace'
+PROP_MSG_ID = 'msg_id'
+
+
+def is_v5(config: Dict[str, Any]) -> bool:
+    """配置是否启用 MQTT v5（mqtt_protocol = 5）"""
+    return str(config.get('mqtt_protocol', '3.1.1')).strip().lower() in ('5', '5.0', 'v5', 'mqttv5')
+
+
+def create_client(config: Dict[str, Any]) -> mqtt.Client:
+    """按 mqtt_protocol 创建 paho 客户端"""
+    if is_v5(config):
+        return mqtt.Client(protocol=mqtt.MQTTv5)
+    return mqtt.Client()
+
+
+def connect_properties(config: Dict[str, Any]) -> Optional[Properties]:
+    """CONNECT 属性：session_expiry 大于 0 时代理在断线期间保留会话（订阅与待投递的 QoS>0 消息）"""
+    if not is_v5(config):
+        return None
+    session_expiry = int(config.get('session_expiry', 0))
+    if session_expiry <= 0:
+        return None
+    properties = Properties(PacketTypes.CONNECT)
+    properties.SessionExpiryInterval = session_expiry
+    return properties
+
+
+def parse_message_expiry(spec: str) -> List[Tuple[str, int]]:
+    """
+    解析消息过期配置
+
+    Args:
+        spec: 形如 "switch_to_temperature=600, speak=30, sensor/#=300" 的字符串，
+              左侧为消息动作/类型或主题过滤器，右侧为过期时间（秒）
+
+    Returns:
+        [(匹配项, 秒)] 列表
+    """
+    rules = []
+    for item in (spec or '').replace(';', ',').split(','):
+        item = item.strip()
+        if not item:
+            continue
+        name, sep, seconds = item.partition('=')
+        if not sep:
+            raise ValueError(f"无效的消息过期配置: {item}")
+        seconds = int(seconds.strip())
+        if seconds <= 0:
+            raise ValueError(f"消息过期时间必须大于0: {item}")
+        rules.append((name.strip(), seconds))
+    return rules
+
+
+class MessageExpiry:
+    """按消息动作/类型或主题查找过期时间，动作/类型规则优先"""
+
+    FIELDS = ('action', 'type')
+
+    def __init__(self, rules: List[Tuple[str, int]]):
+        self._values: Dict[str, int] = {}
+        self._trie = TopicTrie()
+        self._has_topic_rules = False
+        self._cache: Dict[str, int] = {}
+        for name, seconds in rules:
+            if '/' in name or '+' in name or '#' in name:
+                self._trie.insert(name, seconds)
+                self._has_topic_rules = True
+            else:
+                self._values[name] = seconds
+
+    @classmethod
+    def from_config(cls, config: Dict[str, Any]) -> Optional['MessageExpiry']:
+        """从配置字典创建（message_expiry），未配置时返回 None"""
+        rules = config.get('message_expiry')
+        if not rules:
+            return None
+        if isinstance(rules, str):
+            rules = parse_message_expiry(rules)
+        return cls(rules)
+
+    def lookup(self, topic: str, message: Any) -> int:
+        """返回过期时间（秒），0 表示不过期"""
+        if self._values and isinstance(message, dict):
+            for field in self.FIELDS:
+                value = message.get(field)
+                if isinstance(value, str) and value in self._values:
+                    return self._values[value]
+        if self._has_topic_rules:
+            seconds = self._cache.get(topic)
+            if seconds is None:
+                matches = self._trie.match(topic)
+                seconds = matches[0] if matches else 0
+                self._cache[topic] = seconds
+            return seconds
+        return 0
+
+
+class TopicAliases:
+    """客户端到代理方向的主题别名
+
+    别名表属于一条连接：每次连接成功后按代理 CONNACK 中的 TopicAliasMaximum 重置。
+    首次发布某主题时同时发送主题与别名，之后只发送别名（空主题）。
+    分配别名与调用 client.publish 在同一把锁内完成，保证代理先收到建立别名的报文。
+    """
+
+    def __init__(self, maximum: int = 16):
+        """
+        Args:
+            maximum: 本端最多使用的别名数，实际上限取与代理 TopicAliasMaximum 的较小值
+        """
+        self.maximum = max(0, int(maximum))
+        self._limit = 0
+        self._aliases: Dict[str, int] = {}
+        self._lock = threading.Lock()
+        self.bytes_saved = 0
+
+    @property
+    def limit(self) -> int:
+        """当前连接上可用的别名数"""
+        return self._limit
+
+    def reset(self, client, connack_properties=None):
+        """
+        连接成功（on_connect）时调用：重置别名表
+
+        paho 在 on_connect 返回后才重发未确认的 QoS>0 消息，此时把其中只带别名的消息恢复为完整主题
+        并去掉别名属性，避免在新连接上引用尚未建立的别名。
+        """
+        broker_maximum = getattr(connack_properties, 'TopicAliasMaximum', 0) or 0
+        with self._lock:
+            self._restore_inflight(client)
+            self._aliases.clear()
+            self._limit = min(self.maximum, int(broker_maximum))
+        if self.maximum and not self._limit:
+            logging.debug("代理不支持主题别名（TopicAliasMaximum 为 0）")
+
+    def _restore_inflight(self, client):
+        messages = getattr(client, '_out_messages', None)
+        if not messages or not self._aliases:
+            return
+        topics = {alias: topic for topic, alias in self._aliases.items()}
+        mutex = getattr(client, '_out_message_mutex', None) or contextlib.nullcontext()
+        with mutex:
+            for message in messages.values():
+                properties = message.properties
+                alias = getattr(properties, 'TopicAlias', None) if properties is not None else None
+                if alias is None:
+                    continue
+                if not message.topic and alias in topics:
+                    message.topic = topics[alias].encode('utf-8')
+                del properties.TopicAlias
+
+    def publish(self, client, topic: str, payload: bytes, qos: int, retain: bool,
+                properties: Properties) -> mqtt.MQTTMessageInfo:
+        """带别名发布；别名用完、未连接或代理不支持时按普通方式发布"""
+        if not self._limit:
+            return client.publish(topic, payload, qos=qos, retain=retain, properties=properties)
+        with self._lock:
+            if not client.is_connected():
+                return client.publish(topic, payload, qos=qos, retain=retain, properties=properties)
+            alias = self._aliases.get(topic)
+            if alias is not None:
+                properties.TopicAlias = alias
+                info = client.publish('', payload, qos=qos, retain=retain, properties=properties)
+                if info.rc == mqtt.MQTT_ERR_SUCCESS:
+                    self.bytes_saved += len(topic.encode('utf-8'))
+                return info
+            if len(self._aliases) < self._limit:
+                alias = len(self._aliases) + 1
+                properties.TopicAlias = alias
+                info = client.publish(topic, payload, qos=qos, retain=retain, properties=properties)
+                if info.rc == mqtt.MQTT_ERR_SUCCESS:
+                    self._aliases[topic] = alias
+                else:
+                    del properties.TopicAlias
+                return info
+            return client.publish(topic, payload, qos=qos, retain=retain, properties=properties)
+
+
+class PublishProperties:
+    """为每条发布消息生成 v5 属性"""
+
+    def __init__(self, expiry: Optional[MessageExpiry] = None, aliases: Optional[TopicAliases] = None,
+                 user_properties: bool = True):
+        """
+        Args:
+            expiry: 消息过期规则
+            aliases: 主题别名（共享连接上由宿主统一分配时为 None）
+            user_properties: 是否把编码名和追踪上下文写入用户属性
+        """
+        self.expiry = expiry
+        self.aliases = aliases
+        self.user_properties = user_properties
+
+    @classmethod
+    def from_config(cls, config: Dict[str, Any], topic_aliases: bool = True) -> Optional['PublishProperties']:
+        """未启用 v5 时返回 None"""
+        if not is_v5(config):
+            return None
+        maximum = int(config.get('topic_alias_maximum', 16))
+        return cls(
+            expiry=MessageExpiry.from_config(config),
+            aliases=TopicAliases(maximum) if topic_aliases and maximum > 0 else None,
+            user_properties=config.get('mqtt_user_properties', True),
+        )
+
+    def split_trace(self, message: Any) -> Tuple[Any, Optional[Dict[str, Any]]]:
+        """编码前把追踪上下文从消息中移出（不修改调用方的字典）"""
+        if not self.user_properties or not isinstance(message, dict) or 'trace' not in message:
+            return message, None
+        message = dict(message)
+        trace = message.pop('trace')
+        return message, trace if isinstance(trace, dict) else None
+
+    def build(self, topic: str, message: Any, codec, trace: Optional[Dict[str, Any]] = None,
+              msg_id: Optional[str] = None) -> Properties:
+        """生成 PUBLISH 属性：过期时间、content-type 与用户属性（编码名、消息ID、追踪上下文）"""
+        expiry = self.expiry.lookup(topic, message) if self.expiry is not None else 0
+        return self._properties(expiry, codec.content_type, codec.name, trace, msg_id)
+
+    def outbox_meta(self, topic: str, message: Any, codec, trace: Optional[Dict[str, Any]] = None,
+                    msg_id: Optional[str] = None) -> Dict[str, Any]:
+        """写入发件箱时保存的属性信息，补发时由 restore 重建相同的属性"""
+        meta = {'codec': codec.name, 'content_type': codec.content_type}
+        if self.expiry is not None:
+            meta['expiry'] = self.expiry.lookup(topic, message)
+        if msg_id is not None:
+            meta['msg_id'] = msg_id
+        if trace is not None:
+            meta['trace'] = trace
+        return meta
+
+    def restore(self, meta: Dict[str, Any], age: float) -> Optional[Properties]:
+        """
+        按发件箱中的属性信息重建 PUBLISH 属性，过期时间扣除在发件箱中等待的时间
+
+        Returns:
+            属性；消息已过期时返回 None（不应再补发）
+        """
+        expiry = int(meta.get('expiry') or 0)
+        if expiry:
+            remaining = expiry - max(0.0, age)
+            if remaining <= 0:
+                return None
+            expiry = max(1, math.ceil(remaining))
+        trace = meta.get('trace')
+        return self._properties(expiry, meta.get('content_type'), meta.get('codec'),
+                                trace if isinstance(trace, dict) else None, meta.get('msg_id'))
+
+    def _properties(self, expiry: int, content_type: Optional[str], codec_name: Optional[str],
+                    trace: Optional[Dict[str, Any]], msg_id: Optional[str]) -> Properties:
+        properties = Properties(PacketTypes.PUBLISH)
+        if expiry:
+            properties.MessageExpiryInterval = expiry
+        if content_type:
+            properties.ContentType = content_type
+        if self.user_properties:
+            user_properties = [(PROP_CODEC, codec_name)] if codec_name else []
+            if msg_id is not None:
+                user_properties.append((PROP_MSG_ID, msg_id))
+            if trace is not None:
+                user_properties.append((PROP_TRACE_ID, str(trace.get('id'))))
+                user_properties.append((PROP_TRACE, json.dumps(trace, separators=(',', ':'))))
+            if user_properties:
+                properties.UserProperty = user_properties
+        return properties
+
+    def publish(self, client, topic: str, payload: bytes, qos: int, retain: bool,
+                properties: Properties) -> mqtt.MQTTMessageInfo:
+        if self.aliases is not None:
+            return self.aliases.publish(client, topic, payload, qos, retain, properties)
+        return client.publish(topic, payload, qos=qos, retain=retain, properties=properties)
+
+
+def user_property(msg, name: str) -> Optional[str]:
+    """读取收到消息的用户属性（3.1.1 连接或未携带时为 None）"""
+    properties = getattr(msg, 'properties', None)
+    user_properties = getattr(properties, 'UserProperty', None) if properties is not None else None
+    if not user_properties:
+        return None
+    for key, value in user_properties:
+        if key == name:
+            return value
+    return None
+
+
+def trace_from_properties(msg) -> Optional[Dict[str, Any]]:
+    """从收到消息的用户属性中读取追踪上下文"""
+    value = user_property(msg, PROP_TRACE)
+    if value is None:
+        return None
+    try:
+        trace = json.loads(value)
+    except ValueError:
+        return None
+    return trace if isinstance(trace, dict) else None
@@ -0,0 +1,523 @@
+# -*- coding: utf-8 -*-
+"""
+MQTT asyncio 运行时
+MQTT客户端、周期任务、定时器与消息处理器都运行在同一个事件循环上，
+不再需要 paho 网络线程、监控线程和 threading.Timer
+"""
+
+import asyncio
+import inspect
+import logging
+import signal
+import threading
+import time
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional, Set
+
+import paho.mqtt.client as mqtt
+
+import tracing
+from mqtt_base import MQTTBase, MQTTSubscriber
+from message_router import ANY
+
+
+class AsyncioHelper:
+    """把 paho 客户端的套接字读写挂到 asyncio 事件循环上"""
+
+    def __init__(self, loop: asyncio.AbstractEventLoop, client: mqtt.Client):
+        self.loop = loop
+        self.client = client
+        self.misc_task: Optional[asyncio.Task] = None
+        self._loop_thread_id = threading.get_ident()
+        self.client.on_socket_open = self.on_socket_open
+        self.client.on_socket_close = self.on_socket_close
+        self.client.on_socket_register_write = self.on_socket_register_write
+        self.client.on_socket_unregister_write = self.on_socket_unregister_write
+
+    def _call(self, func, *args):
+        """连接在线程池中进行时套接字回调来自工作线程，按顺序转交给事件循环"""
+        if threading.get_ident() == self._loop_thread_id:
+            func(*args)
+        else:
+            self.loop.call_soon_threadsafe(func, *args)
+
+    def on_socket_open(self, client, userdata, sock):
+        self._call(self._open, client, sock)
+
+    def _open(self, client, sock):
+        self.loop.add_reader(sock, client.loop_read)
+        self.misc_task = self.loop.create_task(self.misc_loop())
+
+    def on_socket_close(self, client, userdata, sock):
+        # 转交后套接字可能已关闭，按文件描述符移除
+        self._call(self._close, sock.fileno())
+
+    def _close(self, fd: int):
+        self.loop.remove_reader(fd)
+        if self.misc_task is not None:
+            self.misc_task.cancel()
+            self.misc_task = None
+
+    def on_socket_register_write(self, client, userdata, sock):
+        self._call(self.loop.add_writer, sock, client.loop_write)
+
+    def on_socket_unregister_write(self, client, userdata, sock):
+        self._call(self.loop.remove_writer, sock.fileno())
+
+    async def misc_loop(self):
+        """处理心跳与超时重发"""
+        while self.client.loop_misc() == mqtt.MQTT_ERR_SUCCESS:
+            try:
+                await asyncio.sleep(1)
+            except asyncio.CancelledError:
+                break
+
+
+class AsyncMQTTBase(MQTTBase):
+    """asyncio 版本的MQTT基础类
+
+    publish_message 仍可在任意线程调用（非事件循环线程会被转交给事件循环），
+    publish / subscribe 为可等待版本，会等待 PUBACK / SUBACK。
+    """
+
+    def __init__(self, config: Dict[str, Any]):
+        super().__init__(config)
+        if self.publish_queue is not None:
+            # 事件循环内发布不会阻塞调用方，不再需要独立的发送线程
+            logging.info("asyncio 运行时不使用发布队列线程，已忽略 publish_queue 配置")
+            self.publish_queue = None
+
+        self.publish_timeout = config.get('publish_timeout', 10.0)
+
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+        self._loop_thread_id: Optional[int] = None
+        self._stop_event: Optional[asyncio.Event] = None
+        self._connected: Optional[asyncio.Event] = None
+        self._helper: Optional[AsyncioHelper] = None
+        self._pending_acks: Dict[int, asyncio.Future] = {}
+        self._early_acks: Set[int] = set()
+        self._pending_subacks: Dict[int, asyncio.Future] = {}
+        self._tasks: Set[asyncio.Task] = set()
+        self._reconnect_task: Optional[asyncio.Task] = None
+        self._drain_task: Optional[asyncio.Task] = None
+
+    # ---- 事件循环与任务 ----
+
+    def _in_loop_thread(self) -> bool:
+        return self._loop_thread_id == threading.get_ident()
+
+    def spawn(self, coro: Awaitable, name: Optional[str] = None) -> asyncio.Task:
+        """在事件循环上启动后台任务，异常会被记录"""
+        task = self.loop.create_task(coro, name=name)
+        self._tasks.add(task)
+        task.add_done_callback(self._on_task_done)
+        return task
+
+    def _on_task_done(self, task: asyncio.Task):
+        self._tasks.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            logging.error(f"后台任务 {task.get_name()} 异常: {task.exception()}")
+
+    def call_later(self, delay: float, callback: Callable, *args) -> asyncio.TimerHandle:
+        """替代 threading.Timer：在事件循环上延迟执行回调"""
+        return self.loop.call_later(delay, callback, *args)
+
+    def every(self, interval: float, job: Callable[[], Any], name: Optional[str] = None,
+              blocking: bool = False) -> asyncio.Task:
+        """
+        按固定周期执行任务（以单调时钟截止时间计算，不累积漂移）
+
+        Args:
+            interval: 周期（秒）
+            job: 同步函数或协程函数；同步函数直接在事件循环上执行，应当很快返回
+            name: 任务名称
+            blocking: 同步函数会阻塞（读传感器、等待 I/O）时设为 True，改在默认线程池中执行
+        """
+        async def runner():
+            next_run = self.loop.time()
+            while not self._stop_event.is_set():
+                try:
+                    if inspect.iscoroutinefunction(job):
+                        await job()
+                    elif blocking:
+                        await self.loop.run_in_executor(None, job)
+                    else:
+                        job()
+                except Exception as e:
+                    logging.error(f"周期任务执行出错: {e}")
+                next_run += interval
+                delay = next_run - self.loop.time()
+                if delay < 0:
+                    # 严重超时时跳过错过的周期
+                    next_run = self.loop.time()
+                    delay = 0
+                try:
+                    await asyncio.wait_for(self._stop_event.wait(), timeout=delay)
+                except asyncio.TimeoutError:
+                    pass
+        return self.spawn(runner(), name=name)
+
+    def signal_handler(self, signum, frame):
+        """信号处理函数：通知事件循环退出"""
+        logging.info(f"收到信号 {signum}，正在关闭...")
+        self.stop()
+
+    def stop(self):
+        """请求停止（可在任意线程调用）"""
+        self.running = False
+        if self.loop is not None and self._stop_event is not None:
+            if self._in_loop_thread():
+                self._stop_event.set()
+            else:
+                self.loop.call_soon_threadsafe(self._stop_event.set)
+
+    # ---- 连接管理 ----
+
+    async def connect_async(self) -> bool:
+        """在事件循环上连接MQTT代理"""
+        self.loop = asyncio.get_running_loop()
+        self._loop_thread_id = threading.get_ident()
+        if self._stop_event is None:
+            self._stop_event = asyncio.Event()
+            self._connected = asyncio.Event()
+            for signum in (signal.SIGINT, signal.SIGTERM):
+                try:
+                    self.loop.add_signal_handler(signum, self.stop)
+                except (NotImplementedError, RuntimeError):
+                    pass
+            if self.metrics_interval > 0:
+                self.every(self.metrics_interval, self._report_metrics, name='mqtt-metrics')
+        if self._helper is None:
+            self._helper = AsyncioHelper(self.loop, self.client)
+
+        # 连接失败时照常启动，由后台任务按退避时间重试并切换代理；
+        # DNS 解析和 TCP 连接（最长 connect_timeout）在线程池中进行，不阻塞事件循环上的其他任务
+        if not await self.loop.run_in_executor(None, self.connection.connect_once):
+            self.running = True
+            self._reconnect_task = self.spawn(self._reconnect_loop(), name='mqtt-reconnect')
+        return True
+
+    async def wait_connected(self, timeout: Optional[float] = None) -> bool:
+        """等待 CONNACK"""
+        try:
+            await asyncio.wait_for(self._connected.wait(), timeout=timeout)
+            return True
+        except asyncio.TimeoutError:
+            return False
+
+    async def _reconnect_loop(self):
+        """连接失败或意外断开后按带抖动的指数退避重连，依次尝试代理列表"""
+        while not self._stop_event.is_set() and not self._connected.is_set():
+            delay = self.connection.backoff.next()
+            logging.info(f"{delay:.1f}秒后重试连接")
+            try:
+                await asyncio.wait_for(self._stop_event.wait(), timeout=delay)
+                return
+            except asyncio.TimeoutError:
+                pass
+            if await self.loop.run_in_executor(None, self.connection.connect_once):
+                return
+
+    async def disconnect_async(self):
+        """断开连接并发送完 DISCONNECT 报文"""
+        try:
+            self.client.disconnect()
+            self.client.loop_write()
+            logging.info("MQTT连接已断开")
+        except Exception as e:
+            logging.error(f"断开MQTT连接时发生错误: {e}")
+        for task in list(self._tasks):
+            task.cancel()
+        if self._tasks:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+        if self.outbox is not None:
+            self.outbox.close()
+
+    def on_connect(self, client, userdata, flags, rc, properties=None):
+        super().on_connect(client, userdata, flags, rc, properties)
+        if rc == 0 and self._connected is not None:
+            self._connected.set()
+
+    def on_disconnect(self, client, userdata, rc, properties=None):
+        super().on_disconnect(client, userdata, rc, properties)
+        self.connection.mark_down()
+        if self._connected is not None:
+            self._connected.clear()
+        for future in self._pending_acks.values():
+            if not future.done():
+                future.set_result(False)
+        self._pending_acks.clear()
+        self._early_acks.clear()
+        if rc != 0 and self.running and self._stop_event is not None and not self._stop_event.is_set():
+            if self._reconnect_task is None or self._reconnect_task.done():
+                self._reconnect_task = self.spawn(self._reconnect_loop(), name='mqtt-reconnect')
+
+    # ---- 发布与订阅 ----
+
+    def publish_message(self, topic: str, message: Dict[str, Any], qos: int = 1, retain: bool = False,
+                        coalesce_key: Optional[Hashable] = None, persist: bool = False) -> bool:
+        """同步发布接口：非事件循环线程（如 gpiozero 回调）调用时转交给事件循环"""
+        message = tracing.attach(message)
+        if self.loop is not None and not self._in_loop_thread():
+            self.loop.call_soon_threadsafe(self._publish_now, topic, message, qos, retain, persist)
+            return True
+        return self._publish_now(topic, message, qos, retain, persist)
+
+    async def publish(self, topic: str, message: Dict[str, Any], qos: int = 1, retain: bool = False) -> bool:
+        """
+        发布消息并等待确认（QoS 0 时只等待写入队列）
+
+        Returns:
+            是否在 publish_timeout 内收到确认
+        """
+        message = tracing.attach(message)
+        properties = None
+        try:
+            message, msg_id = self._assign_message_id(message)
+            trace = None
+            if self.v5 is not None:
+                message, trace = self.v5.split_trace(message)
+            started = time.perf_counter()
+            payload, codec = self.codecs.encode(topic, message)
+            self._m_encode.observe(time.perf_counter() - started)
+            if self.v5 is not None:
+                properties = self.v5.build(topic, message, codec, trace, msg_id)
+        except Exception as e:
+            logging.error(f"发布消息时发生错误: {e}")
+            self._m_publish_failures.inc(topic)
+            return False
+        return await self._publish_payload(topic, payload, qos, retain, properties)
+
+    async def _publish_payload(self, topic: str, payload: bytes, qos: int, retain: bool,
+                               properties=None) -> bool:
+        """发布已编码的负载并等待确认（properties 为 v5 发布属性）"""
+        try:
+            published_at = time.perf_counter()
+            if properties is not None:
+                info = self.v5.publish(self.client, topic, payload, qos, retain, properties)
+            else:
+                info = self.client.publish(topic, payload, qos=qos, retain=retain)
+        except Exception as e:
+            logging.error(f"发布消息时发生错误: {e}")
+            self._m_publish_failures.inc(topic)
+            return False
+        if info.rc != mqtt.MQTT_ERR_SUCCESS:
+            logging.error(f"发布消息失败，错误码: {info.rc}")
+            self._m_publish_failures.inc(topic)
+            return False
+        self._m_published.inc(topic)
+        self._m_published_bytes.inc(topic, amount=len(payload))
+        if qos == 0:
+            return True
+        self._track_puback(info, published_at)
+        if info.mid in self._early_acks:
+            self._early_acks.discard(info.mid)
+            return True
+
+        future = self.loop.create_future()
+        self._pending_acks[info.mid] = future
+        try:
+            return await asyncio.wait_for(future, timeout=self.publish_timeout)
+        except asyncio.TimeoutError:
+            logging.warning(f"等待发布确认超时: {topic}")
+            return False
+        finally:
+            self._pending_acks.pop(info.mid, None)
+
+    def _kick_outbox(self):
+        """在事件循环上启动发件箱补发任务（同一时刻只有一个）"""
+        if self.loop is None:
+            return
+        if not self._in_loop_thread():
+            self.loop.call_soon_threadsafe(self._kick_outbox)
+            return
+        if self._drain_task is None or self._drain_task.done():
+            self._drain_task = self.spawn(self._drain_outbox_async(), name='mqtt-outbox')
+
+    async def _drain_outbox_async(self):
+        """按写入顺序分批补发发件箱，收到代理确认后才删除"""
+        while len(self.outbox) and self._connected.is_set() and not self._stop_event.is_set():
+            rows = self.outbox.peek(self.outbox_batch_size)
+            pending = []
+            expired = []
+            for row_id, topic, payload, qos, retain, meta, created in rows:
+                properties, is_expired = self._outbox_properties(meta, created)
+                if is_expired:
+                    expired.append(row_id)
+                else:
+                    pending.append((row_id, self._publish_payload(topic, payload, qos, retain, properties)))
+            self.outbox.ack(expired, expired=True)
+            results = await asyncio.gather(*(coro for _, coro in pending))
+            acked = []
+            for (row_id, _), ok in zip(pending, results):
+                if not ok:
+                    break
+                acked.append(row_id)
+            self.outbox.ack(acked)
+            if acked:
+                logging.info(f"已从发件箱补发 {len(acked)} 条消息，剩余 {len(self.outbox)} 条")
+            if len(acked) < len(pending):
+                break
+
+    async def _report_metrics(self):
+        """指标上报在事件循环上执行，不使用上报线程"""
+        self.publish_metrics()
+
+    def on_publish(self, client, userdata, mid):
+        super().on_publish(client, userdata, mid)
+        future = self._pending_acks.pop(mid, None)
+        if future is not None:
+            if not future.done():
+                future.set_result(True)
+        elif len(self._early_acks) < 1024:
+            self._early_acks.add(mid)
+
+    async def subscribe(self, topic: str, qos: int = 1) -> bool:
+        """订阅主题并等待 SUBACK（未连接时只登记，连接后自动订阅）"""
+        if hasattr(self, 'add_subscription'):
+            self.add_subscription(topic, qos)
+        if self._connected is None or not self._connected.is_set():
+            return True
+
+        result, mid = self.client.subscribe(topic, qos)
+        if result != mqtt.MQTT_ERR_SUCCESS:
+            logging.error(f"订阅主题失败: {topic}, 错误码: {result}")
+            return False
+        future = self.loop.create_future()
+        self._pending_subacks[mid] = future
+        try:
+            await asyncio.wait_for(future, timeout=self.publish_timeout)
+            logging.info(f"已订阅主题: {topic}")
+            return True
+        except asyncio.TimeoutError:
+            logging.warning(f"等待订阅确认超时: {topic}")
+            return False
+        finally:
+            self._pending_subacks.pop(mid, None)
+
+    def on_subscribe(self, client, userdata, mid, granted_qos, *args):
+        future = self._pending_subacks.pop(mid, None)
+        if future is not None and not future.done():
+            future.set_result(granted_qos)
+
+    async def _open(self) -> bool:
+        """连接并挂接订阅确认回调"""
+        self.client.on_subscribe = self.on_subscribe
+        if not await self.connect_async():
+            return False
+        self.running = True
+        return True
+
+
+class AsyncMQTTSubscriber(AsyncMQTTBase, MQTTSubscriber):
+    """asyncio 版本的订阅者基类，处理器可以是协程函数"""
+
+    def __init__(self, config: Dict[str, Any], message_handler: Optional[Callable] = None):
+        super().__init__(config)
+        self.message_handler = message_handler
+        if self.executor is not None:
+            # 慢处理器应写成协程，在事件循环上并发执行，不再使用工作线程池
+            logging.info("asyncio 运行时不使用处理器线程池，已忽略 handler_workers 配置")
+            self.executor = None
+
+    def register_handler(self, topic_filter: str, handler: Callable[[str, Dict[str, Any]], Any],
+                         field: Optional[str] = None, value: Any = ANY):
+        """注册处理器；协程处理器在事件循环上作为任务运行"""
+        if inspect.iscoroutinefunction(handler):
+            coroutine_handler = handler
+
+            def handler(topic, payload):
+                self.spawn(coroutine_handler(topic, payload), name=f"handler:{topic}")
+        super().register_handler(topic_filter, handler, field=field, value=value)
+
+    def _dispatch(self, topic: str, payload: Dict[str, Any]):
+        if not self.router and not self.message_handler:
+            # 协程任务创建时复制当前上下文，追踪上下文随之传入处理器
+            trace = payload.get('trace') if isinstance(payload, dict) else None
+            token = tracing.activate(trace) if isinstance(trace, dict) else None
+            try:
+                result = self.handle_message(topic, payload)
+                if inspect.isawaitable(result):
+                    self.spawn(result, name=f"handler:{topic}")
+            except Exception as e:
+                logging.error(f"处理消息时发生错误: {e}")
+            finally:
+                if token is not None:
+                    tracing.deactivate(token)
+            return
+        super()._dispatch(topic, payload)
+
+    async def run_async(self):
+        """运行订阅者主循环"""
+        if not await self._open():
+            logging.error("无法连接到MQTT代理，退出")
+            return
+        if self.last_values is not None and self.last_value_snapshot and self.last_value_snapshot_interval > 0:
+            self.every(self.last_value_snapshot_interval, self.save_last_values, name='last-value-snapshot')
+        logging.info("MQTT订阅者已启动（asyncio），等待消息...")
+        try:
+            await self._stop_event.wait()
+        finally:
+            self.running = False
+            await self.disconnect_async()
+            self.save_last_values()
+            logging.info("MQTT客户端已停止")
+
+    def run(self):
+        asyncio.run(self.run_async())
+
+
+class AsyncEventPublisher(AsyncMQTTBase):
+    """asyncio 版本的事件驱动型发布者基类"""
+
+    async def start_async(self) -> bool:
+        if not await self._open():
+            logging.error("无法连接到MQTT代理，退出")
+            return False
+
+        self.init_sensor()
+        logging.info(f"事件传感器 {self.sensor_type} 已启动（asyncio）")
+        try:
+            await self._stop_event.wait()
+        finally:
+            self.running = False
+            self.cleanup_sensor()
+            await self.disconnect_async()
+            logging.info("MQTT客户端已停止")
+        return True
+
+    def start(self):
+        return asyncio.run(self.start_async())
+
+
+class AsyncPeriodicPublisher(AsyncMQTTBase):
+    """asyncio 版本的周期性发布者基类，publish_cycle 可以是协程函数"""
+
+    def __init__(self, config: Dict[str, Any]):
+        super().__init__(config)
+        self.publish_interval = config.get('publish_interval', 30)
+
+    async def start_async(self) -> bool:
+        if not await self._open():
+            logging.error("无法连接到MQTT代理，退出")
+            return False
+
+        self.init_sensor()
+        logging.info(f"周期性传感器 {self.sensor_type} 已启动（asyncio），发布间隔: {self.publish_interval}秒")
+        await self.wait_connected(timeout=self.publish_timeout)
+        # 同步的 publish_cycle 通常要读传感器（阻塞 I/O），放到线程池执行；协程版本直接在事件循环上运行
+        self.every(self.publish_interval, self.publish_cycle, name='publish-cycle', blocking=True)
+        try:
+            await self._stop_event.wait()
+        finally:
+            self.running = False
+            self.cleanup_sensor()
+            await self.disconnect_async()
+            logging.info("MQTT客户端已停止")
+        return True
+
+    def start(self):
+        return asyncio.run(self.start_async())
+
+    def publish_cycle(self):
+        """发布周期数据 - 子类必须重写"""
+        raise NotImplementedError("子类必须重写 publish_cycle 方法")
@@ -4,17 +4,42 @@ MQTT 通用基类
 提供发布者和订阅者的共同功能
 """
 
-import json
 import time
 import logging
+import os
 import signal
+import socket
 import sys
-from typing import Dict, Any, Optional, Callable
+import threading
+from typing import Dict, Any, Optional, Callable, Hashable
 import paho.mqtt.client as mqtt
 
+from publish_queue import PublishQueue
+from message_router import MessageRouter, ANY
+from payload_codec import CodecSelector
+from handler_executor import InboundPolicies, KeyedExecutor
+from outbox import Outbox
+from connection_manager import Backoff, ConnectionManager, parse_brokers
+from metrics import MetricsRegistry
+from dedup import DedupCache, MSG_ID, new_message_id, payload_digest
+from last_value import LastValueCache
+from scheduler import Job, Scheduler, shared_scheduler
+import mqtt5
+from mqtt5 import PublishProperties
+import tracing
+from tracing import Tracer
+
+# 最多跟踪的待确认消息数（用于统计 PUBACK 延迟），超时未确认的记录在下次上报时清除
+MAX_TRACKED_PUBACKS = 10000
+PUBACK_TRACK_TIMEOUT = 60.0
+
 class MQTTBase:
     """MQTT基础类，提供通用功能"""
     
+    # 可热加载的配置项：config_reload 开启时，配置文件中这些键的变化通过 apply_config 立即生效，
+    # 其余键的变化需重启模块；子类扩展时用 MQTTBase.RELOADABLE_CONFIG | {...}
+    RELOADABLE_CONFIG = frozenset({'tracing', 'trace_sample_rate'})
+    
     def __init__(self, config: Dict[str, Any]):
         """
         初始化MQTT基础类
@@ -23,7 +48,10 @@ class MQTTBase:
             config: 配置字典
         """
         self.config = config
-        self.client = mqtt.Client()
+        # 可传入现成的客户端：模块宿主中为共享连接上的客户端视图（自带 connection），
+        # 基准测试中为 FakeClient（仍由本模块的连接管理器驱动）
+        shared_client = config.get('mqtt_client')
+        self.client = shared_client if shared_client is not None else mqtt5.create_client(config)
         self.running = False
         
         # MQTT 配置
@@ -32,24 +60,242 @@ class MQTTBase:
         self.topic_prefix = config.get('topic_prefix', 'sensor')
         self.sensor_type = config.get('sensor_type', 'unknown')
         
+        # 代理列表（按故障切换顺序），mqtt_brokers 为空时只使用 mqtt_broker:mqtt_port
+        self.brokers = parse_brokers(config.get('mqtt_brokers'), self.broker_host, self.broker_port)
+        shared_connection = getattr(shared_client, 'connection', None) is not None
+        if shared_connection:
+            self.connection = shared_client.connection
+        else:
+            self.connection = ConnectionManager(
+                self.client, self.brokers,
+                keepalive=config.get('keepalive', 60),
+                connect_timeout=config.get('connect_timeout', 5.0),
+                backoff=Backoff.from_config(config),
+                connect_properties=mqtt5.connect_properties(config),
+            )
+        
+        # 主题布局：hierarchical 为 {topic_prefix}/{sensor_type}/{sensor_id}，flat 为 {topic_prefix}
+        self.topic_layout = config.get('topic_layout', 'hierarchical')
+        self.sensor_id = config.get('sensor_id') or socket.gethostname()
+        # 模块名用于状态主题 {status_topic_prefix}/{sensor_id}/{module_name}/...，默认为入口脚本名
+        self.module_name = config.get('module_name') or os.path.splitext(os.path.basename(sys.argv[0]))[0] or 'mqtt'
+        self.status_topic_prefix = config.get('status_topic_prefix', 'status')
+        # 分层布局下同时镜像到扁平主题，兼容仍订阅 {topic_prefix} 的旧模块
+        self.flat_topic_mirror = config.get('flat_topic_mirror', True)
+        
+        # 负载编解码：默认JSON，可按主题指定 msgpack/cbor/compact
+        self.codecs = CodecSelector.from_config(config)
+        
+        # MQTT v5（mqtt_protocol = 5）：消息过期、主题别名，编码名与追踪上下文放入用户属性；
+        # 共享连接上的主题别名由模块宿主统一分配
+        self.v5: Optional[PublishProperties] = PublishProperties.from_config(
+            config, topic_aliases=not shared_connection)
+        # 消息 ID（可选）：每条消息带唯一 ID，订阅端按 ID 去重，内容相同的两条消息不会被误判为重复
+        self.message_ids = config.get('message_ids', False)
+        
+        # 出站发布队列（可选）：由独立线程完成序列化与发送，调用方只负责入队
+        self.publish_coalesce = config.get('publish_coalesce', False)
+        self.publish_queue: Optional[PublishQueue] = None
+        if config.get('publish_queue', False):
+            self.publish_queue = PublishQueue(
+                self._publish_now,
+                max_size=config.get('publish_queue_size', 256),
+                batch_size=config.get('publish_batch_size', 32),
+                flush_interval=config.get('publish_flush_interval', 0.05),
+            )
+        
+        # 持久化发件箱（可选）：代理不可达时暂存传感器数据，重连后分批补发
+        self.outbox: Optional[Outbox] = None
+        self.outbox_batch_size = config.get('outbox_batch_size', 50)
+        self._outbox_wakeup = threading.Event()
+        self._outbox_thread: Optional[threading.Thread] = None
+        if config.get('outbox_path'):
+            try:
+                self.outbox = Outbox(self.resolve_path(config['outbox_path']),
+                                     max_messages=config.get('outbox_max_messages', 10000))
+            except Exception as e:
+                logging.error(f"打开发件箱失败，断线期间的数据将丢失: {e}")
+        
+        # 运行指标：收发计数、编解码/处理耗时、PUBACK 延迟与队列深度；
+        # metrics_interval 大于 0 时定期发布到 metrics_topic（默认为状态主题下的 metrics），
+        # 配置 metrics_textfile 时同时写出 Prometheus 文本文件。
+        # 不使用 $ 开头的主题：多数代理拒绝客户端向 $ 主题发布，amqtt 会直接断开连接
+        self.metrics = MetricsRegistry({'module': self.module_name, 'sensor_id': self.sensor_id})
+        self.metrics_interval = float(config.get('metrics_interval', 0))
+        self.metrics_topic = config.get('metrics_topic') or (
+            self.status_topic('metrics') if self.status_topic_prefix else '')
+        self.metrics_textfile = self.resolve_path(config.get('metrics_textfile', ''))
+        if self.metrics_textfile and os.path.isdir(self.metrics_textfile):
+            self.metrics_textfile = os.path.join(self.metrics_textfile, f"{self.module_name}.prom")
+        # 周期任务（指标上报、周期发布）由进程内共享的调度线程驱动；align_ticks 开启时对齐到墙上时钟整点
+        self.scheduler: Scheduler = config.get('scheduler') or shared_scheduler()
+        self.align_ticks = config.get('align_ticks', False)
+        # 本模块的周期任务：任务名 -> Job
+        self._jobs: Dict[str, Job] = {}
+        # 等待 PUBACK 的消息：mid -> 发布时刻
+        self._inflight: Dict[int, float] = {}
+        self._inflight_lock = threading.Lock()
+        self._init_metrics()
+        
+        # 端到端追踪：tracing 开启时传感器在边沿处创建追踪上下文，各环节的 span 发布到 trace_topic
+        self.trace_topic = config.get('trace_topic') or f"trace/{self.sensor_id}/{self.module_name}"
+        self.tracer = Tracer(self._emit_span, module=self.module_name, host=self.sensor_id,
+                             enabled=config.get('tracing', False),
+                             sample_rate=config.get('trace_sample_rate', 1.0))
+        
+        # 配置热加载（可选）：config_store 由 ConfigManager.get_all_config() 提供
+        self.config_store = config.get('config_store')
+        self.config_reload = bool(config.get('config_reload', False)) and self.config_store is not None
+        self._config_watching = False
+        
         # 设置MQTT回调
         self.client.on_connect = self.on_connect
         self.client.on_disconnect = self.on_disconnect
         self.client.on_publish = self.on_publish
         self.client.on_message = self.on_message
+        self.client.on_subscribe = self.on_subscribe
+        # 等待 SUBACK 的订阅：mid -> (topic, qos)
+        self._pending_subscriptions: Dict[int, tuple] = {}
+        # 启动里程碑回调（启动耗时分析），见 on_startup_event
+        self.startup_listener: Optional[Callable[[str], None]] = None
+        self._startup_events: set = set()
+        self._startup_publish_pending = False
         
-        # 设置信号处理
-        signal.signal(signal.SIGINT, self.signal_handler)
-        signal.signal(signal.SIGTERM, self.signal_handler)
+        # 设置信号处理（模块宿主中由宿主统一处理）
+        if config.get('install_signal_handlers', True):
+            signal.signal(signal.SIGINT, self.signal_handler)
+            signal.signal(signal.SIGTERM, self.signal_handler)
+    
+    def resolve_path(self, path: str) -> str:
+        """配置中的相对路径按 base_dir 解析（模块宿主中进程工作目录不是模块目录），未设置时保持原样"""
+        base_dir = self.config.get('base_dir')
+        if path and base_dir and not os.path.isabs(path):
+            return os.path.join(base_dir, path)
+        return path
+    
+    def _init_metrics(self):
+        """注册发布端指标"""
+        m = self.metrics
+        self._m_published = m.counter('mqtt_messages_published_total', '已发布消息数', ('topic',))
+        self._m_published_bytes = m.counter('mqtt_published_bytes_total', '已发布负载字节数', ('topic',))
+        self._m_publish_failures = m.counter('mqtt_publish_failures_total', '发布失败次数', ('topic',))
+        self._m_encode = m.histogram('mqtt_encode_seconds', '负载编码耗时（秒）')
+        self._m_puback = m.histogram('mqtt_puback_seconds', '发布到收到 PUBACK 的延迟（秒）')
+        self._m_puback_timeouts = m.counter('mqtt_puback_timeouts_total', '超时未收到 PUBACK 的消息数')
+        m.gauge_callback('mqtt_puback_pending', '等待 PUBACK 的消息数', lambda: len(self._inflight))
+        m.gauge_callback('mqtt_connected', '是否已连接代理', lambda: int(self.client.is_connected()))
+        m.counter_callback('mqtt_reconnects_total', '重连次数', lambda: self.connection.stats()['reconnects'])
+        m.gauge_callback('mqtt_publish_queue_depth', '发布队列中待发送的消息数',
+                         lambda: len(self.publish_queue) if self.publish_queue is not None else None)
+        m.counter_callback('mqtt_publish_queue_events_total', '发布队列事件数（enqueued/coalesced/dropped/sent/failed）',
+                           lambda: self.publish_queue.stats if self.publish_queue is not None else None,
+                           labelname='event')
+        m.gauge_callback('mqtt_outbox_depth', '发件箱中待补发的消息数',
+                         lambda: len(self.outbox) if self.outbox is not None else None)
+        m.counter_callback('mqtt_outbox_events_total', '发件箱事件数（stored/evicted/drained/expired）',
+                           lambda: self.outbox.stats if self.outbox is not None else None,
+                           labelname='event')
+        m.counter_callback('mqtt_topic_alias_bytes_saved_total', '使用主题别名节省的主题字节数（MQTT v5）',
+                           lambda: self.v5.aliases.bytes_saved
+                           if self.v5 is not None and self.v5.aliases is not None else None)
+        m.counter_callback('scheduler_job_runs_total', '周期任务执行次数',
+                           lambda: self._job_stats('runs'), labelname='job')
+        m.counter_callback('scheduler_missed_deadlines_total', '周期任务错过（被跳过）的周期数',
+                           lambda: self._job_stats('missed'), labelname='job')
+        m.counter_callback('scheduler_overruns_total', '周期任务耗时超过周期的次数',
+                           lambda: self._job_stats('overruns'), labelname='job')
+        m.gauge_callback('scheduler_max_lateness_seconds', '周期任务开始时刻晚于截止时间的最大值（秒）',
+                         lambda: self._job_stats('max_lateness'), labelname='job')
+    
+    def _job_stats(self, field: str) -> Optional[Dict[str, Any]]:
+        return {name: getattr(job, field) for name, job in list(self._jobs.items())} or None
+    
+    def _track_puback(self, info, published_at: float):
+        """记录 QoS>0 消息的发布时刻，收到 PUBACK 时计算延迟"""
+        with self._inflight_lock:
+            if len(self._inflight) < MAX_TRACKED_PUBACKS:
+                self._inflight[info.mid] = published_at
+        # 确认可能在登记之前就已由网络线程处理
+        if info.is_published():
+            self._observe_puback(info.mid)
     
-    def on_connect(self, client, userdata, flags, rc):
-        """MQTT连接回调 - 子类可重写"""
+    def _observe_puback(self, mid: int):
+        with self._inflight_lock:
+            published_at = self._inflight.pop(mid, None)
+        if published_at is not None:
+            self._m_puback.observe(time.perf_counter() - published_at)
+    
+    def _expire_inflight(self):
+        """清除超时未确认的记录（断线丢失的消息），计入超时次数"""
+        deadline = time.perf_counter() - PUBACK_TRACK_TIMEOUT
+        with self._inflight_lock:
+            expired = [mid for mid, published_at in self._inflight.items() if published_at < deadline]
+            for mid in expired:
+                del self._inflight[mid]
+        if expired:
+            self._m_puback_timeouts.inc(amount=len(expired))
+    
+    def _emit_span(self, record: Dict[str, Any]):
+        """发布 span 记录（QoS 0，未连接时丢弃）"""
+        if self.client.is_connected():
+            payload, _ = self.codecs.encode(self.trace_topic, record)
+            self.client.publish(self.trace_topic, payload, qos=0, retain=False)
+    
+    def get_metrics(self) -> Dict[str, Any]:
+        """获取运行指标快照"""
+        return self.metrics.snapshot()
+    
+    def publish_metrics(self):
+        """上报一次运行指标：JSON 快照发布到指标主题，Prometheus 文本写入 metrics_textfile"""
+        self._expire_inflight()
+        if self.metrics_topic and self.client.is_connected():
+            try:
+                snapshot = self.metrics.snapshot()
+                snapshot['timestamp'] = int(time.time())
+                payload, _ = self.codecs.encode(self.metrics_topic, snapshot)
+                # 直接发送，不计入业务消息的发布指标
+                self.client.publish(self.metrics_topic, payload, qos=0, retain=False)
+            except Exception as e:
+                logging.error(f"发布运行指标失败: {e}")
+        if self.metrics_textfile:
+            try:
+                self.metrics.write_textfile(self.metrics_textfile)
+            except OSError as e:
+                logging.error(f"写入指标文件失败: {e}")
+    
+    def _start_metrics_reporter(self):
+        """metrics_interval 大于 0 时添加指标上报任务"""
+        if self.metrics_interval <= 0 or 'metrics' in self._jobs:
+            return
+        self._jobs['metrics'] = self.scheduler.every(self.metrics_interval, self.publish_metrics,
+                                                     name=f"{self.module_name}.metrics",
+                                                     align=self.align_ticks, run_now=False)
+    
+    def _cancel_job(self, name: str):
+        job = self._jobs.pop(name, None)
+        if job is not None:
+            job.cancel()
+    
+    def on_connect(self, client, userdata, flags, rc, properties=None):
+        """MQTT连接回调 - 子类可重写（properties 为 v5 CONNACK 属性）"""
         if rc == 0:
+            if self.v5 is not None and self.v5.aliases is not None:
+                self.v5.aliases.reset(client, properties)
+            self.broker_host, self.broker_port = self.connection.current_broker
             logging.info(f"已连接到MQTT代理: {self.broker_host}:{self.broker_port}")
+            self.connection.on_connack(rc)
+            self._pending_subscriptions.clear()
+            self.publish_connection_stats()
+            if self.outbox is not None and len(self.outbox):
+                self._kick_outbox()
+            self._startup_event('connected')
+            if self._startup_publish_pending:
+                # 连接前产生的传感器数据在连接建立后随即发出
+                self._startup_event('published')
         else:
             logging.error(f"MQTT连接失败，错误码: {rc}")
     
-    def on_disconnect(self, client, userdata, rc):
+    def on_disconnect(self, client, userdata, rc, properties=None):
         """MQTT断开连接回调 - 子类可重写"""
         if rc != 0:
             logging.warning(f"MQTT连接意外断开，错误码: {rc}")
@@ -58,18 +304,76 @@ class MQTTBase:
     
     def on_publish(self, client, userdata, mid):
         """MQTT发布回调 - 子类可重写"""
-        logging.debug(f"消息已发布，消息ID: {mid}")
+        logging.debug("消息已发布，消息ID: %s", mid)
+        self._observe_puback(mid)
+    
+    def on_subscribe(self, client, userdata, mid, granted_qos, *args):
+        """SUBACK 回调：代理拒绝的订阅稍后重试"""
+        subscription = self._pending_subscriptions.pop(mid, None)
+        if subscription is None:
+            return
+        codes = [getattr(code, 'value', code) for code in granted_qos]
+        if any(code >= 0x80 for code in codes):
+            topic, qos = subscription
+            logging.error(f"代理拒绝订阅: {topic}，返回码: {codes}，5秒后重试")
+            self.connection.call_soon(self.subscribe_topic, topic, qos, delay=5.0)
+        elif not self._pending_subscriptions:
+            self._startup_event('subscribed')
+    
+    def _startup_event(self, event: str):
+        if event not in self._startup_events:
+            self._startup_events.add(event)
+            self.on_startup_event(event)
+    
+    def on_startup_event(self, event: str):
+        """
+        启动里程碑，每种只在首次发生时调用 - 子类可重写
+        
+        Args:
+            event: connected（首次连接成功）、subscribed（全部订阅已确认）、published（首次发布传感器数据）
+        """
+        if self.startup_listener is not None:
+            self.startup_listener(event)
+    
+    def _on_config_changed(self, changes: Dict[str, Any]):
+        """配置文件变化（在配置监视线程中调用）"""
+        applied = {key: value for key, value in changes.items() if key in self.RELOADABLE_CONFIG}
+        pending = sorted(key for key in changes if key not in applied)
+        if pending:
+            logging.warning(f"配置项 {', '.join(pending)} 已修改，重启后生效")
+        if not applied:
+            return
+        self.config.update(applied)
+        try:
+            self.apply_config(applied)
+        except Exception as e:
+            logging.error(f"应用配置失败: {e}")
+        else:
+            logging.info(f"已热加载配置: {applied}")
+    
+    def apply_config(self, changes: Dict[str, Any]):
+        """
+        让热加载的配置立即生效 - 子类可重写（先调用父类）
+        
+        Args:
+            changes: 发生变化的配置项 {键: 新值}，只含 RELOADABLE_CONFIG 中的键
+        """
+        if 'tracing' in changes:
+            self.tracer.enabled = bool(changes['tracing'])
+        if 'trace_sample_rate' in changes:
+            self.tracer.sample_rate = max(0.0, min(1.0, float(changes['trace_sample_rate'])))
     
     def on_message(self, client, userdata, msg):
         """MQTT消息回调 - 子类可重写"""
-        logging.debug(f"收到消息: {msg.topic} -> {msg.payload.decode()}")
+        logging.debug("收到消息: %s -> %r", msg.topic, msg.payload)
     
     def signal_handler(self, signum, frame):
         """信号处理函数"""
         logging.info(f"收到信号 {signum}，正在关闭...")
         self.stop()
     
-    def publish_message(self, topic: str, message: Dict[str, Any], qos: int = 1, retain: bool = False) -> bool:
+    def publish_message(self, topic: str, message: Dict[str, Any], qos: int = 1, retain: bool = False,
+                        coalesce_key: Optional[Hashable] = None, persist: bool = False) -> bool:
         """
         发布消息到指定主题
         
@@ -78,32 +382,158 @@ class MQTTBase:
             message: 消息内容
             qos: 服务质量等级
             retain: 是否保留消息
+            coalesce_key: 合并键，启用发布队列时同键未发送的旧消息会被覆盖
+            persist: 代理不可达时写入持久化发件箱（需配置 outbox_path），重连后补发
             
         Returns:
-            发布是否成功
+            发布是否成功（启用发布队列时表示是否已入队，写入发件箱也视为成功）
         """
+        # 在处理器中发布时带上触发该消息的追踪上下文
+        message = tracing.attach(message)
+        if self.publish_queue is not None:
+            return self.publish_queue.put(topic, message, qos=qos, retain=retain,
+                                          coalesce_key=coalesce_key, persist=persist)
+        return self._publish_now(topic, message, qos, retain, persist)
+    
+    def _publish_now(self, topic: str, message: Dict[str, Any], qos: int = 1, retain: bool = False,
+                     persist: bool = False) -> bool:
+        """序列化并立即发布消息"""
         try:
-            payload = json.dumps(message, ensure_ascii=False)
-            result = self.client.publish(topic, payload, qos=qos, retain=retain)
+            message, msg_id = self._assign_message_id(message)
+            trace = None
+            if self.v5 is not None:
+                message, trace = self.v5.split_trace(message)
+            started = time.perf_counter()
+            payload, codec = self.codecs.encode(topic, message)
+            self._m_encode.observe(time.perf_counter() - started)
+            persist = persist and self.outbox is not None
+            # v5 发布属性随消息写入发件箱，补发时重建（编码名、消息 ID、追踪上下文、过期时间）
+            meta = None
+            if persist and self.v5 is not None:
+                meta = self.v5.outbox_meta(topic, message, codec, trace, msg_id)
+            # 断线期间或发件箱仍有积压时直接写入发件箱，保证补发顺序与采集顺序一致
+            if persist and (len(self.outbox) or not self.client.is_connected()):
+                return self._store_in_outbox(topic, payload, qos, retain, meta)
+            
+            published_at = time.perf_counter()
+            if self.v5 is not None:
+                properties = self.v5.build(topic, message, codec, trace, msg_id)
+                result = self.v5.publish(self.client, topic, payload, qos, retain, properties)
+            else:
+                result = self.client.publish(topic, payload, qos=qos, retain=retain)
             
             if result.rc == mqtt.MQTT_ERR_SUCCESS:
-                logging.debug(f"消息已发布到主题 {topic}")
+                logging.debug("消息已发布到主题 %s", topic)
+                self._m_published.inc(topic)
+                self._m_published_bytes.inc(topic, amount=len(payload))
+                if qos > 0:
+                    self._track_puback(result, published_at)
                 return True
+            elif persist:
+                return self._store_in_outbox(topic, payload, qos, retain, meta)
             else:
                 logging.error(f"发布消息失败，错误码: {result.rc}")
+                self._m_publish_failures.inc(topic)
                 return False
                 
         except Exception as e:
             logging.error(f"发布消息时发生错误: {e}")
+            self._m_publish_failures.inc(topic)
+            return False
+    
+    def _assign_message_id(self, message: Any) -> tuple:
+        """
+        message_ids 开启时给消息分配 ID（不修改调用方的字典）
+        
+        Returns:
+            (消息, v5 用户属性中的 ID)：3.1.1 时 ID 写入负载的 msg_id 字段，v5 时放入用户属性
+        """
+        if not self.message_ids or not isinstance(message, dict) or MSG_ID in message:
+            return message, None
+        msg_id = new_message_id()
+        if self.v5 is not None:
+            return message, msg_id
+        message = dict(message)
+        message[MSG_ID] = msg_id
+        return message, None
+    
+    def _store_in_outbox(self, topic: str, payload: bytes, qos: int, retain: bool,
+                         meta: Optional[Dict[str, Any]] = None) -> bool:
+        """写入发件箱，已连接时唤醒补发线程"""
+        if not self.outbox.put(topic, payload, qos, retain, meta):
             return False
+        logging.debug("代理不可达，消息已写入发件箱: %s（积压 %d 条）", topic, len(self.outbox))
+        if self.client.is_connected():
+            self._kick_outbox()
+        return True
     
-    def publish_sensor_data(self, data: Dict[str, Any], retain: bool = False):
+    def _kick_outbox(self):
+        """唤醒发件箱补发"""
+        self._outbox_wakeup.set()
+    
+    def _outbox_properties(self, meta: Optional[Dict[str, Any]], created: float) -> tuple:
+        """
+        补发时重建 v5 发布属性
+        
+        Returns:
+            (属性, 是否已过期)：3.1.1 或没有属性信息时属性为 None
+        """
+        if self.v5 is None or not meta:
+            return None, False
+        properties = self.v5.restore(meta, time.time() - created)
+        return properties, properties is None
+    
+    def _drain_outbox(self):
+        """补发线程：每次连接成功后按写入顺序分批补发，收到代理确认后才删除"""
+        while self.running:
+            self._outbox_wakeup.wait()
+            self._outbox_wakeup.clear()
+            
+            while self.running and len(self.outbox) and self.client.is_connected():
+                rows = self.outbox.peek(self.outbox_batch_size)
+                sent = []
+                expired = []
+                for row_id, topic, payload, qos, retain, meta, created in rows:
+                    properties, is_expired = self._outbox_properties(meta, created)
+                    if is_expired:
+                        # 已超过消息过期时间，代理也会丢弃，不再补发
+                        expired.append(row_id)
+                        continue
+                    if properties is not None:
+                        info = self.v5.publish(self.client, topic, payload, qos, retain, properties)
+                    else:
+                        info = self.client.publish(topic, payload, qos=qos, retain=retain)
+                    if info.rc != mqtt.MQTT_ERR_SUCCESS:
+                        break
+                    sent.append((row_id, info))
+                self.outbox.ack(expired, expired=True)
+                
+                acked = []
+                for row_id, info in sent:
+                    try:
+                        info.wait_for_publish(timeout=10)
+                    except (RuntimeError, ValueError):
+                        break
+                    if not info.is_published():
+                        break
+                    acked.append(row_id)
+                self.outbox.ack(acked)
+                
+                if acked:
+                    logging.info(f"已从发件箱补发 {len(acked)} 条消息，剩余 {len(self.outbox)} 条")
+                if len(acked) + len(expired) < len(rows):
+                    # 补发过程中断开，剩余消息等待下次连接
+                    break
+    
+    def publish_sensor_data(self, data: Dict[str, Any], retain: bool = False,
+                            trace: Optional[Dict[str, Any]] = None):
         """
         发布标准化的传感器数据
         
         Args:
             data: 传感器原始数据
             retain: 是否保留消息
+            trace: 追踪上下文（由 self.tracer.start() 在传感器回调中创建），随消息传递到下游
         """
         try:
             # 构建标准化的传感器数据格式
@@ -112,16 +542,59 @@ class MQTTBase:
                 "params": data,
                 "timestamp": int(time.time())
             }
+            if trace is not None:
+                sensor_message["trace"] = trace
             
-            # 发布到统一的sensor topic
-            topic = f"{self.topic_prefix}"
-            self.publish_message(topic, sensor_message, retain=retain)
+            # 发布到分层主题（以及兼容的扁平主题），断线期间写入发件箱
+            for topic in self.sensor_data_topics():
+                coalesce_key = (topic, self.sensor_type) if self.publish_coalesce else None
+                self.publish_message(topic, sensor_message, retain=retain, coalesce_key=coalesce_key,
+                                     persist=True)
             
-            logging.info(f"已发布传感器数据 [{self.sensor_type}]: {data}")
+            if trace is not None:
+                self.tracer.span('sensor.publish', trace['m0'], trace=trace)
+            logging.debug("已发布传感器数据 [%s]: %s", self.sensor_type, data)
+            if self.client.is_connected():
+                self._startup_event('published')
+            else:
+                self._startup_publish_pending = True
             
         except Exception as e:
             logging.error(f"发布传感器数据时发生错误: {e}")
-
+    
+    def status_topic(self, name: str) -> str:
+        """模块状态主题 {status_topic_prefix}/{sensor_id}/{module_name}/{name}"""
+        return f"{self.status_topic_prefix}/{self.sensor_id}/{self.module_name}/{name}"
+    
+    def publish_connection_stats(self):
+        """发布连接统计（重连次数、重连耗时等），保留消息，status_topic_prefix 为空时不发布"""
+        if not self.status_topic_prefix:
+            return
+        stats = self.connection.stats()
+        stats['timestamp'] = int(time.time())
+        self._publish_now(self.status_topic('connection'), stats, qos=1, retain=True)
+    
+    def sensor_topic(self, sensor_type: Optional[str] = None, sensor_id: Optional[str] = None) -> str:
+        """
+        获取分层的传感器主题
+        
+        Args:
+            sensor_type: 传感器类型，默认为本模块类型
+            sensor_id: 传感器ID，默认为本模块ID，传入 '+' 可用于订阅
+            
+        Returns:
+            形如 {topic_prefix}/{sensor_type}/{sensor_id} 的主题
+        """
+        return f"{self.topic_prefix}/{sensor_type or self.sensor_type}/{sensor_id or self.sensor_id}"
+    
+    def sensor_data_topics(self) -> list:
+        """传感器数据需要发布到的主题列表"""
+        if self.topic_layout == 'flat':
+            return [self.topic_prefix]
+        topics = [self.sensor_topic()]
+        if self.flat_topic_mirror:
+            topics.append(self.topic_prefix)
+        return topics
     
     def subscribe_topic(self, topic: str, qos: int = 1):
         """
@@ -134,6 +607,7 @@ class MQTTBase:
         try:
             result = self.client.subscribe(topic, qos)
             if result[0] == mqtt.MQTT_ERR_SUCCESS:
+                self._pending_subscriptions[result[1]] = (topic, qos)
                 logging.info(f"已订阅主题: {topic}")
             else:
                 logging.error(f"订阅主题失败: {topic}, 错误码: {result[0]}")
@@ -141,11 +615,23 @@ class MQTTBase:
             logging.error(f"订阅主题时发生错误: {e}")
     
     def connect(self) -> bool:
-        """连接到MQTT代理"""
+        """连接到MQTT代理
+        
+        连接由连接管理器的网络线程在后台建立：代理暂时不可达时按退避时间重试
+        并依次切换 mqtt_brokers 中的代理，不会因启动时连接失败而退出。
+        """
         try:
-            logging.info(f"正在连接到MQTT代理: {self.broker_host}:{self.broker_port}")
-            self.client.connect(self.broker_host, self.broker_port, 60)
-            self.client.loop_start()
+            self.connection.start()
+            self._start_metrics_reporter()
+            if self.config_reload and not self._config_watching:
+                self.config_store.watch(self._on_config_changed)
+                self._config_watching = True
+            if self.publish_queue is not None:
+                self.publish_queue.start()
+            if self.outbox is not None:
+                self.running = True
+                self._outbox_thread = threading.Thread(target=self._drain_outbox, name='mqtt-outbox', daemon=True)
+                self._outbox_thread.start()
             return True
         except Exception as e:
             logging.error(f"连接MQTT代理失败: {e}")
@@ -154,8 +640,7 @@ class MQTTBase:
     def disconnect(self):
         """断开MQTT连接"""
         try:
-            self.client.loop_stop()
-            self.client.disconnect()
+            self.connection.stop()
             logging.info("MQTT连接已断开")
         except Exception as e:
             logging.error(f"断开MQTT连接时发生错误: {e}")
@@ -163,7 +648,19 @@ class MQTTBase:
     def stop(self):
         """停止MQTT客户端"""
         self.running = False
+        if self._config_watching:
+            self.config_store.unwatch(self._on_config_changed)
+            self._config_watching = False
+        self._cancel_job('metrics')
+        if self.publish_queue is not None:
+            self.publish_queue.stop()
+        if self._outbox_thread is not None:
+            self._outbox_wakeup.set()
+            self._outbox_thread.join(timeout=2.0)
+            self._outbox_thread = None
         self.disconnect()
+        if self.outbox is not None:
+            self.outbox.close()
         logging.info("MQTT客户端已停止")
     
     def init_sensor(self):
@@ -181,28 +678,202 @@ class MQTTSubscriber(MQTTBase):
         super().__init__(config)
         self.message_handler = message_handler
         self.subscribed_topics = []
+        # 主题/消息类型路由表，注册了路由时代替 handle_message 分发
+        self.router = MessageRouter()
+        
+        # 处理器执行模式：handler_workers 为 0 时在 paho 网络线程中直接执行；
+        # 大于 0 时交给工作线程池，按 handler_order_key（topic 或消息字段如 action）保序
+        self.handler_order_key = config.get('handler_order_key', 'topic')
+        self.executor: Optional[KeyedExecutor] = None
+        handler_workers = int(config.get('handler_workers', 0))
+        # 入站丢弃策略：积压的同类消息（如 set_volume）只保留最新的若干条
+        self.inbound_policies = InboundPolicies.from_config(config)
+        if self.inbound_policies is not None and handler_workers <= 0:
+            logging.info("已配置入站丢弃策略，处理器线程池使用 1 个工作线程")
+            handler_workers = 1
+        if handler_workers > 0:
+            self.executor = KeyedExecutor(
+                workers=handler_workers,
+                max_queue=config.get('handler_queue_size', 1000),
+            )
+        
+        # 重复消息抑制（可选）：QoS 1 重发/补投的同一消息在时间窗口内只处理一次
+        self.dedup: Optional[DedupCache] = DedupCache.from_config(config)
+        if self.dedup is not None and not self.message_ids:
+            # 发布端重连后重发、会话恢复后补投的消息不带 DUP 标志，没有消息 ID 时识别不出来
+            logging.warning("已开启 dedup_window，但未开启 message_ids：只能识别带 DUP 标志的重发，"
+                            "请在本模块和向它发布命令的模块中设置 message_ids = true")
+        
+        # 最新值缓存：每类消息保留最近一条，供管理器直接查询当前状态；
+        # 配置 last_value_snapshot 时定期写入快照文件，重启后从快照预热
+        self.last_values: Optional[LastValueCache] = (
+            LastValueCache() if config.get('last_value_cache', True) else None)
+        self.last_value_snapshot = self.resolve_path(config.get('last_value_snapshot', ''))
+        self.last_value_snapshot_interval = float(config.get('last_value_snapshot_interval', 60))
+        self._snapshot_stop = threading.Event()
+        self._snapshot_thread: Optional[threading.Thread] = None
+        if self.last_values is not None and self.last_value_snapshot:
+            loaded = self.last_values.load(self.last_value_snapshot)
+            if loaded:
+                logging.info(f"已从快照恢复 {loaded} 条最新值: {self.last_value_snapshot}")
+        
+        m = self.metrics
+        self._m_received = m.counter('mqtt_messages_received_total', '已接收消息数', ('topic',))
+        self._m_received_bytes = m.counter('mqtt_received_bytes_total', '已接收负载字节数', ('topic',))
+        self._m_unrouted = m.counter('mqtt_messages_unrouted_total', '无匹配路由、未解码即丢弃的消息数', ('topic',))
+        self._m_decode = m.histogram('mqtt_decode_seconds', '负载解码耗时（秒）')
+        self._m_decode_failures = m.counter('mqtt_decode_failures_total', '负载解码失败次数')
+        self._m_handler = m.histogram('mqtt_handler_seconds', '处理器耗时（秒）', ('topic',))
+        self._m_handler_errors = m.counter('mqtt_handler_errors_total', '处理器异常次数', ('topic',))
+        m.gauge_callback('mqtt_handler_queue_depth', '处理器线程池中排队的消息数',
+                         lambda: self.executor.stats()['queue_depth'] if self.executor is not None else None)
+        m.gauge_callback('mqtt_last_value_entries', '最新值缓存条目数',
+                         lambda: len(self.last_values) if self.last_values is not None else None)
+        m.counter_callback('mqtt_dedup_total', '去重缓存查询次数（hit 为重复消息，已丢弃）',
+                           lambda: self.dedup.stats() if self.dedup is not None else None, labelname='result')
+        m.counter_callback('mqtt_handler_dropped_total', '处理器线程池丢弃的消息数（rejected/collapsed）',
+                           self._executor_drops, labelname='reason')
+    
+    def _executor_drops(self) -> Optional[Dict[str, int]]:
+        if self.executor is None:
+            return None
+        stats = self.executor.stats()
+        return {'rejected': stats['rejected'], 'collapsed': stats['collapsed']}
     
     def on_message(self, client, userdata, msg):
         """重写消息回调，调用消息处理器"""
+        topic = msg.topic
+        raw = msg.payload
+        self._m_received.inc(topic)
+        self._m_received_bytes.inc(topic, amount=len(raw))
+        
+        # 路由预过滤：没有处理器关心的JSON消息在完整解码前直接丢弃
+        if self.router and raw[:1] == b'{' and not self.router.accepts(topic, raw):
+            logging.debug("无匹配路由，丢弃消息: %s", topic)
+            self._m_unrouted.inc(topic)
+            return
+        
+        try:
+            logging.debug("收到消息 %s，原始负载: %r", topic, raw[:256])
+            started = time.perf_counter()
+            payload = self.codecs.decode(topic, raw, self._content_type(msg))
+            self._m_decode.observe(time.perf_counter() - started)
+        except Exception as e:
+            logging.error(f"解析消息失败: {e}")
+            self._m_decode_failures.inc()
+            return
+        # v5 消息的追踪上下文在用户属性中，还原到负载里供处理器使用
+        if isinstance(payload, dict) and 'trace' not in payload:
+            trace = mqtt5.trace_from_properties(msg)
+            if trace is not None:
+                payload['trace'] = trace
+        if self.dedup is not None and self._is_duplicate(topic, msg, payload):
+            logging.debug("重复消息，已丢弃: %s", topic)
+            return
+        if self.last_values is not None and isinstance(payload, dict):
+            self.last_values.update(topic, payload, self._topic_sensor_id(topic))
+        
+        if self.executor is not None:
+            slot, slot_limit = (self.inbound_policies.lookup(topic, payload)
+                                if self.inbound_policies is not None else (None, 0))
+            self.executor.submit(self._order_key(topic, payload), self._dispatch, topic, payload,
+                                 slot=slot, slot_limit=slot_limit)
+        else:
+            self._dispatch(topic, payload)
+    
+    def _topic_sensor_id(self, topic: str) -> Optional[str]:
+        """分层传感器主题 {topic_prefix}/{sensor_type}/{sensor_id} 中的传感器ID"""
+        parts = topic.split('/')
+        if len(parts) == 3 and parts[0] == self.topic_prefix:
+            return parts[2]
+        return None
+    
+    def save_last_values(self):
+        """写入最新值快照（未配置 last_value_snapshot 时不写）"""
+        if self.last_values is not None and self.last_value_snapshot:
+            self.last_values.save(self.last_value_snapshot)
+    
+    def _snapshot_loop(self):
+        while not self._snapshot_stop.wait(self.last_value_snapshot_interval):
+            self.save_last_values()
+    
+    def _is_duplicate(self, topic: str, msg, payload: Any) -> bool:
+        """
+        是否为重复消息：有消息 ID（v5 用户属性，或 3.1.1 解码后负载顶层的 msg_id 字段）时按 ID；
+        没有消息 ID 时只记录负载摘要，仅丢弃带 DUP 标志的重发，内容相同的新命令（再次 stop、重复播报）照常处理
+        """
+        msg_id = mqtt5.user_property(msg, mqtt5.PROP_MSG_ID)
+        if msg_id is None and isinstance(payload, dict):
+            msg_id = payload.get(MSG_ID)
+        if isinstance(msg_id, (str, int)):
+            return self.dedup.seen((topic, msg_id))
+        key = (topic, payload_digest(msg.payload))
+        if getattr(msg, 'dup', False):
+            return self.dedup.seen(key)
+        self.dedup.remember(key)
+        return False
+    
+    def _order_key(self, topic: str, payload: Any):
+        """计算保序键：同键消息串行处理，不同键并发处理"""
+        if self.handler_order_key == 'topic' or not isinstance(payload, dict):
+            return topic
+        value = payload.get(self.handler_order_key)
+        try:
+            hash(value)
+        except TypeError:
+            value = None
+        return (topic, value)
+    
+    def get_handler_stats(self) -> Optional[Dict[str, Any]]:
+        """获取处理器执行器指标（队列深度、等待时间、处理时间），未启用时返回 None"""
+        return self.executor.stats() if self.executor is not None else None
+    
+    def _dispatch(self, topic: str, payload: Dict[str, Any]):
+        """把已解码的消息交给处理器"""
+        started = time.perf_counter()
+        # 消息带有追踪上下文时，处理器执行期间设为当前上下文
+        trace = payload.get('trace') if isinstance(payload, dict) else None
+        token = tracing.activate(trace) if isinstance(trace, dict) else None
+        trace_start = time.monotonic()
         try:
-            raw_text = msg.payload.decode('utf-8', errors='ignore')
-            logging.debug(f"MQTT 原始负载: {raw_text}")
-            payload = json.loads(raw_text)
-            topic = msg.topic
-            
             if self.message_handler:
                 self.message_handler(topic, payload)
+            elif self.router:
+                if not self.router.dispatch(topic, payload):
+                    logging.debug("消息未被任何路由处理: %s", topic)
             else:
                 self.handle_message(topic, payload)
-                
-        except json.JSONDecodeError as e:
-            logging.error(f"解析JSON消息失败: {e}")
         except Exception as e:
             logging.error(f"处理消息时发生错误: {e}")
+            self._m_handler_errors.inc(topic)
+        finally:
+            self._m_handler.observe(time.perf_counter() - started, topic)
+            if token is not None:
+                self.tracer.span(f"handle:{topic}", trace_start, trace=trace)
+                tracing.deactivate(token)
+    
+    @staticmethod
+    def _content_type(msg) -> Optional[str]:
+        """读取 MQTT v5 content-type 属性（3.1.1 连接时为 None）"""
+        properties = getattr(msg, 'properties', None)
+        return getattr(properties, 'ContentType', None) if properties is not None else None
     
     def handle_message(self, topic: str, payload: Dict[str, Any]):
         """处理消息 - 子类可重写"""
-        logging.info(f"收到消息 [{topic}]: {payload}")
+        logging.debug("收到消息 [%s]: %s", topic, payload)
+    
+    def register_handler(self, topic_filter: str, handler: Callable[[str, Dict[str, Any]], Any],
+                         field: Optional[str] = None, value: Any = ANY):
+        """
+        注册消息处理器
+        
+        Args:
+            topic_filter: 主题过滤器，支持 + 和 # 通配符
+            handler: 处理函数，签名为 (topic, payload)
+            field: 按消息中该字段的取值分发（如 'type'、'action'），为 None 时处理该主题的全部消息
+            value: 字段取值；不指定时作为该字段其它取值的默认处理器
+        """
+        self.router.add_route(topic_filter, handler, field=field, value=value)
     
     def add_subscription(self, topic: str, qos: int = 1):
         """
@@ -212,16 +883,61 @@ class MQTTSubscriber(MQTTBase):
             topic: 主题
             qos: 服务质量等级
         """
-        self.subscribed_topics.append((topic, qos))
+        if (topic, qos) not in self.subscribed_topics:
+            self.subscribed_topics.append((topic, qos))
     
-    def on_connect(self, client, userdata, flags, rc):
+    def subscribe_sensor_type(self, sensor_type: str, handler: Callable[[str, Dict[str, Any]], Any], qos: int = 1):
+        """
+        声明需要的传感器类型并注册处理器
+        
+        分层布局下订阅 {topic_prefix}/{sensor_type}/+，由代理完成按类型过滤；
+        扁平布局下订阅 {topic_prefix} 并按消息 type 字段路由。
+        
+        Args:
+            sensor_type: 传感器类型
+            handler: 处理函数，签名为 (topic, payload)
+            qos: 服务质量等级
+        """
+        if self.topic_layout == 'flat':
+            self.add_subscription(self.topic_prefix, qos)
+            self.register_handler(self.topic_prefix, handler, field='type', value=sensor_type)
+        else:
+            topic_filter = self.sensor_topic(sensor_type, '+')
+            self.add_subscription(topic_filter, qos)
+            self.register_handler(topic_filter, handler)
+    
+    def on_connect(self, client, userdata, flags, rc, properties=None):
         """重写连接回调，自动订阅所有主题"""
-        super().on_connect(client, userdata, flags, rc)
+        super().on_connect(client, userdata, flags, rc, properties)
         if rc == 0:
             # 连接成功后订阅所有主题
             for topic, qos in self.subscribed_topics:
                 self.subscribe_topic(topic, qos)
     
+    def connect(self) -> bool:
+        """连接前先启动处理器执行器"""
+        if self.executor is not None:
+            self.executor.start()
+        if (self.last_values is not None and self.last_value_snapshot and self.last_value_snapshot_interval > 0
+                and self._snapshot_thread is None):
+            self._snapshot_stop.clear()
+            self._snapshot_thread = threading.Thread(target=self._snapshot_loop, name='last-value-snapshot',
+                                                     daemon=True)
+            self._snapshot_thread.start()
+        return super().connect()
+    
+    def stop(self):
+        """停止订阅者：先停止接收新消息并处理完已排队的消息，再停止发布队列、断开连接"""
+        if self.executor is not None:
+            # 停止后执行器拒绝新提交的消息；排队中的处理器发布的命令仍经由发布队列和当前连接发出
+            self.executor.stop()
+        super().stop()
+        if self._snapshot_thread is not None:
+            self._snapshot_stop.set()
+            self._snapshot_thread.join(timeout=2.0)
+            self._snapshot_thread = None
+        self.save_last_values()
+    
     def run(self):
         """运行订阅者主循环"""
         if not self.connect():
@@ -274,12 +990,34 @@ class EventPublisher(MQTTBase):
 
 class PeriodicPublisher(MQTTBase):
     """周期性发布者基类"""
+    RELOADABLE_CONFIG = MQTTBase.RELOADABLE_CONFIG | {'publish_interval'}
+    
     def __init__(self, config: Dict[str, Any]):
         super().__init__(config)
         self.publish_interval = config.get('publish_interval', 30)
+        # 停止时提前结束主循环的等待
+        self._stop_event = threading.Event()
+        # publish_cycle 在调度线程中抛出的异常，交回主循环处理（与原先一样结束 start，由宿主或 systemd 重启）
+        self._cycle_error: Optional[BaseException] = None
+        # publish_cycle 可能阻塞（传感器读取与重试）：在发布任务自己的线程中执行，不推迟共享调度器上其他模块的任务。
+        # 只读取缓存数据的子类可设为 False，直接在调度线程中执行
+        self.blocking_cycle = True
+    
+    def apply_config(self, changes: Dict[str, Any]):
+        super().apply_config(changes)
+        if 'publish_interval' in changes:
+            self.publish_interval = changes['publish_interval']
+            job = self._jobs.get('publish')
+            if job is not None:
+                job.set_interval(self.publish_interval)
+    
+    def stop(self):
+        self._cancel_job('publish')
+        super().stop()
+        self._stop_event.set()
     
     def start(self):
-        """启动周期性发布者"""
+        """启动周期性发布者：publish_cycle 由调度线程按固定频率执行（耗时不累积到周期中）"""
         if not self.connect():
             logging.error("无法连接到MQTT代理，退出")
             return False
@@ -287,23 +1025,51 @@ class PeriodicPublisher(MQTTBase):
         self.running = True
         self.init_sensor()
         
-        logging.info(f"周期性传感器 {self.sensor_type} 已启动，发布间隔: {self.publish_interval}秒")
+        logging.info(f"周期性传感器 {self.sensor_type} 已启动，发布间隔: {self.publish_interval}秒"
+                     f"{'（对齐整点）' if self.align_ticks else ''}")
         
+        self._stop_event.clear()
+        self._cycle_error = None
+        self._jobs['publish'] = self.scheduler.every(self.publish_interval, self._run_cycle,
+                                                     name=f"{self.module_name}.publish", align=self.align_ticks,
+                                                     blocking=self.blocking_cycle)
         try:
-            while self.running:
-                self.publish_cycle()
-                time.sleep(self.publish_interval)
+            while self.running and not self._stop_event.wait(1.0):
+                pass
+            if self._cycle_error is not None:
+                raise self._cycle_error
                 
         except KeyboardInterrupt:
             logging.info("收到键盘中断信号")
         except Exception as e:
             logging.error(f"运行过程中发生错误: {e}")
         finally:
+            self._cancel_job('publish')
             self.cleanup_sensor()
             self.stop()
         
         return True
     
+    def _run_cycle(self):
+        if not self.running:
+            return
+        try:
+            self.publish_cycle()
+        except Exception as e:
+            self._cycle_error = e
+            self._cancel_job('publish')
+            self._stop_event.set()
+    
+    def reschedule_cycle(self):
+        """按 next_cycle_delay() 重新安排下一次 publish_cycle（子类在周期之外发布后调用）"""
+        job = self._jobs.get('publish')
+        if job is not None:
+            job.defer(self.next_cycle_delay())
+    
+    def next_cycle_delay(self) -> float:
+        """reschedule_cycle 时距下一次 publish_cycle 的秒数，默认为 publish_interval；子类可按上次发布时刻调整"""
+        return self.publish_interval
+    
     def publish_cycle(self):
         """发布周期数据 - 子类必须重写"""
         raise NotImplementedError("子类必须重写 publish_cycle 方法") 
\ No newline at end of file
@@ -0,0 +1,148 @@
+# -*- coding: utf-8 -*-
+"""
+持久化发件箱
+代理不可达时把已编码的消息写入 SQLite（WAL 模式），重连后按原顺序分批补发；
+消息在采集时已编码，补发不会改变原始时间戳。
+v5 发布属性（编码名、消息 ID、追踪上下文、过期时间）以 JSON 存在 meta 列，补发时据此重建
+"""
+
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+class Outbox:
+    """有容量上限的持久化发件箱
+
+    超出 max_messages 时淘汰最旧的消息；只有收到代理确认后才从发件箱删除，
+    补发过程中断开时剩余消息保留到下次重连。
+    """
+
+    def __init__(self, path: str, max_messages: int = 10000):
+        """
+        初始化发件箱
+
+        Args:
+            path: SQLite 数据库文件路径
+            max_messages: 最多保存的消息条数
+        """
+        self.path = path
+        self.max_messages = max(1, int(max_messages))
+        self._lock = threading.Lock()
+
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        # WAL 模式下 NORMAL 不会损坏数据库，断电时最多丢失最后一个事务
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS outbox ("
+            " id INTEGER PRIMARY KEY AUTOINCREMENT,"
+            " topic TEXT NOT NULL,"
+            " payload BLOB NOT NULL,"
+            " qos INTEGER NOT NULL,"
+            " retain INTEGER NOT NULL,"
+            " created REAL NOT NULL,"
+            " meta TEXT)"
+        )
+        # 旧版本创建的发件箱没有 meta 列
+        columns = [row[1] for row in self._db.execute("PRAGMA table_info(outbox)")]
+        if 'meta' not in columns:
+            self._db.execute("ALTER TABLE outbox ADD COLUMN meta TEXT")
+        self._count = self._db.execute("SELECT COUNT(*) FROM outbox").fetchone()[0]
+
+        # 统计信息
+        self.stats = {
+            'stored': 0,
+            'evicted': 0,
+            'drained': 0,
+            'expired': 0,
+        }
+        if self._count:
+            logger.info(f"发件箱中有 {self._count} 条待补发消息: {path}")
+
+    def __len__(self) -> int:
+        return self._count
+
+    def put(self, topic: str, payload: bytes, qos: int = 1, retain: bool = False,
+            meta: Optional[Dict[str, Any]] = None) -> bool:
+        """
+        写入一条已编码的消息
+
+        Args:
+            meta: 补发时重建发布属性所需的信息（v5），可为 None
+
+        Returns:
+            是否写入成功
+        """
+        with self._lock:
+            try:
+                self._db.execute("BEGIN")
+                overflow = self._count + 1 - self.max_messages
+                if overflow > 0:
+                    self._db.execute(
+                        "DELETE FROM outbox WHERE id IN (SELECT id FROM outbox ORDER BY id LIMIT ?)",
+                        (overflow,))
+                self._db.execute(
+                    "INSERT INTO outbox (topic, payload, qos, retain, created, meta) VALUES (?, ?, ?, ?, ?, ?)",
+                    (topic, sqlite3.Binary(payload), qos, int(retain), time.time(),
+                     json.dumps(meta, separators=(',', ':')) if meta else None))
+                self._db.execute("COMMIT")
+            except sqlite3.Error as e:
+                if self._db.in_transaction:
+                    self._db.execute("ROLLBACK")
+                logger.error(f"写入发件箱失败: {e}")
+                return False
+
+            if overflow > 0:
+                self._count -= overflow
+                self.stats['evicted'] += overflow
+                if self.stats['evicted'] % 100 == 1:
+                    logger.warning(f"发件箱已满，淘汰最旧消息（累计淘汰 {self.stats['evicted']} 条）")
+            self._count += 1
+            self.stats['stored'] += 1
+        return True
+
+    def peek(self, limit: int) -> List[Tuple[int, str, bytes, int, bool, Optional[Dict[str, Any]], float]]:
+        """按写入顺序读取最早的若干条消息（不删除）：(id, 主题, 负载, qos, retain, meta, 写入时间)"""
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT id, topic, payload, qos, retain, meta, created FROM outbox ORDER BY id LIMIT ?",
+                (limit,)).fetchall()
+        return [(row[0], row[1], bytes(row[2]), row[3], bool(row[4]), self._load_meta(row[5]), row[6])
+                for row in rows]
+
+    @staticmethod
+    def _load_meta(text: Optional[str]) -> Optional[Dict[str, Any]]:
+        if not text:
+            return None
+        try:
+            meta = json.loads(text)
+        except ValueError:
+            return None
+        return meta if isinstance(meta, dict) else None
+
+    def ack(self, ids: List[int], expired: bool = False):
+        """删除已被代理确认的消息（expired 为 True 时表示消息已过期、未补发）"""
+        if not ids:
+            return
+        with self._lock:
+            deleted = self._db.execute(
+                f"DELETE FROM outbox WHERE id IN ({','.join('?' * len(ids))})", ids).rowcount
+            self._count = max(0, self._count - deleted)
+            self.stats['expired' if expired else 'drained'] += deleted
+
+    def close(self):
+        """关闭数据库"""
+        with self._lock:
+            try:
+                self._db.close()
+            except sqlite3.Error as e:
+                logger.error(f"关闭发件箱失败: {e}")
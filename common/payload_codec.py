@@ -0,0 +1,368 @@
+# -*- coding: utf-8 -*-
+"""
+消息负载编解码模块
+提供 JSON（可选 orjson 加速）、MessagePack、CBOR 以及针对传感器消息信封的紧凑二进制编码
+"""
+
+import json
+import logging
+import struct
+from typing import Any, Dict, List, Optional, Tuple
+
+from message_router import TopicTrie
+
+logger = logging.getLogger(__name__)
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+try:
+    import cbor2
+except ImportError:
+    cbor2 = None
+
+
+class PayloadCodec:
+    """编解码器基类"""
+
+    name = 'base'
+    content_type = 'application/octet-stream'
+
+    def encode(self, message: Any) -> bytes:
+        raise NotImplementedError("子类必须重写 encode 方法")
+
+    def decode(self, data: bytes) -> Any:
+        raise NotImplementedError("子类必须重写 decode 方法")
+
+
+class JsonCodec(PayloadCodec):
+    """JSON 编解码，安装了 orjson 时自动使用"""
+
+    name = 'json'
+    content_type = 'application/json'
+
+    def encode(self, message: Any) -> bytes:
+        if orjson is not None:
+            return orjson.dumps(message)
+        return json.dumps(message, ensure_ascii=False).encode('utf-8')
+
+    def decode(self, data: bytes) -> Any:
+        if orjson is not None:
+            return orjson.loads(data)
+        return json.loads(data.decode('utf-8', errors='ignore'))
+
+
+class MsgpackCodec(PayloadCodec):
+    """MessagePack 编解码（需要 msgpack）"""
+
+    name = 'msgpack'
+    content_type = 'application/msgpack'
+
+    def __init__(self):
+        if msgpack is None:
+            raise RuntimeError("未安装msgpack库，无法使用msgpack编码")
+
+    def encode(self, message: Any) -> bytes:
+        return msgpack.packb(message, use_bin_type=True)
+
+    def decode(self, data: bytes) -> Any:
+        return msgpack.unpackb(data, raw=False)
+
+
+class CborCodec(PayloadCodec):
+    """CBOR 编解码（需要 cbor2）"""
+
+    name = 'cbor'
+    content_type = 'application/cbor'
+
+    def __init__(self):
+        if cbor2 is None:
+            raise RuntimeError("未安装cbor2库，无法使用CBOR编码")
+
+    def encode(self, message: Any) -> bytes:
+        return cbor2.dumps(message)
+
+    def decode(self, data: bytes) -> Any:
+        return cbor2.loads(data)
+
+
+class CompactSensorCodec(PayloadCodec):
+    """传感器消息信封 {"type", "params", "timestamp"} 的紧凑二进制编码
+
+    布局（大端）：
+        magic(1) flags(1) timestamp(u32) type_len(u8) type
+        param_count(u8) 之后每个参数: key_len(u8) key tag(1) value
+        flags & 0x01 时附带扩展段: ext_len(u32) 其余顶层字段的 JSON
+    参数值按类型打标签，不属于标量的值以 JSON 片段保存；
+    不符合信封结构的消息整体退化为 JSON，解码端按首字节自动识别。
+    """
+
+    name = 'compact'
+    content_type = 'application/x-sensor-compact'
+
+    MAGIC = 0xC5
+    FLAG_EXTENSION = 0x01
+
+    _U32 = struct.Struct('>I')
+    _HEADER = struct.Struct('>BBI')
+    _INT32 = struct.Struct('>i')
+    _INT64 = struct.Struct('>q')
+    _DOUBLE = struct.Struct('>d')
+
+    def __init__(self):
+        self._json = JsonCodec()
+
+    def _fits_envelope(self, message: Any) -> bool:
+        if not isinstance(message, dict):
+            return False
+        timestamp = message.get('timestamp')
+        params = message.get('params')
+        return (isinstance(message.get('type'), str)
+                and isinstance(params, dict) and len(params) < 256
+                and all(isinstance(k, str) for k in params)
+                and isinstance(timestamp, int) and not isinstance(timestamp, bool)
+                and 0 <= timestamp < 2 ** 32)
+
+    @staticmethod
+    def _short_bytes(text: str) -> bytes:
+        data = text.encode('utf-8')
+        if len(data) > 255:
+            raise ValueError(f"字段过长，无法紧凑编码: {text[:20]}...")
+        return bytes((len(data),)) + data
+
+    def _encode_value(self, value: Any) -> bytes:
+        if value is True:
+            return b'T'
+        if value is False:
+            return b'F'
+        if value is None:
+            return b'N'
+        if isinstance(value, int):
+            if -2 ** 31 <= value < 2 ** 31:
+                return b'i' + self._INT32.pack(value)
+            if -2 ** 63 <= value < 2 ** 63:
+                return b'q' + self._INT64.pack(value)
+        elif isinstance(value, float):
+            return b'd' + self._DOUBLE.pack(value)
+        elif isinstance(value, str):
+            data = value.encode('utf-8')
+            return b's' + self._U32.pack(len(data)) + data
+        data = self._json.encode(value)
+        return b'j' + self._U32.pack(len(data)) + data
+
+    def encode(self, message: Any) -> bytes:
+        if not self._fits_envelope(message):
+            return self._json.encode(message)
+
+        extension = {k: v for k, v in message.items() if k not in ('type', 'params', 'timestamp')}
+        flags = self.FLAG_EXTENSION if extension else 0
+        try:
+            parts = [self._HEADER.pack(self.MAGIC, flags, message['timestamp']),
+                     self._short_bytes(message['type']),
+                     bytes((len(message['params']),))]
+            for key, value in message['params'].items():
+                parts.append(self._short_bytes(key))
+                parts.append(self._encode_value(value))
+        except ValueError:
+            return self._json.encode(message)
+
+        if extension:
+            data = self._json.encode(extension)
+            parts.append(self._U32.pack(len(data)))
+            parts.append(data)
+        return b''.join(parts)
+
+    def _read_short(self, data: bytes, offset: int) -> Tuple[str, int]:
+        length = data[offset]
+        offset += 1
+        return data[offset:offset + length].decode('utf-8'), offset + length
+
+    def _read_blob(self, data: bytes, offset: int) -> Tuple[bytes, int]:
+        (length,) = self._U32.unpack_from(data, offset)
+        offset += 4
+        return data[offset:offset + length], offset + length
+
+    def decode(self, data: bytes) -> Any:
+        if not data or data[0] != self.MAGIC:
+            return self._json.decode(data)
+
+        _, flags, timestamp = self._HEADER.unpack_from(data, 0)
+        offset = self._HEADER.size
+        sensor_type, offset = self._read_short(data, offset)
+        count = data[offset]
+        offset += 1
+
+        params: Dict[str, Any] = {}
+        for _ in range(count):
+            key, offset = self._read_short(data, offset)
+            tag = data[offset:offset + 1]
+            offset += 1
+            if tag == b'T':
+                value = True
+            elif tag == b'F':
+                value = False
+            elif tag == b'N':
+                value = None
+            elif tag == b'i':
+                (value,) = self._INT32.unpack_from(data, offset)
+                offset += 4
+            elif tag == b'q':
+                (value,) = self._INT64.unpack_from(data, offset)
+                offset += 8
+            elif tag == b'd':
+                (value,) = self._DOUBLE.unpack_from(data, offset)
+                offset += 8
+            elif tag == b's':
+                blob, offset = self._read_blob(data, offset)
+                value = blob.decode('utf-8')
+            elif tag == b'j':
+                blob, offset = self._read_blob(data, offset)
+                value = self._json.decode(blob)
+            else:
+                raise ValueError(f"未知的紧凑编码标签: {tag!r}")
+            params[key] = value
+
+        message = {'type': sensor_type, 'params': params, 'timestamp': timestamp}
+        if flags & self.FLAG_EXTENSION:
+            blob, offset = self._read_blob(data, offset)
+            message.update(self._json.decode(blob))
+        return message
+
+
+_CODEC_CLASSES = {
+    JsonCodec.name: JsonCodec,
+    MsgpackCodec.name: MsgpackCodec,
+    CborCodec.name: CborCodec,
+    CompactSensorCodec.name: CompactSensorCodec,
+}
+
+_codec_instances: Dict[str, PayloadCodec] = {}
+
+
+def get_codec(name: str) -> PayloadCodec:
+    """按名称获取编解码器实例（同名共享）"""
+    name = (name or JsonCodec.name).strip().lower()
+    codec = _codec_instances.get(name)
+    if codec is None:
+        codec_class = _CODEC_CLASSES.get(name)
+        if codec_class is None:
+            raise ValueError(f"未知的编码格式: {name}")
+        codec = codec_class()
+        _codec_instances[name] = codec
+    return codec
+
+
+def get_codec_by_content_type(content_type: str) -> Optional[PayloadCodec]:
+    """按 MQTT v5 content-type 获取编解码器"""
+    for name, codec_class in _CODEC_CLASSES.items():
+        if codec_class.content_type == content_type:
+            try:
+                return get_codec(name)
+            except RuntimeError:
+                return None
+    return None
+
+
+def sniff_codec(data: bytes) -> Optional[PayloadCodec]:
+    """根据首字节识别编码格式，无法识别时返回 None"""
+    if not data:
+        return None
+    first = data[0]
+    if first in (0x7B, 0x5B, 0x20, 0x09, 0x0A, 0x0D):  # { [ 及空白
+        return get_codec(JsonCodec.name)
+    if first == CompactSensorCodec.MAGIC:
+        return get_codec(CompactSensorCodec.name)
+    try:
+        if msgpack is not None and (0x80 <= first <= 0x8F or first in (0xDE, 0xDF)):
+            return get_codec(MsgpackCodec.name)
+        if cbor2 is not None and 0xA0 <= first <= 0xBF:
+            return get_codec(CborCodec.name)
+    except RuntimeError:
+        pass
+    return None
+
+
+def parse_topic_codecs(spec: str) -> List[Tuple[str, str]]:
+    """
+    解析按主题指定编码的配置
+
+    Args:
+        spec: 形如 "sensor/#=compact, actuator/#=json" 的字符串
+
+    Returns:
+        [(主题过滤器, 编码名)] 列表，保持配置顺序
+    """
+    mapping = []
+    for item in (spec or '').replace(';', ',').split(','):
+        item = item.strip()
+        if not item:
+            continue
+        topic_filter, sep, name = item.partition('=')
+        if not sep:
+            raise ValueError(f"无效的主题编码配置: {item}")
+        mapping.append((topic_filter.strip(), name.strip().lower()))
+    return mapping
+
+
+class CodecSelector:
+    """按主题选择编解码器，先配置的规则优先"""
+
+    def __init__(self, default: str = 'json', topic_codecs: Optional[List[Tuple[str, str]]] = None):
+        self.default = get_codec(default)
+        self._trie = TopicTrie()
+        self._has_rules = False
+        self._cache: Dict[str, PayloadCodec] = {}
+        for order, (topic_filter, name) in enumerate(topic_codecs or []):
+            self._trie.insert(topic_filter, (order, get_codec(name)))
+            self._has_rules = True
+
+    @classmethod
+    def from_config(cls, config: Dict[str, Any]) -> 'CodecSelector':
+        """从配置字典创建（payload_codec / topic_codecs）"""
+        topic_codecs = config.get('topic_codecs', [])
+        if isinstance(topic_codecs, str):
+            topic_codecs = parse_topic_codecs(topic_codecs)
+        elif isinstance(topic_codecs, dict):
+            topic_codecs = list(topic_codecs.items())
+        return cls(config.get('payload_codec', 'json'), topic_codecs)
+
+    def for_topic(self, topic: str) -> PayloadCodec:
+        """获取发布到该主题时使用的编解码器"""
+        if not self._has_rules:
+            return self.default
+        codec = self._cache.get(topic)
+        if codec is None:
+            matches = self._trie.match(topic)
+            codec = min(matches, key=lambda m: m[0])[1] if matches else self.default
+            self._cache[topic] = codec
+        return codec
+
+    def encode(self, topic: str, message: Any) -> Tuple[bytes, PayloadCodec]:
+        """编码消息，返回 (负载, 使用的编解码器)"""
+        codec = self.for_topic(topic)
+        return codec.encode(message), codec
+
+    def decode(self, topic: str, data: bytes, content_type: Optional[str] = None) -> Any:
+        """
+        解码消息：MQTT v5 content-type 优先，其次按首字节识别，最后按主题配置
+
+        Args:
+            topic: 主题
+            data: 原始负载
+            content_type: MQTT v5 content-type 属性（可选）
+        """
+        codec = None
+        if content_type:
+            codec = get_codec_by_content_type(content_type)
+        if codec is None:
+            codec = sniff_codec(data)
+        if codec is None:
+            codec = self.for_topic(topic)
+        return codec.decode(data)
@@ -0,0 +1,164 @@
+# -*- coding: utf-8 -*-
+"""
+出站发布队列
+有界队列 + 独立发送线程，支持按批量/时间窗口刷新以及按键合并（最新值优先）
+"""
+
+import itertools
+import logging
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class PublishQueue:
+    """有界、可合并的出站发布队列
+
+    调用方线程只负责入队，序列化与 client.publish 在发送线程中完成。
+    带 coalesce_key 的消息在队列中按键去重：同一键尚未发出的旧值会被新值覆盖，
+    位置保持不变；不带键的消息按入队顺序逐条发送。
+    """
+
+    def __init__(self, send_func: Callable[[str, Dict[str, Any], int, bool, bool], bool],
+                 max_size: int = 256, batch_size: int = 32, flush_interval: float = 0.05,
+                 name: str = 'mqtt-publish-queue'):
+        """
+        初始化发布队列
+
+        Args:
+            send_func: 实际发送函数，签名为 (topic, message, qos, retain, persist) -> bool
+            max_size: 队列最大长度，满时丢弃最旧的消息
+            batch_size: 达到该数量立即刷新
+            flush_interval: 首条消息入队后最多等待的秒数
+            name: 发送线程名称
+        """
+        self.send_func = send_func
+        self.max_size = max(1, int(max_size))
+        self.batch_size = max(1, int(batch_size))
+        self.flush_interval = max(0.0, float(flush_interval))
+        self.name = name
+
+        self._pending: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self._cond = threading.Condition()
+        self._seq = itertools.count()
+        self._first_enqueue: Optional[float] = None
+        self._stopping = False
+        self._thread: Optional[threading.Thread] = None
+
+        # 统计信息
+        self.stats = {
+            'enqueued': 0,
+            'coalesced': 0,
+            'dropped': 0,
+            'sent': 0,
+            'failed': 0,
+        }
+
+    def __len__(self) -> int:
+        return len(self._pending)
+
+    def start(self):
+        """启动发送线程"""
+        if self._thread and self._thread.is_alive():
+            return
+        self._stopping = False
+        self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+        self._thread.start()
+        logger.info(f"发布队列已启动: max_size={self.max_size}, batch_size={self.batch_size}, "
+                    f"flush_interval={self.flush_interval}s")
+
+    def stop(self, timeout: float = 2.0):
+        """停止发送线程，尽量发送完剩余消息"""
+        with self._cond:
+            self._stopping = True
+            self._cond.notify_all()
+        if self._thread and self._thread.is_alive():
+            self._thread.join(timeout=timeout)
+        self._thread = None
+        logger.info(f"发布队列已停止，统计: {self.stats}")
+
+    def put(self, topic: str, message: Dict[str, Any], qos: int = 1, retain: bool = False,
+            coalesce_key: Optional[Hashable] = None, persist: bool = False) -> bool:
+        """
+        消息入队（不阻塞）
+
+        Args:
+            topic: 主题
+            message: 消息内容
+            qos: 服务质量等级
+            retain: 是否保留消息
+            coalesce_key: 合并键，同键未发送的旧消息会被覆盖
+            persist: 发送时代理不可达则写入持久化发件箱
+
+        Returns:
+            是否已接受入队
+        """
+        item = (topic, message, qos, retain, persist)
+        with self._cond:
+            if self._stopping:
+                return False
+
+            self.stats['enqueued'] += 1
+            if coalesce_key is not None:
+                key = ('c', coalesce_key)
+                if key in self._pending:
+                    self._pending[key] = item
+                    self.stats['coalesced'] += 1
+                    return True
+            else:
+                key = ('s', next(self._seq))
+
+            if len(self._pending) >= self.max_size:
+                self._pending.popitem(last=False)
+                self.stats['dropped'] += 1
+                if self.stats['dropped'] % 100 == 1:
+                    logger.warning(f"发布队列已满，丢弃最旧消息（累计丢弃 {self.stats['dropped']} 条）")
+
+            self._pending[key] = item
+            if len(self._pending) == 1:
+                self._first_enqueue = time.monotonic()
+                self._cond.notify()
+            elif len(self._pending) >= self.batch_size:
+                self._cond.notify()
+        return True
+
+    def _take_batch(self) -> Optional[list]:
+        """等待刷新条件满足后取出一批消息；停止且队列为空时返回 None"""
+        with self._cond:
+            while not self._pending and not self._stopping:
+                self._cond.wait()
+            if not self._pending:
+                return None
+
+            # 时间窗口：凑够一批或首条消息等待超过 flush_interval
+            deadline = (self._first_enqueue or time.monotonic()) + self.flush_interval
+            while len(self._pending) < self.batch_size and not self._stopping:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._cond.wait(remaining)
+
+            batch = []
+            while self._pending and len(batch) < self.batch_size:
+                batch.append(self._pending.popitem(last=False)[1])
+            self._first_enqueue = time.monotonic() if self._pending else None
+            return batch
+
+    def _run(self):
+        """发送线程主循环"""
+        while True:
+            batch = self._take_batch()
+            if batch is None:
+                break
+            for topic, message, qos, retain, persist in batch:
+                try:
+                    if self.send_func(topic, message, qos, retain, persist):
+                        self.stats['sent'] += 1
+                    else:
+                        self.stats['failed'] += 1
+                except Exception as e:
+                    self.stats['failed'] += 1
+                    logger.error(f"发送队列消息时发生错误: {e}")
@@ -0,0 +1,286 @@
+# -*- coding: utf-8 -*-
+"""
+周期任务调度器
+单个线程按截止时间（最小堆）驱动多个周期任务，替代每个任务一个 sleep 循环线程：
+- 固定频率：下一次截止时间 = 本次截止时间 + 周期，任务耗时不会让周期逐渐变长
+- 整点对齐（可选）：截止时间取墙上时钟 interval 的整数倍，同一节点上的各传感器在同一时刻采样
+- 统计：执行次数、迟到（开始时刻晚于截止时间）、超时（耗时超过周期）、错过的周期（整个周期都没能执行，直接跳过）
+
+    job = shared_scheduler().every(30, publisher.publish_cycle, name='dht22.publish', align=True)
+    ...
+    job.cancel()
+
+任务默认在调度线程中依次执行，耗时较长的任务会推迟其他任务（计入它们的迟到和错过的周期）。
+可能阻塞的任务（传感器读取与重试）以 blocking=True 添加：调度线程到期时只把它交给该任务自己的工作线程，
+不等它执行完；执行完后才安排下一次，执行时间超过周期时与非阻塞任务一样计入超时和错过的周期。
+"""
+
+import heapq
+import itertools
+import logging
+import math
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class Job:
+    """周期任务（由 Scheduler.every 创建）"""
+
+    def __init__(self, scheduler: 'Scheduler', func: Callable[[], Any], interval: float, name: str, align: bool,
+                 blocking: bool = False):
+        self.scheduler = scheduler
+        self.func = func
+        self.interval = float(interval)
+        self.name = name
+        self.align = align
+        self.blocking = blocking
+        self.cancelled = False
+        # 统计
+        self.runs = 0
+        self.missed = 0
+        self.overruns = 0
+        self.errors = 0
+        self.max_lateness = 0.0
+        self.last_duration = 0.0
+        # 调度状态（由调度器在持锁时修改）
+        self._due = 0.0
+        self._wall_due: Optional[float] = None
+        self._token = 0
+        self._running = False
+        self._override: Optional[float] = None
+        # 阻塞任务的工作线程及交给它的截止时间
+        self._worker: Optional[threading.Thread] = None
+        self._handoff_due: Optional[float] = None
+        self._wakeup = threading.Event()
+
+    def cancel(self):
+        """取消任务（正在执行的这一次会执行完）"""
+        self.scheduler._cancel(self)
+
+    def set_interval(self, interval: float):
+        """修改周期，并立即开始新的周期"""
+        self.scheduler._reschedule(self, 0.0, interval)
+
+    def defer(self, delay: float):
+        """下一次改为 delay 秒后执行，之后从该时刻起按周期继续（对齐的任务重新对齐到整点）"""
+        self.scheduler._reschedule(self, delay)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'name': self.name,
+            'interval': self.interval,
+            'align': self.align,
+            'blocking': self.blocking,
+            'runs': self.runs,
+            'missed': self.missed,
+            'overruns': self.overruns,
+            'errors': self.errors,
+            'max_lateness': round(self.max_lateness, 6),
+            'last_duration': round(self.last_duration, 6),
+        }
+
+
+class Scheduler:
+    """单线程周期任务调度器；没有任务时线程退出，添加任务时重新启动"""
+
+    def __init__(self, name: str = 'scheduler'):
+        self.name = name
+        self._heap: List[tuple] = []
+        self._jobs: List[Job] = []
+        self._seq = itertools.count()
+        self._cond = threading.Condition()
+        self._thread: Optional[threading.Thread] = None
+
+    def every(self, interval: float, func: Callable[[], Any], name: Optional[str] = None,
+              align: bool = False, run_now: bool = True, blocking: bool = False) -> Job:
+        """
+        添加周期任务
+
+        Args:
+            interval: 周期（秒）
+            func: 任务函数（在调度线程中执行，异常会被记录，不影响后续执行）
+            name: 任务名称（用于日志与统计）
+            align: 是否对齐到墙上时钟 interval 的整数倍
+            run_now: 是否立即执行一次（对齐的任务之后从下一个整点开始）
+            blocking: 任务可能阻塞（如传感器读取重试）：在该任务自己的工作线程中执行，不占用调度线程
+        """
+        if interval <= 0:
+            raise ValueError(f"周期必须大于 0: {interval}")
+        job = Job(self, func, interval, name or getattr(func, '__name__', 'job'), align, blocking)
+        with self._cond:
+            self._jobs.append(job)
+            if run_now:
+                self._push(job, time.monotonic())
+            else:
+                self._push(job, self._next_due(job, time.monotonic(), time.time()))
+            self._ensure_thread()
+            self._cond.notify()
+        return job
+
+    def stats(self) -> List[Dict[str, Any]]:
+        """所有任务的统计"""
+        with self._cond:
+            return [job.stats() for job in self._jobs]
+
+    def _ensure_thread(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+            self._thread.start()
+
+    def _push(self, job: Job, due: float):
+        job._due = due
+        job._token += 1
+        heapq.heappush(self._heap, (due, next(self._seq), job, job._token))
+
+    def _next_due(self, job: Job, mono_now: float, wall_now: float) -> float:
+        """未对齐的任务在 mono_now + interval，对齐的任务在下一个整点"""
+        if not job.align:
+            return mono_now + job.interval
+        job._wall_due = (math.floor(wall_now / job.interval) + 1) * job.interval
+        return mono_now + (job._wall_due - wall_now)
+
+    def _cancel(self, job: Job):
+        with self._cond:
+            if job.cancelled:
+                return
+            job.cancelled = True
+            job._token += 1
+            self._jobs.remove(job)
+            self._cond.notify()
+        # 唤醒空闲的工作线程退出
+        job._wakeup.set()
+
+    def _reschedule(self, job: Job, delay: float, interval: Optional[float] = None):
+        with self._cond:
+            if job.cancelled:
+                return
+            if interval is not None:
+                job.interval = float(interval)
+            job._wall_due = None
+            due = time.monotonic() + max(0.0, delay)
+            if job._running:
+                # 正在执行：执行完后按新的时间安排
+                job._override = due
+            else:
+                self._push(job, due)
+                self._cond.notify()
+
+    def _advance(self, job: Job, due: float, mono_now: float) -> float:
+        """计算下一次截止时间，跳过已经错过的周期"""
+        if job._override is not None:
+            next_due, job._override = job._override, None
+            return next_due
+        interval = job.interval
+        if job.align:
+            wall_now = time.time()
+            # 单调时钟与墙上时钟之间有微小偏差，本次整点稍晚于当前时刻是正常的；超出容差说明墙上时钟被往回调
+            if job._wall_due is None or job._wall_due - wall_now > min(1.0, interval / 2):
+                # 首次执行（run_now）、被推迟过或墙上时钟被往回调：重新对齐
+                return self._next_due(job, mono_now, wall_now)
+            wall_due = job._wall_due + interval
+            if wall_due <= wall_now:
+                skipped = math.floor((wall_now - wall_due) / interval) + 1
+                job.missed += skipped
+                wall_due += skipped * interval
+            job._wall_due = wall_due
+            return mono_now + (wall_due - wall_now)
+        next_due = due + interval
+        if next_due <= mono_now:
+            skipped = math.floor((mono_now - next_due) / interval) + 1
+            job.missed += skipped
+            next_due += skipped * interval
+        return next_due
+
+    def _run(self):
+        while True:
+            with self._cond:
+                job = due = None
+                while job is None:
+                    if not self._jobs:
+                        self._thread = None
+                        self._heap.clear()
+                        return
+                    if not self._heap:
+                        self._cond.wait()
+                        continue
+                    next_due, _, candidate, token = self._heap[0]
+                    if candidate.cancelled or token != candidate._token:
+                        heapq.heappop(self._heap)
+                        continue
+                    delay = next_due - time.monotonic()
+                    if delay > 0:
+                        self._cond.wait(delay)
+                        continue
+                    heapq.heappop(self._heap)
+                    job, due = candidate, next_due
+                job._running = True
+
+            if job.blocking:
+                self._handoff(job, due)
+            else:
+                self._execute(job, due)
+
+    def _handoff(self, job: Job, due: float):
+        """把到期的阻塞任务交给它的工作线程（上一次执行完之前任务不在堆中，不会重复交付）"""
+        job._handoff_due = due
+        if job._worker is None:
+            job._worker = threading.Thread(target=self._work, args=(job,), name=f"{self.name}:{job.name}", daemon=True)
+            job._worker.start()
+        job._wakeup.set()
+
+    def _work(self, job: Job):
+        while True:
+            job._wakeup.wait()
+            job._wakeup.clear()
+            with self._cond:
+                due, job._handoff_due = job._handoff_due, None
+                if job.cancelled:
+                    job._running = False
+                    job._worker = None
+                    return
+            if due is not None:
+                self._execute(job, due)
+
+    def _execute(self, job: Job, due: float):
+        started = time.monotonic()
+        lateness = started - due
+        try:
+            job.func()
+        except Exception as e:
+            job.errors += 1
+            logger.error(f"周期任务 {job.name} 执行出错: {e}")
+        finished = time.monotonic()
+        duration = finished - started
+
+        with self._cond:
+            job._running = False
+            job.runs += 1
+            job.last_duration = duration
+            job.max_lateness = max(job.max_lateness, lateness)
+            missed_before = job.missed
+            if duration > job.interval:
+                job.overruns += 1
+                logger.warning(f"周期任务 {job.name} 耗时 {duration:.2f} 秒，超过周期 {job.interval:g} 秒")
+            if job.cancelled:
+                return
+            self._push(job, self._advance(job, due, finished))
+            skipped = job.missed - missed_before
+            # 工作线程安排的下一次可能早于调度线程正在等待的截止时间
+            self._cond.notify()
+        if skipped:
+            logger.warning(f"周期任务 {job.name} 错过 {skipped} 个周期")
+
+_shared: Optional[Scheduler] = None
+_shared_lock = threading.Lock()
+
+
+def shared_scheduler() -> Scheduler:
+    """进程内共享的调度器（模块宿主中所有模块的周期任务由同一个线程驱动）"""
+    global _shared
+    with _shared_lock:
+        if _shared is None:
+            _shared = Scheduler('periodic-scheduler')
+        return _shared
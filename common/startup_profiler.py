@@ -0,0 +1,184 @@
+# -*- coding: utf-8 -*-
+"""
+启动耗时分析
+入口脚本带 --profile-startup[=超时秒数] 运行时，记录解释器启动、导入、读取配置、创建模块各阶段的耗时，
+以及首次连接、订阅完成（订阅者）或首次发布（发布者）的时刻，输出报告后退出：
+
+    import startup_profiler  # 须先于其余项目模块和第三方库导入，才能统计导入耗时
+    ...
+    profiler = startup_profiler.StartupProfiler('pir', target='published')
+    config = ConfigManager().get_all_config()
+    profiler.mark('读取配置')
+    publisher = PIRPublisher(config)
+    profiler.mark('创建模块')
+    profiler.run(publisher, publisher.start)  # 未启用时直接调用 publisher.start()
+
+导入耗时通过替换 builtins.__import__ 统计，只在启用时安装。
+"""
+
+import builtins
+import os
+import sys
+import threading
+import time
+import unicodedata
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+FLAG = '--profile-startup'
+DEFAULT_TIMEOUT = 60.0
+
+# 启动里程碑（MQTTBase.on_startup_event）的显示名
+EVENT_LABELS = {
+    'connected': '首次连接',
+    'subscribed': '订阅完成',
+    'published': '首次发布',
+}
+
+_imported_at = time.perf_counter()
+
+
+def _flag_value(argv: List[str]) -> Optional[float]:
+    """解析 --profile-startup[=秒]，未指定时返回 None"""
+    for arg in argv[1:]:
+        if arg == FLAG:
+            return DEFAULT_TIMEOUT
+        if arg.startswith(FLAG + '='):
+            try:
+                return float(arg.split('=', 1)[1])
+            except ValueError:
+                return DEFAULT_TIMEOUT
+    return None
+
+
+TIMEOUT = _flag_value(sys.argv)
+ENABLED = TIMEOUT is not None
+
+
+def _process_age() -> float:
+    """进程已运行的秒数（解释器启动耗时），仅 Linux 可用，其余平台返回 0"""
+    try:
+        with open('/proc/self/stat', 'r') as f:
+            # 第 2 个字段（命令名）可能含空格，从右括号之后开始切分
+            fields = f.read().rsplit(')', 1)[1].split()
+        with open('/proc/uptime', 'r') as f:
+            uptime = float(f.read().split()[0])
+        # starttime 为第 22 个字段，切分后下标为 19
+        started = int(fields[19]) / os.sysconf('SC_CLK_TCK')
+        return max(0.0, uptime - started)
+    except (OSError, ValueError, IndexError):
+        return 0.0
+
+
+_interpreter_startup = _process_age() if ENABLED else 0.0
+
+# 模块名 -> 导入耗时（秒，含嵌套导入）
+_import_times: Dict[str, float] = {}
+_original_import = builtins.__import__
+
+
+def _timed_import(name, globals=None, locals=None, fromlist=(), level=0):
+    if level or name in sys.modules:
+        return _original_import(name, globals, locals, fromlist, level)
+    started = time.perf_counter()
+    try:
+        return _original_import(name, globals, locals, fromlist, level)
+    finally:
+        _import_times.setdefault(name, time.perf_counter() - started)
+
+
+if ENABLED:
+    builtins.__import__ = _timed_import
+
+
+def _ljust(text: str, width: int) -> str:
+    """按终端显示宽度左对齐（中文占两列）"""
+    columns = sum(2 if unicodedata.east_asian_width(ch) in ('W', 'F') else 1 for ch in text)
+    return text + ' ' * max(0, width - columns)
+
+
+class StartupProfiler:
+    """按阶段记录启动耗时；未启用（没有 --profile-startup）时所有方法都是空操作"""
+
+    def __init__(self, name: str, target: str = 'subscribed', top_imports: int = 10):
+        """
+        Args:
+            name: 模块名（用于报告标题）
+            target: 以哪个里程碑作为启动完成：subscribed（订阅者）或 published（发布者）
+            top_imports: 报告中列出的最慢导入条数
+        """
+        self.name = name
+        self.target = target
+        self.top_imports = top_imports
+        self.enabled = ENABLED
+        self.timeout = TIMEOUT or DEFAULT_TIMEOUT
+        self._phases: List[Tuple[str, float]] = []
+        self._events: Dict[str, float] = {}
+        self._done = threading.Event()
+        self._last = _imported_at
+        if self.enabled:
+            self.mark('导入')
+
+    def mark(self, phase: str):
+        """记录从上一阶段结束到现在的耗时"""
+        if not self.enabled:
+            return
+        now = time.perf_counter()
+        self._phases.append((phase, now - self._last))
+        self._last = now
+
+    def event(self, event: str):
+        """启动里程碑回调（挂到 module.startup_listener，在网络线程中调用）"""
+        self._events.setdefault(event, time.perf_counter())
+        if event == self.target:
+            self._done.set()
+
+    def run(self, module, start: Callable[[], Any]):
+        """
+        启动模块；启用时在后台线程中运行 start，到达目标里程碑或超时后输出报告并停止模块
+
+        Args:
+            module: MQTTBase 实例
+            start: 模块主循环（如 publisher.start、subscriber.run）
+        """
+        if not self.enabled:
+            return start()
+        module.startup_listener = self.event
+        started_at = time.perf_counter()
+        worker = threading.Thread(target=start, name='startup-profile', daemon=True)
+        worker.start()
+        deadline = time.monotonic() + self.timeout
+        # 主循环提前退出（如连接失败）时不必等到超时
+        while not self._done.wait(0.2) and worker.is_alive() and time.monotonic() < deadline:
+            pass
+        print(self.report(started_at))
+        builtins.__import__ = _original_import
+        # 主循环每秒检查 running 后自行清理；周期性发布者可能正在休眠，超时后直接停止
+        module.running = False
+        worker.join(timeout=3.0)
+        if worker.is_alive():
+            module.stop()
+
+    def report(self, started_at: Optional[float] = None) -> str:
+        """生成文本报告"""
+        rows = [('解释器启动', _interpreter_startup)] if _interpreter_startup else []
+        rows.extend(self._phases)
+        base = started_at if started_at is not None else self._last
+        for event, at in sorted(self._events.items(), key=lambda item: item[1]):
+            rows.append((EVENT_LABELS.get(event, event), at - base))
+            base = at
+
+        lines = [f"==== 启动耗时分析: {self.name} ====", f"{_ljust('阶段', 12)}{'耗时(ms)':>10}{'累计(ms)':>10}"]
+        total = 0.0
+        for label, seconds in rows:
+            total += seconds
+            lines.append(f"{_ljust(label, 12)}{seconds * 1000:>12.1f}{total * 1000:>12.1f}")
+        if self.target not in self._events:
+            lines.append(f"未到达: {EVENT_LABELS.get(self.target, self.target)}（超时 {self.timeout:g} 秒或主循环已退出）")
+
+        slowest = sorted(_import_times.items(), key=lambda item: item[1], reverse=True)[:self.top_imports]
+        if slowest:
+            lines.append("最慢的导入（含嵌套导入与延迟导入）:")
+            width = max(len(name) for name, _ in slowest)
+            for name, seconds in slowest:
+                lines.append(f"  {name:<{width}}  {seconds * 1000:>9.1f} ms")
+        return '\n'.join(lines)
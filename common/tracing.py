@@ -0,0 +1,135 @@
+# -*- coding: utf-8 -*-
+"""
+端到端延迟追踪
+传感器在边沿回调中创建追踪上下文（追踪ID + 墙钟/单调时钟时间戳），随消息的 trace 字段逐跳传递；
+订阅端执行处理器期间把该上下文设为当前上下文，处理器中发布的消息自动带上同一个 trace。
+每一跳记录一个 span，屏幕刷新、开始播放等输出动作记录为 output，由 trace_report 汇总延迟。
+"""
+
+import contextvars
+import os
+import random
+import time
+from typing import Any, Callable, Dict, Optional
+
+_current: contextvars.ContextVar = contextvars.ContextVar('mqtt_trace', default=None)
+
+# span 类型：hop 为中间环节（发布、处理器），output 为最终输出（像素、声音）
+HOP = 'hop'
+OUTPUT = 'output'
+
+
+def new_trace(origin: str, host: str) -> Dict[str, Any]:
+    """
+    创建追踪上下文
+
+    Args:
+        origin: 起点（通常为传感器类型）
+        host: 创建时所在主机，同一主机上各进程可直接比较单调时钟
+
+    Returns:
+        {'id', 'origin', 'host', 't0'(墙钟秒), 'm0'(单调时钟秒)}
+    """
+    return {
+        'id': os.urandom(8).hex(),
+        'origin': origin,
+        'host': host,
+        't0': time.time(),
+        'm0': time.monotonic(),
+    }
+
+
+def current() -> Optional[Dict[str, Any]]:
+    """当前线程/任务中的追踪上下文"""
+    return _current.get()
+
+
+def activate(trace: Optional[Dict[str, Any]]) -> contextvars.Token:
+    """设为当前追踪上下文，返回用于恢复的 token"""
+    return _current.set(trace)
+
+
+def deactivate(token: contextvars.Token):
+    _current.reset(token)
+
+
+def attach(message: Any, trace: Optional[Dict[str, Any]] = None) -> Any:
+    """
+    给待发布的消息附加追踪上下文（不修改调用方的字典）
+
+    未指定 trace 时使用当前上下文；消息已带 trace 或不是字典时原样返回。
+    """
+    trace = trace or _current.get()
+    if trace is None or not isinstance(message, dict) or 'trace' in message:
+        return message
+    message = dict(message)
+    message['trace'] = trace
+    return message
+
+
+class Tracer:
+    """span 记录器，由 MQTTBase 创建，span 通过 emit 回调发布"""
+
+    def __init__(self, emit: Callable[[Dict[str, Any]], None], module: str, host: str,
+                 enabled: bool = False, sample_rate: float = 1.0):
+        """
+        初始化记录器
+
+        Args:
+            emit: 发送 span 记录的回调
+            module: 模块名
+            host: 主机标识（sensor_id）
+            enabled: 是否创建追踪并记录 span（关闭时消息中已有的 trace 仍会继续传递）
+            sample_rate: 采样率（0~1），只影响新建追踪
+        """
+        self.emit = emit
+        self.module = module
+        self.host = host
+        self.enabled = bool(enabled)
+        self.sample_rate = max(0.0, min(1.0, float(sample_rate)))
+
+    def start(self, origin: str) -> Optional[Dict[str, Any]]:
+        """在传感器边沿处创建追踪（未开启或未被采样时返回 None）"""
+        if not self.enabled or (self.sample_rate < 1.0 and random.random() >= self.sample_rate):
+            return None
+        return new_trace(origin, self.host)
+
+    def span(self, name: str, start: float, end: Optional[float] = None,
+             trace: Optional[Dict[str, Any]] = None, kind: str = HOP):
+        """
+        记录一个 span
+
+        Args:
+            name: 名称（如 handle:actuator/oled）
+            start: 开始时刻（time.monotonic()）
+            end: 结束时刻，默认为当前时刻
+            trace: 追踪上下文，默认为当前上下文
+            kind: hop 或 output
+        """
+        trace = trace or _current.get()
+        if not self.enabled or trace is None:
+            return
+        end = time.monotonic() if end is None else end
+        try:
+            self.emit({
+                'trace_id': trace.get('id'),
+                'origin': trace.get('origin'),
+                'trace_host': trace.get('host'),
+                't0': trace.get('t0'),
+                'm0': trace.get('m0'),
+                'name': name,
+                'kind': kind,
+                'module': self.module,
+                'host': self.host,
+                'start': start,
+                'end': end,
+                'wall': time.time() - (time.monotonic() - end),
+            })
+        except Exception:
+            # 追踪不能影响业务流程
+            pass
+
+    def mark(self, name: str, trace: Optional[Dict[str, Any]] = None):
+        """记录输出动作（屏幕刷新完成、开始播放等）"""
+        now = time.monotonic()
+        self.span(name, now, now, trace=trace, kind=OUTPUT)
@@ -0,0 +1,85 @@
+# -*- coding: utf-8 -*-
+"""
+模块宿主主程序
+在同一个进程中运行多个传感器/执行器/管理器模块，共用一条MQTT连接
+"""
+
+import configparser
+import logging
+import os
+import sys
+from typing import Any, Dict, List, Tuple
+
+# 添加common目录到路径
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'common'))
+
+from config_store import MQTT_CONNECTION, ConfigStore, Option, Schema
+from module_host import KNOWN_MODULES, REPO_ROOT, ModuleHost
+from log_setup import setup_logging, load_logging_config
+
+
+def parse_modules(parser: configparser.ConfigParser) -> List[Tuple[str, str, str]]:
+    """
+    解析 [host] modules 列表
+
+    每一项可以是已知模块名（如 pir），也可以是 名称=入口脚本路径；
+    模块配置文件默认为入口脚本同目录下的 config.ini，可在 [module.<名称>] config 中覆盖。
+    """
+    spec = parser.get('host', 'modules', fallback='')
+    modules = []
+    for item in spec.replace('\n', ',').split(','):
+        item = item.strip()
+        if not item:
+            continue
+        name, sep, entry = item.partition('=')
+        name = name.strip()
+        if sep:
+            entry = entry.strip()
+        elif name in KNOWN_MODULES:
+            entry = KNOWN_MODULES[name]
+        else:
+            logging.error(f"未知模块 {name}，请使用 名称=入口脚本路径 的形式配置")
+            continue
+        entry = os.path.join(REPO_ROOT, entry) if not os.path.isabs(entry) else entry
+
+        section = f"module.{name}"
+        config_file = parser.get(section, 'config', fallback='') if parser.has_section(section) else ''
+        if config_file:
+            config_file = os.path.join(REPO_ROOT, config_file) if not os.path.isabs(config_file) else config_file
+        else:
+            config_file = os.path.join(os.path.dirname(entry), 'config.ini')
+        modules.append((name, entry, config_file))
+    return modules
+
+
+SCHEMA = Schema('host', MQTT_CONNECTION + (
+    Option('restart_delay', 'host', type=float, default=5.0),
+    Option('restart_max_delay', 'host', type=float, default=300.0),
+    Option('loopback_queue_size', 'host', type=int, default=1000),
+))
+
+
+def load_config(config_file: str) -> Dict[str, Any]:
+    """加载宿主配置"""
+    config = ConfigStore(config_file, SCHEMA, must_exist=False).load()
+    parser = configparser.ConfigParser()
+    parser.read(config_file, encoding='utf-8')
+    config['modules'] = parse_modules(parser)
+    return config
+
+
+def main():
+    """主函数"""
+    config_file = sys.argv[1] if len(sys.argv) > 1 else os.path.join(os.path.dirname(__file__), 'config.ini')
+    setup_logging(**load_logging_config(config_file))
+
+    config = load_config(config_file)
+    if not config['modules']:
+        logging.error(f"{config_file} 中没有配置模块（[host] modules）")
+        sys.exit(1)
+
+    ModuleHost(config).run()
+
+
+if __name__ == '__main__':
+    main()
@@ -1,13 +1,12 @@
 # -*- coding: utf-8 -*-
 """
 AutoScreenSwitch 管理器
-订阅统一传感器主题，基于 PIR 人体检测事件发布屏幕亮/息指令：
+订阅 PIR 传感器主题，基于 PIR 人体检测事件发布屏幕亮/息指令：
  - 检测到人体 → 立即发布 on
  - 超过配置的无人时长 → 发布 off
 """
 
 import logging
-import json
 import time
 import threading
 import sys
@@ -16,19 +15,23 @@ from typing import Dict, Any, Optional
 
 # 添加 common 目录到路径
 sys.path.append(os.path.join(os.path.dirname(__file__), '..', '..', 'common'))
+import startup_profiler  # 先于其余模块导入，--profile-startup 时统计导入耗时
 
+import config_store
+from config_store import MQTT_COMMON, MQTT_SUBSCRIBER, Option, Schema
 from mqtt_base import MQTTSubscriber
+from mqtt_async import AsyncMQTTSubscriber
+from log_setup import setup_logging, load_logging_config
 
 
 class AutoScreenSwitchManager(MQTTSubscriber):
     """屏幕亮/息管理器"""
 
+    RELOADABLE_CONFIG = MQTTSubscriber.RELOADABLE_CONFIG | {'idle_off_seconds'}
+
     def __init__(self, config: Dict[str, Any]):
         super().__init__(config)
 
-        # 订阅统一传感器主题
-        self.add_subscription('sensor')
-
         self.logger = logging.getLogger(__name__)
         self.config = config
 
@@ -50,38 +53,49 @@ class AutoScreenSwitchManager(MQTTSubscriber):
         # 活动/空闲状态
         self._last_motion_ts: Optional[float] = None
         self._last_state: Optional[str] = None  # 'on' 或 'off'
+        # PIR 占用状态（发布端启用 occupancy 时）：有人期间不计空闲时间，无人后开始倒计时
+        self._occupied = False
         self._lock = threading.Lock()
 
         # 后台空闲检测线程
         self._idle_thread: Optional[threading.Thread] = None
         self._idle_thread_stop = threading.Event()
 
+        # 只订阅 PIR 事件，由代理完成过滤
+        self.subscribe_sensor_type('pir_motion', self._handle_pir_motion)
+
         self.logger.info(
             f"AutoScreenSwitchManager 初始化完成（idle_off_seconds={self.idle_off_seconds}, publish_topic={self.publish_topic}）"
         )
 
-    def on_connect(self, client, userdata, flags, rc):
+    def apply_config(self, changes: Dict[str, Any]):
+        """热加载无人时长（空闲检测线程每秒读取一次）"""
+        super().apply_config(changes)
+        if 'idle_off_seconds' in changes:
+            self.idle_off_seconds = int(changes['idle_off_seconds'])
+
+    def on_connect(self, client, userdata, flags, rc, properties=None):
         """连接建立后，启动空闲检测线程"""
-        super().on_connect(client, userdata, flags, rc)
+        super().on_connect(client, userdata, flags, rc, properties)
         if rc == 0 and (self._idle_thread is None or not self._idle_thread.is_alive()):
             self._idle_thread_stop.clear()
             self._idle_thread = threading.Thread(target=self._idle_watch_loop, name='idle-watch', daemon=True)
             self._idle_thread.start()
 
-    def handle_message(self, topic: str, payload: Dict[str, Any]):
-        """处理传感器消息"""
+    def _handle_pir_motion(self, topic: str, payload: Dict[str, Any]):
+        """处理 PIR 人体检测消息"""
         try:
-            sensor_type = payload.get('type')
-            if sensor_type != 'pir_motion':
-                return
-
             params = payload.get('params', {})
+            occupancy = params.get('occupancy')
+            if occupancy is not None:
+                self._handle_occupancy(occupancy)
+                return
             motion_detected = bool(params.get('motion_detected'))
             if not motion_detected:
                 return
 
             # 与 OLEDManager 对齐：记录收到的 PIR 事件，便于观察频次
-            self.logger.info(f"收到 pir_motion 数据: {payload}")
+            self.logger.info("收到 pir_motion 数据: %s", payload)
 
             # 有人来：立刻上报 on，并记录最近活动时间
             with self._lock:
@@ -91,25 +105,44 @@ class AutoScreenSwitchManager(MQTTSubscriber):
         except Exception as exc:
             self.logger.error(f"处理消息出错: {exc}")
 
+    def _handle_occupancy(self, occupancy: str):
+        """处理占用状态切换：有人时上报 on 并停止空闲计时，无人时从此刻开始计时"""
+        if occupancy == 'occupied':
+            with self._lock:
+                self._occupied = True
+                self._last_motion_ts = None
+            self._send_switch_command(action='on', source='pir_occupancy')
+        elif occupancy == 'vacant':
+            with self._lock:
+                # 启动时收到的保留消息为 vacant 时没有需要关闭的屏幕
+                if not self._occupied:
+                    return
+                self._occupied = False
+                self._last_motion_ts = time.time()
+            self.logger.info(f"无人，{self.idle_off_seconds} 秒后关闭屏幕")
+
+    def _check_idle(self):
+        """检查无人超时，触发 off"""
+        now = time.time()
+        last_motion: Optional[float]
+        with self._lock:
+            last_motion = self._last_motion_ts
+
+        if last_motion is not None:
+            idle_seconds = now - last_motion
+            if idle_seconds >= self.idle_off_seconds:
+                # 触发 off 并清空 last_motion，避免重复下发
+                self._send_switch_command(action='off', source='idle_timeout')
+                with self._lock:
+                    # 重置为 None，直到下次检测到运动
+                    self._last_motion_ts = None
+
     def _idle_watch_loop(self):
         """后台循环：检查无人超时，触发 off"""
         self.logger.info("空闲检测线程已启动")
         try:
             while not self._idle_thread_stop.is_set():
-                now = time.time()
-                last_motion: Optional[float]
-                with self._lock:
-                    last_motion = self._last_motion_ts
-
-                if last_motion is not None:
-                    idle_seconds = now - last_motion
-                    if idle_seconds >= self.idle_off_seconds:
-                        # 触发 off 并清空 last_motion，避免重复下发
-                        self._send_switch_command(action='off', source='idle_timeout')
-                        with self._lock:
-                            # 重置为 None，直到下次检测到运动
-                            self._last_motion_ts = None
-
+                self._check_idle()
                 # 低频轮询足矣
                 self._idle_thread_stop.wait(1.0)
         except Exception as exc:
@@ -134,13 +167,13 @@ class AutoScreenSwitchManager(MQTTSubscriber):
             # 避免无谓的重复下发：只有状态变化时才发
             if self._last_state == action:
                 # 打印为 DEBUG，默认 INFO 级别不会刷屏；若需要可将服务日志级别调至 DEBUG
-                self.logger.debug(f"状态未变化，跳过重复发布: {action}（source={source}）")
+                self.logger.debug("状态未变化，跳过重复发布: %s（source=%s）", action, source)
                 return
 
             ok = self.publish_message(self.publish_topic, message, qos=1, retain=False)
             if ok:
                 self._last_state = action
-                self.logger.info(f"已发布 {action} 至 {self.publish_topic}: {json.dumps(message, ensure_ascii=False)}")
+                self.logger.info("已发布 %s 至 %s: %s", action, self.publish_topic, message)
             else:
                 self.logger.error(f"发布失败: {action} → {self.publish_topic}")
 
@@ -158,28 +191,59 @@ class AutoScreenSwitchManager(MQTTSubscriber):
             super().stop()
 
 
+class AsyncAutoScreenSwitchManager(AutoScreenSwitchManager, AsyncMQTTSubscriber):
+    """asyncio 运行时（[mqtt] runtime = asyncio）：MQTT 客户端、消息处理与空闲检测都在同一个事件循环上，
+    不再有 paho 网络线程和空闲检测线程"""
+
+    def __init__(self, config: Dict[str, Any]):
+        super().__init__(config)
+        self._idle_task = None
+
+    def on_connect(self, client, userdata, flags, rc, properties=None):
+        # 跳过 AutoScreenSwitchManager.on_connect 中的空闲检测线程，改为事件循环上的周期任务
+        super(AutoScreenSwitchManager, self).on_connect(client, userdata, flags, rc, properties)
+        if rc == 0 and self._idle_task is None:
+            self._idle_task = self.every(1.0, self._check_idle, name='idle-watch')
+
+
+SCHEMA = Schema('auto_screen_switch_manager', MQTT_COMMON + MQTT_SUBSCRIBER + (
+    # 运行时：thread（默认）或 asyncio（单个事件循环，线程更少；模块宿主中不生效）
+    Option('runtime', 'mqtt', default='thread'),
+    Option('topic_prefix', 'mqtt', default='sensor'),
+    Option('payload_codec', 'mqtt', default='json'),
+    Option('topic_layout', 'mqtt', default='hierarchical'),
+    # 行为参数（允许直接覆盖）
+    Option('idle_off_seconds', 'auto_screen_switch', type=int, default=900),
+    Option('publish_topic', 'auto_screen_switch', default='actuator/autoScreenSwitch'),
+))
+
+
+def load_config(config_file: str = 'config.ini') -> Dict[str, Any]:
+    """读取配置文件并构建管理器配置字典"""
+    return config_store.load_config(config_file, SCHEMA)
+
+
+def create_module(config_file: str = 'config.ini', **overrides) -> AutoScreenSwitchManager:
+    """创建管理器实例（供模块宿主以插件方式加载）"""
+    manager_config = load_config(config_file)
+    manager_config.update(overrides)
+    return AutoScreenSwitchManager(manager_config)
+
+
 def main():
-    import configparser
-
-    # 日志级别可通过配置文件 logging.level 覆盖，默认 INFO
-    config = configparser.ConfigParser()
-    config.read('config.ini')
-    level_name = config.get('logging', 'level', fallback='INFO').upper()
-    log_level = getattr(logging, level_name, logging.INFO)
-    logging.basicConfig(level=log_level, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
-
-    manager_config = {
-        'mqtt_broker': config.get('mqtt', 'broker', fallback='localhost'),
-        'mqtt_port': config.getint('mqtt', 'port', fallback=1883),
-        'topic_prefix': config.get('mqtt', 'topic_prefix', fallback='sensor'),
-        # 行为参数（允许直接覆盖）
-        'idle_off_seconds': config.getint('auto_screen_switch', 'idle_off_seconds', fallback=900),
-        'publish_topic': config.get('auto_screen_switch', 'publish_topic', fallback='actuator/autoScreenSwitch'),
-    }
-
-    manager = AutoScreenSwitchManager(manager_config)
+    profiler = startup_profiler.StartupProfiler('auto_screen_switch_manager')
+    # 日志配置见 config.ini 的 [logging] 段，默认 INFO
+    setup_logging(**load_logging_config('config.ini'))
+
+    manager_config = load_config('config.ini')
+    profiler.mark('读取配置')
+    if manager_config['runtime'] == 'asyncio':
+        manager = AsyncAutoScreenSwitchManager(manager_config)
+    else:
+        manager = AutoScreenSwitchManager(manager_config)
+    profiler.mark('创建模块')
     try:
-        manager.run()
+        profiler.run(manager, manager.run)
     except KeyboardInterrupt:
         logging.info("收到中断信号，退出管理器…")
         manager.stop()
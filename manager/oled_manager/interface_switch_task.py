@@ -17,12 +17,12 @@ class InterfaceDisplayTask:
         self.logger = logging.getLogger(__name__)
         self.logger.info("界面显示任务已启动")
     
-    def show_motion_detected(self):
-        """发布运动检测事件 - 切换到温湿度界面10分钟"""
+    def show_motion_detected(self, duration: int = 600):
+        """发布运动检测事件 - 切换到温湿度界面 duration 秒（默认10分钟），0 表示保持到下一次界面事件"""
         self.logger.info("发布运动检测事件")
         self._publish_interface_event('switch_to_temperature', {
             'message': 'Motion Detected!',
-            'duration': 600  # 10分钟
+            'duration': duration
         })
     
     def show_default(self):
@@ -48,7 +48,7 @@ class InterfaceDisplayTask:
             
             # 发送界面事件
             self.oled_manager._send_oled_display_command(event_message)
-            self.logger.debug(f"已发布界面事件: {action}")
+            self.logger.debug("已发布界面事件: %s", action)
                 
         except Exception as e:
             self.logger.error(f"发布界面事件失败: {e}")
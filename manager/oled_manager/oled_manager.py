@@ -6,27 +6,33 @@ OLED管理器模块
 """
 
 import logging
-import json
 import sys
 import os
 from typing import Dict, Any
 
 # 添加common目录到路径
 sys.path.append(os.path.join(os.path.dirname(__file__), '..', '..', 'common'))
+import startup_profiler  # 先于其余模块导入，--profile-startup 时统计导入耗时
 
+import config_store
+from config_store import MQTT_COMMON, MQTT_SUBSCRIBER, Option, Schema
 from mqtt_base import MQTTSubscriber
+from log_setup import setup_logging, load_logging_config
 from temperature_forwarder import TemperatureForwarder
 from interface_switch_task import InterfaceDisplayTask
 
+SCHEMA = Schema('oled_manager', MQTT_COMMON + MQTT_SUBSCRIBER + (
+    Option('topic_prefix', 'mqtt', default='sensor'),
+    Option('payload_codec', 'mqtt', default='json'),
+    Option('topic_layout', 'mqtt', default='hierarchical'),
+))
+
 class OLEDManager(MQTTSubscriber):
     """OLED显示管理器 - 协调温湿度转发和界面切换任务"""
     
     def __init__(self, config: Dict[str, Any]):
         super().__init__(config)
         
-        # 订阅传感器主题
-        self.add_subscription('sensor')
-        
         self.logger = logging.getLogger(__name__)
         
         # 保存配置对象供任务使用
@@ -35,35 +41,18 @@ class OLEDManager(MQTTSubscriber):
         # 创建两个独立的任务
         self.temp_forwarder = TemperatureForwarder(self)
         self.interface_task = InterfaceDisplayTask(self, config)
+        # PIR 占用状态（发布端启用 occupancy 时），用于判断无人消息是否需要开始恢复倒计时
+        self._occupied = False
+        
+        # 只订阅OLED相关的传感器类型，由代理完成过滤
+        self.subscribe_sensor_type('temperature_humidity', self._handle_temperature_humidity)
+        self.subscribe_sensor_type('pir_motion', self._handle_pir_motion)
         
         self.logger.info("OLED管理器初始化完成")
     
-    def handle_message(self, topic: str, payload: Dict[str, Any]):
-        """处理接收到的传感器消息"""
-        try:
-            # 从payload中获取传感器类型
-            sensor_type = payload.get('type')
-            if not sensor_type:
-                self.logger.warning(f"消息中缺少传感器类型: {payload}")
-                return
-            
-            # 只处理OLED相关的传感器
-            if sensor_type not in ['temperature_humidity', 'pir_motion']:
-                return
-            
-            self.logger.info(f"收到 {sensor_type} 数据: {payload}")
-            
-            # 根据传感器类型分发到不同的任务
-            if sensor_type == 'temperature_humidity':
-                self._handle_temperature_humidity(payload)
-            elif sensor_type == 'pir_motion':
-                self._handle_pir_motion(payload)
-                
-        except Exception as e:
-            self.logger.error(f"处理消息时出错: {e}")
-    
-    def _handle_temperature_humidity(self, payload: Dict[str, Any]):
+    def _handle_temperature_humidity(self, topic: str, payload: Dict[str, Any]):
         """处理温湿度传感器数据 - 直接转发"""
+        self.logger.debug("收到 temperature_humidity 数据: %s", payload)
         params = payload.get('params', {})
         temperature = params.get('temperature')
         humidity = params.get('humidity')
@@ -71,33 +60,52 @@ class OLEDManager(MQTTSubscriber):
         if temperature is not None and humidity is not None:
             # 直接转发温湿度数据
             self.temp_forwarder.forward_temperature_humidity(temperature, humidity)
-            self.logger.info(f"温湿度数据已转发: {temperature}°C, {humidity}%")
+            self.logger.debug("温湿度数据已转发: %s°C, %s%%", temperature, humidity)
     
-    def _handle_pir_motion(self, payload: Dict[str, Any]):
+    def _handle_pir_motion(self, topic: str, payload: Dict[str, Any]):
         """处理PIR运动检测传感器数据 - 交给界面切换任务"""
+        self.logger.debug("收到 pir_motion 数据: %s", payload)
         params = payload.get('params', {})
         motion_detected = params.get('motion_detected', False)
         
+        occupancy = params.get('occupancy')
+        if occupancy is not None:
+            self._handle_occupancy(occupancy)
+            return
         if motion_detected:
             # 触发界面显示任务
             self.interface_task.show_motion_detected()
             self.logger.info("检测到运动，显示运动检测界面")
     
+    def _handle_occupancy(self, occupancy: str):
+        """
+        处理占用状态切换：有人时保持温湿度界面，无人后再显示10分钟
+        （与逐次触发时"最后一次检测后10分钟"一致，有人期间不再反复重置 OLED 定时器）
+        """
+        if occupancy == 'occupied':
+            self._occupied = True
+            self.interface_task.show_motion_detected(duration=0)
+            self.logger.info("有人，保持温湿度界面")
+        elif occupancy == 'vacant' and self._occupied:
+            # 启动时收到的保留消息为 vacant 时不点亮屏幕
+            self._occupied = False
+            self.interface_task.show_motion_detected()
+            self.logger.info("无人，10分钟后恢复默认界面")
+    
     def _send_oled_display_command(self, display_data: Dict[str, Any]):
         """发送OLED显示命令"""
         try:
             topic = "actuator/oled"
             self._publish_message(topic, display_data)
-            self.logger.debug(f"已发送OLED显示命令: {display_data}")
+            self.logger.debug("已发送OLED显示命令: %s", display_data)
         except Exception as e:
             self.logger.error(f"发送OLED显示命令失败: {e}")
     
     def _publish_message(self, topic: str, message: Dict[str, Any]):
         """发布消息到指定主题"""
         try:
-            payload = json.dumps(message, ensure_ascii=False)
-            self.client.publish(topic, payload, qos=1)
-            self.logger.debug(f"已发送到 {topic}: {message}")
+            self.publish_message(topic, message, qos=1)
+            self.logger.debug("已发送到 %s: %s", topic, message)
         except Exception as e:
             self.logger.error(f"发送消息到 {topic} 失败: {e}")
     
@@ -108,33 +116,32 @@ class OLEDManager(MQTTSubscriber):
         self.interface_task.stop()
         super().stop()
 
+def load_config(config_file: str = 'config.ini') -> Dict[str, Any]:
+    """读取配置文件并构建管理器配置字典"""
+    config = config_store.load_config(config_file, SCHEMA)
+    config['sensor_type'] = 'oled_manager'
+    return config
+
+def create_module(config_file: str = 'config.ini', **overrides) -> OLEDManager:
+    """创建管理器实例（供模块宿主以插件方式加载）"""
+    manager_config = load_config(config_file)
+    manager_config.update(overrides)
+    return OLEDManager(manager_config)
+
 def main():
     """主函数"""
-    import configparser
-    
-    # 配置日志
-    logging.basicConfig(
-        level=logging.INFO,
-        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
-    )
-    
-    # 读取配置
-    config = configparser.ConfigParser()
-    config.read('config.ini')  # 现在使用当前目录的配置文件
-    
-    # 构建配置字典
-    manager_config = {
-        'mqtt_broker': config.get('mqtt', 'broker', fallback='localhost'),
-        'mqtt_port': config.getint('mqtt', 'port', fallback=1883),
-        'topic_prefix': config.get('mqtt', 'topic_prefix', fallback='sensor'),
-        'sensor_type': 'oled_manager'
-    }
+    profiler = startup_profiler.StartupProfiler('oled_manager')
+    # 配置日志（config.ini 的 [logging] 段）
+    setup_logging(**load_logging_config('config.ini'))
     
-    # 创建并启动OLED管理器
+    # 创建并启动OLED管理器（使用当前目录的配置文件）
+    manager_config = load_config('config.ini')
+    profiler.mark('读取配置')
     manager = OLEDManager(manager_config)
+    profiler.mark('创建模块')
     
     try:
-        manager.run()
+        profiler.run(manager, manager.run)
     except KeyboardInterrupt:
         logging.info("收到中断信号，正在关闭OLED管理器...")
         manager.stop()
@@ -31,7 +31,7 @@ class TemperatureForwarder:
             }
             
             self.oled_manager._send_oled_display_command(display_message)
-            self.logger.debug(f"转发温湿度数据: {temperature}°C, {humidity}%")
+            self.logger.debug("转发温湿度数据: %s°C, %s%%", temperature, humidity)
         except Exception as e:
             self.logger.error(f"转发温湿度数据失败: {e}")
     
@@ -1,25 +1,35 @@
 import sys
 import os
 sys.path.append(os.path.join(os.path.dirname(__file__), '..', '..', 'common'))
+import startup_profiler  # 先于其余模块导入，--profile-startup 时统计导入耗时
 # -*- coding: utf-8 -*-
 """
 Button 按键事件传感器 MQTT 发布者主程序（gpiozero实现）
 """
 import logging
 import time
-from gpiozero import Button
 from config import ConfigManager
-from publish import ButtonPublisher, setup_logging
+from publish import ButtonPublisher
+from log_setup import setup_logging, load_logging_config
+
+def create_module(config_file: str = "config.ini", **overrides) -> ButtonPublisher:
+    """创建发布者实例（供模块宿主以插件方式加载）"""
+    config = ConfigManager(config_file).get_all_config()
+    config.update(overrides)
+    return ButtonPublisher(config)
 
 def main():
+    profiler = startup_profiler.StartupProfiler('button', target='published')
     try:
         config_manager = ConfigManager()
         config = config_manager.get_all_config()
-        setup_logging()
+        setup_logging(**load_logging_config(config_manager.config_file))
         logger = logging.getLogger(__name__)
+        profiler.mark('读取配置')
         logger.info("启动Button按键事件传感器发布者...")
         publisher = ButtonPublisher(config)
-        publisher.start()
+        profiler.mark('创建模块')
+        profiler.run(publisher, publisher.start)
     except FileNotFoundError as e:
         print(f"配置文件错误: {e}")
         sys.exit(1)
@@ -3,36 +3,17 @@
 配置管理模块（Button 按键传感器）
 """
 import os
-import configparser
-from typing import Dict, Any
+import sys
 
-class ConfigManager:
-    def __init__(self, config_file: str = "config.ini"):
-        self.config_file = config_file
-        self.config = configparser.ConfigParser()
-        self.load_config()
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', '..', 'common'))
+from config_store import ConfigManager as BaseConfigManager, MQTT_COMMON, MQTT_PUBLISHER, Option, Schema
 
-    def load_config(self) -> None:
-        if not os.path.exists(self.config_file):
-            raise FileNotFoundError(f"配置文件不存在: {self.config_file}")
-        self.config.read(self.config_file, encoding='utf-8')
+SCHEMA = Schema('button', MQTT_COMMON + MQTT_PUBLISHER + (
+    Option('button_gpio', 'button', type=int),
+    Option('gpio_chip', 'button', type=int),
+    Option('sensor_type', 'button'),
+))
 
-    def get_mqtt_config(self) -> Dict[str, Any]:
-        return {
-            'broker': self.config.get('mqtt', 'broker'),
-            'port': self.config.getint('mqtt', 'port'),
-            'topic_prefix': self.config.get('mqtt', 'topic_prefix')
-        }
 
-    def get_button_config(self) -> Dict[str, Any]:
-        return {
-            'button_gpio': self.config.getint('button', 'button_gpio'),
-            'gpio_chip': self.config.getint('button', 'gpio_chip'),
-            'sensor_type': self.config.get('button', 'sensor_type')
-        }
-
-    def get_all_config(self) -> Dict[str, Any]:
-        config = {}
-        config.update(self.get_mqtt_config())
-        config.update(self.get_button_config())
-        return config 
\ No newline at end of file
+class ConfigManager(BaseConfigManager):
+    SCHEMA = SCHEMA
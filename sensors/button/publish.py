@@ -10,8 +10,11 @@ Button 按键事件传感器 MQTT 发布者逻辑（gpiozero实现）
 import logging
 import time
 import threading
-from gpiozero import Button
 from mqtt_base import EventPublisher
+from lazy_import import lazy_import
+
+# gpiozero 导入较慢，创建按键时才加载
+gpiozero = lazy_import('gpiozero')
 
 class ButtonPublisher(EventPublisher):
     """Button按键事件发布者 - 统一数据格式"""
@@ -24,7 +27,7 @@ class ButtonPublisher(EventPublisher):
         self.bounce_time = config.get('bounce_time', 0.05)
         
         # 初始化Button
-        self.button = Button(self.button_pin, bounce_time=self.bounce_time)
+        self.button = gpiozero.Button(self.button_pin, bounce_time=self.bounce_time)
         
         # 监控控制
         self.monitoring = True
@@ -34,6 +37,7 @@ class ButtonPublisher(EventPublisher):
 
     def _on_button_pressed(self):
         """按钮按下回调"""
+        trace = self.tracer.start(self.sensor_type)
         try:
             # 构建标准化的按钮数据
             button_data = {
@@ -41,13 +45,14 @@ class ButtonPublisher(EventPublisher):
             }
             
             # 发布传感器数据
-            self.publish_sensor_data(button_data, retain=True)
+            self.publish_sensor_data(button_data, retain=True, trace=trace)
             
         except Exception as e:
             logging.error(f"处理按钮按下事件时发生错误: {e}")
 
     def _on_button_released(self):
         """按钮释放回调"""
+        trace = self.tracer.start(self.sensor_type)
         try:
             # 构建标准化的按钮数据
             button_data = {
@@ -55,7 +60,7 @@ class ButtonPublisher(EventPublisher):
             }
             
             # 发布传感器数据
-            self.publish_sensor_data(button_data, retain=True)
+            self.publish_sensor_data(button_data, retain=True, trace=trace)
             
         except Exception as e:
             logging.error(f"处理按钮释放事件时发生错误: {e}")
@@ -80,10 +85,3 @@ class ButtonPublisher(EventPublisher):
     def start(self):
         """启动发布者 - 使用父类的标准实现"""
         super().start()
-
-def setup_logging() -> None:
-    """设置日志"""
-    logging.basicConfig(
-        level=logging.INFO,
-        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
-    ) 
\ No newline at end of file
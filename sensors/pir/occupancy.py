@@ -0,0 +1,133 @@
+# -*- coding: utf-8 -*-
+"""
+占用状态机
+把 PIR 的检测/无检测边沿合并为 有人（occupied）⇄ 无人（vacant）两种状态，只在状态切换时上报：
+- 有人期间的重复触发只计数，不再逐次发布
+- 输出变为低电平后再等待 vacancy_delay 秒仍无检测才判定为无人，期间再次检测到运动视为同一段占用
+"""
+
+import logging
+import threading
+import time
+from typing import Any, Callable, Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+OCCUPIED = 'occupied'
+VACANT = 'vacant'
+
+
+class OccupancyTracker:
+    """占用状态机（线程安全，边沿回调与计时器可在不同线程中调用）"""
+
+    def __init__(self, vacancy_delay: float, on_change: Callable[[Dict[str, Any], Optional[Dict[str, Any]]], None]):
+        """
+        Args:
+            vacancy_delay: 无检测后判定为无人的等待时间（秒）
+            on_change: 状态切换回调 on_change(事件, 追踪上下文)，事件见 _occupied_event/_vacant_event
+        """
+        self.vacancy_delay = max(0.0, float(vacancy_delay))
+        self.on_change = on_change
+        self.state = VACANT
+        # 进入当前状态的时刻（time.monotonic()），启动后首次有人之前为 None
+        self._since: Optional[float] = None
+        self._retriggers = 0
+        self._timer: Optional[threading.Timer] = None
+        # 每次检测到运动递增，过期的无人计时器据此作废
+        self._generation = 0
+        self._lock = threading.Lock()
+        # 上报在 _lock 之外进行：按状态切换序号串行上报，已被更新的切换超过的事件不再发布，
+        # 保证保留消息最终与当前状态一致（无人计时器与新的运动边沿同时发生时不会先发 occupied 再发 vacant）
+        self._emit_lock = threading.Lock()
+        self._seq = 0
+        self._emitted_seq = 0
+        # 边沿与状态切换计数（运行指标）
+        self.stats = {'motion_edges': 0, 'no_motion_edges': 0, 'coalesced': 0, 'transitions': 0, 'superseded': 0}
+
+    def motion(self, trace: Optional[Dict[str, Any]] = None):
+        """输出变为高电平（检测到运动）"""
+        with self._lock:
+            self.stats['motion_edges'] += 1
+            self._generation += 1
+            self._cancel_timer()
+            if self.state == OCCUPIED:
+                self._retriggers += 1
+                self.stats['coalesced'] += 1
+                return
+            now = time.monotonic()
+            event = self._occupied_event(now)
+            self.state, self._since, self._retriggers = OCCUPIED, now, 0
+            seq = self._transition()
+        self._emit(seq, event, trace)
+
+    def no_motion(self):
+        """输出变为低电平：vacancy_delay 秒内没有再次检测到运动则判定为无人"""
+        with self._lock:
+            self.stats['no_motion_edges'] += 1
+            if self.state != OCCUPIED:
+                return
+            self._cancel_timer()
+            if self.vacancy_delay <= 0:
+                seq, event = self._vacate()
+            else:
+                self._timer = threading.Timer(self.vacancy_delay, self._expire, args=(self._generation,))
+                self._timer.daemon = True
+                self._timer.start()
+                return
+        self._emit(seq, event, None)
+
+    def _expire(self, generation: int):
+        with self._lock:
+            if generation != self._generation or self.state != OCCUPIED:
+                return
+            self._timer = None
+            seq, event = self._vacate()
+        self._emit(seq, event, None)
+
+    def _vacate(self) -> Tuple[int, Dict[str, Any]]:
+        now = time.monotonic()
+        event = self._vacant_event(now)
+        self.state, self._since, self._retriggers = VACANT, now, 0
+        return self._transition(), event
+
+    def _transition(self) -> int:
+        """记录一次状态切换（持有 _lock 时调用），返回其序号"""
+        self.stats['transitions'] += 1
+        self._seq += 1
+        return self._seq
+
+    def _occupied_event(self, now: float) -> Dict[str, Any]:
+        event: Dict[str, Any] = {'motion_detected': True, 'occupancy': OCCUPIED}
+        if self._since is not None:
+            # 此前无人的时长
+            event['vacant_seconds'] = round(now - self._since, 1)
+        return event
+
+    def _vacant_event(self, now: float) -> Dict[str, Any]:
+        # 本段占用的时长（含 vacancy_delay）与期间被合并的重复触发次数
+        return {'motion_detected': False, 'occupancy': VACANT,
+                'occupied_seconds': round(now - self._since, 1), 'retriggers': self._retriggers}
+
+    def _cancel_timer(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+
+    def _emit(self, seq: int, event: Dict[str, Any], trace: Optional[Dict[str, Any]]):
+        with self._emit_lock:
+            if seq <= self._emitted_seq:
+                # 更新的状态切换已经上报，这个事件已过时
+                self.stats['superseded'] += 1
+                logger.debug(f"占用状态 {event['occupancy']} 已被后续切换取代，不再上报")
+                return
+            self._emitted_seq = seq
+            try:
+                self.on_change(event, trace)
+            except Exception as e:
+                logger.error(f"上报占用状态时发生错误: {e}")
+
+    def stop(self):
+        """取消等待中的无人计时器"""
+        with self._lock:
+            self._generation += 1
+            self._cancel_timer()
@@ -7,20 +7,24 @@
 import logging
 import sys
 import os
+import threading
 import time
-from typing import Dict, Any
+from typing import Dict, Any, Optional
 
 # 添加common目录到路径
 sys.path.append(os.path.join(os.path.dirname(__file__), '..', '..', 'common'))
 
 from mqtt_base import EventPublisher
 from sensor import PIRSensor
+from occupancy import OccupancyTracker
 
 logger = logging.getLogger(__name__)
 
 class PIRPublisher(EventPublisher):
     """简化版 PIR红外传感器发布者 - 统一数据格式"""
 
+    RELOADABLE_CONFIG = EventPublisher.RELOADABLE_CONFIG | {'vacancy_delay'}
+
     def __init__(self, config: Dict[str, Any]):
         """初始化发布者"""
         super().__init__(config)
@@ -29,30 +33,87 @@ class PIRPublisher(EventPublisher):
         sensor_config = {
             'pin': config.get('pin', 23),
             'sensor_type': config.get('sensor_type', 'pir_motion'),
-            'stabilize_time': config.get('stabilize_time', 60)
+            'stabilize_time': config.get('stabilize_time', 60),
+            'warm_state_file': self.resolve_path(config.get('warm_state_file', '')),
+            'tracer': self.tracer
         }
 
+        # 预热在后台计时：先连接代理并发布 warming_up 状态，预热结束后发布 ready
+        self._status_lock = threading.Lock()
         self.sensor = PIRSensor(sensor_config)
+        self.sensor.ready_callback = self.publish_sensor_status
+
+        # 占用状态（可选）：重复触发合并为 occupied/vacant 状态切换，只在切换时发布
+        self.occupancy: Optional[OccupancyTracker] = None
+        if config.get('occupancy', False):
+            self.occupancy = OccupancyTracker(config.get('vacancy_delay', 30.0), self._on_occupancy_changed)
+            self.metrics.counter_callback('pir_edges_total', 'PIR 输出边沿与占用状态事件数'
+                                          '（motion_edges/no_motion_edges/coalesced/transitions/superseded）',
+                                          lambda: self.occupancy.stats, labelname='event')
+
+        logger.info("PIR发布者初始化完成")
+
+    def apply_config(self, changes: Dict[str, Any]):
+        """热加载无人判定延迟（下一次输出变为低电平起生效）"""
+        super().apply_config(changes)
+        if 'vacancy_delay' in changes and self.occupancy is not None:
+            self.occupancy.vacancy_delay = max(0.0, float(changes['vacancy_delay']))
 
-        logger.info("PIR发布者初始化完成（稳定期已完成）")
+    def publish_sensor_status(self):
+        """发布传感器状态（保留消息）：warming_up（预热中，附剩余秒数）或 ready"""
+        # 未连接时不发布，连接建立后由 on_connect 发布当时的状态
+        if not self.status_topic_prefix or not self.client.is_connected():
+            return
+        with self._status_lock:
+            remaining = self.sensor.warmup_remaining()
+            status = {
+                'state': 'ready' if self.sensor.ready.is_set() else 'warming_up',
+                'ready_in': round(remaining),
+                'powered_since': int(self.sensor.powered_since),
+                'suppressed_events': self.sensor.suppressed_events,
+                'timestamp': int(time.time()),
+            }
+            self.publish_message(self.status_topic('sensor'), status, qos=1, retain=True)
 
-    def _on_motion_detected(self, motion_data: Dict[str, Any]):
+    def on_connect(self, client, userdata, flags, rc, properties=None):
+        """连接（及重连）后发布当前的预热状态"""
+        super().on_connect(client, userdata, flags, rc, properties)
+        if rc == 0:
+            self.publish_sensor_status()
+
+    def _on_motion_detected(self, motion_data: Dict[str, Any], trace: Optional[Dict[str, Any]] = None):
         """人体检测回调函数 - 直接使用传感器数据"""
         try:
-            # 直接使用传感器传递的数据
-            self.publish_sensor_data(motion_data, retain=True)
-            logger.info(f"检测到人体，已发布: {motion_data}")
+            # 直接使用传感器传递的数据，追踪上下文随消息传递到下游
+            self.publish_sensor_data(motion_data, retain=True, trace=trace)
+            logger.info("检测到人体，已发布: %s", motion_data)
             
         except Exception as e:
             logger.error(f"处理PIR检测事件时发生错误: {e}")
 
+    def _on_occupancy_changed(self, event: Dict[str, Any], trace: Optional[Dict[str, Any]] = None):
+        """占用状态切换回调（边沿回调或无人计时器线程）"""
+        try:
+            self.publish_sensor_data(event, retain=True, trace=trace)
+            logger.info("占用状态变为 %s，已发布: %s", event['occupancy'], event)
+        except Exception as e:
+            logger.error(f"发布占用状态时发生错误: {e}")
+
     def init_sensor(self):
-        """初始化传感器（稳定期已在初始化时完成）"""
+        """初始化传感器（预热期间的检测事件由传感器丢弃）"""
+        if self.occupancy is not None:
+            self.sensor.set_motion_callback(lambda motion_data, trace=None: self.occupancy.motion(trace),
+                                            self.occupancy.no_motion)
+            logger.info(f"PIR传感器回调函数已设置（占用状态模式，无人判定延迟 {self.occupancy.vacancy_delay:g} 秒）")
+            return
         self.sensor.set_motion_callback(self._on_motion_detected)
-        logger.info("PIR传感器已就绪，回调函数已设置")
+        logger.info("PIR传感器回调函数已设置")
 
     def cleanup_sensor(self):
         """清理传感器"""
+        if self.occupancy is not None:
+            self.occupancy.stop()
+        self.sensor.cleanup()
         logger.info("PIR传感器已清理")
 
     def start(self):
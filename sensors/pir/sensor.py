@@ -4,12 +4,18 @@
 只处理人体检测事件
 """
 
+import json
+import os
+import threading
 import time
 import logging
 from typing import Dict, Any, Optional, Callable
 
+from lazy_import import lazy_import
+
 try:
-    from gpiozero import MotionSensor
+    # gpiozero 导入较慢，创建传感器时才加载
+    gpiozero = lazy_import('gpiozero')
 except ImportError:
     # 在非树莓派环境下的模拟模块
     import warnings
@@ -19,6 +25,7 @@ except ImportError:
         def __init__(self, pin):
             self.pin = pin
             self.when_motion = None
+            self.when_no_motion = None
             self.motion_detected = False
         
         def close(self):
@@ -28,10 +35,25 @@ except ImportError:
         def value(self):
             return self.motion_detected
     
-    MotionSensor = MockMotionSensor
+    class MockGpiozero:
+        MotionSensor = MockMotionSensor
+    
+    gpiozero = MockGpiozero
 
 logger = logging.getLogger(__name__)
 
+BOOT_ID_FILE = '/proc/sys/kernel/random/boot_id'
+
+
+def _boot_id() -> str:
+    """本次开机的标识（Linux），读取失败时返回空字符串"""
+    try:
+        with open(BOOT_ID_FILE, 'r') as f:
+            return f.read().strip()
+    except OSError:
+        return ''
+
+
 class PIRSensor:
     """简化版 PIR红外传感器类"""
     
@@ -40,42 +62,126 @@ class PIRSensor:
         self.pin = config.get('pin', 23)
         self.sensor_type = config.get('sensor_type', 'pir_motion')
         self.stabilize_time = config.get('stabilize_time', 60)
+        # 预热状态文件（可选）：记录本次开机后传感器的上电时刻，进程重启而传感器一直通电时不再重复预热
+        self.warm_state_file = config.get('warm_state_file', '')
+        # 追踪记录器（可选）：在边沿回调中创建追踪上下文
+        self.tracer = config.get('tracer')
         
         # 只保留运动检测回调
         self.motion_callback: Optional[Callable] = None
+        # 输出变为低电平回调（可选，占用状态机据此开始计算无人时间）
+        self.no_motion_callback: Optional[Callable[[], None]] = None
+        # 预热结束回调（可选），在计时器线程中调用
+        self.ready_callback: Optional[Callable[[], None]] = None
+        
+        # 预热状态：预热期间输出不稳定，检测事件只计数不上报
+        self.ready = threading.Event()
+        self.suppressed_events = 0
+        self._warmup_timer: Optional[threading.Timer] = None
         
         # 初始化传感器
-        self.sensor = MotionSensor(self.pin)
+        self.sensor = gpiozero.MotionSensor(self.pin)
         self.sensor.when_motion = self._on_motion_detected
+        self.sensor.when_no_motion = self._on_no_motion
+        self.powered_since = self._load_power_on_time()
         
         logger.info(f"初始化PIR传感器: Pin {self.pin}")
+        self._start_warmup()
+    
+    def _load_power_on_time(self) -> float:
+        """读取本次开机后的上电时刻，没有记录（或已重启过）时记录为当前时刻"""
+        now = time.time()
+        if not self.warm_state_file:
+            return now
+        boot_id = _boot_id()
+        try:
+            with open(self.warm_state_file, 'r', encoding='utf-8') as f:
+                state = json.load(f)
+            powered_since = float(state['powered_since'])
+            if boot_id and state.get('boot_id') == boot_id and state.get('pin') == self.pin and powered_since <= now:
+                return powered_since
+        except FileNotFoundError:
+            pass
+        except (OSError, ValueError, TypeError, KeyError) as e:
+            logger.warning(f"读取PIR预热状态失败，重新预热: {e}")
         
-        # 让传感器稳定 - PIR传感器需要预热时间
-        logger.info(f"PIR传感器稳定中，请等待约{self.stabilize_time}秒...")
-        time.sleep(self.stabilize_time)
-        logger.info("PIR传感器已就绪")
+        tmp_path = f"{self.warm_state_file}.{os.getpid()}.tmp"
+        try:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump({'boot_id': boot_id, 'pin': self.pin, 'powered_since': now}, f)
+            os.replace(tmp_path, self.warm_state_file)
+        except OSError as e:
+            logger.warning(f"写入PIR预热状态失败: {e}")
+        return now
+    
+    def warmup_remaining(self) -> float:
+        """距预热完成的秒数，已就绪时为 0"""
+        if self.ready.is_set():
+            return 0.0
+        return max(0.0, self.stabilize_time - (time.time() - self.powered_since))
+    
+    def _start_warmup(self):
+        """预热在后台计时，不阻塞 MQTT 连接"""
+        remaining = self.warmup_remaining()
+        if remaining <= 0:
+            logger.info(f"PIR传感器已通电 {time.time() - self.powered_since:.0f} 秒，跳过预热")
+            self._set_ready()
+            return
+        # PIR传感器需要预热时间（HC-SR501 约 60 秒）
+        logger.info(f"PIR传感器预热中，约{remaining:.0f}秒后就绪，期间的检测事件将被忽略")
+        self._warmup_timer = threading.Timer(remaining, self._set_ready)
+        self._warmup_timer.daemon = True
+        self._warmup_timer.start()
+    
+    def _set_ready(self):
+        self.ready.set()
+        if self.suppressed_events:
+            logger.info(f"PIR传感器已就绪（预热期间忽略了 {self.suppressed_events} 次检测事件）")
+        else:
+            logger.info("PIR传感器已就绪")
+        if self.ready_callback:
+            try:
+                self.ready_callback()
+            except Exception as e:
+                logger.error(f"调用预热结束回调时发生错误: {e}")
     
     def _on_motion_detected(self):
         """人体检测回调 - 简化版"""
-        current_time = time.time()
-        logger.info(f"检测到人体！时间: {time.strftime('%H:%M:%S', time.localtime(current_time))}")
+        if not self.ready.is_set():
+            self.suppressed_events += 1
+            logger.debug("PIR传感器预热中，忽略检测事件")
+            return
+        trace = self.tracer.start(self.sensor_type) if self.tracer is not None else None
+        logger.info("检测到人体！")
         
         if self.motion_callback:
             try:
                 motion_data = {
                     'motion_detected': True
                 }
-                self.motion_callback(motion_data)
+                self.motion_callback(motion_data, trace)
             except Exception as e:
                 logger.error(f"调用运动检测回调时发生错误: {e}")
     
-    def set_motion_callback(self, callback: Callable):
-        """设置运动检测回调函数"""
+    def _on_no_motion(self):
+        """输出变为低电平回调"""
+        if not self.ready.is_set() or self.no_motion_callback is None:
+            return
+        try:
+            self.no_motion_callback()
+        except Exception as e:
+            logger.error(f"调用无运动回调时发生错误: {e}")
+    
+    def set_motion_callback(self, callback: Callable, no_motion_callback: Optional[Callable[[], None]] = None):
+        """设置运动检测回调函数（及可选的输出变为低电平回调）"""
         self.motion_callback = callback
+        self.no_motion_callback = no_motion_callback
         logger.info("运动检测回调已设置")
     
     def cleanup(self):
         """清理资源"""
+        if self._warmup_timer is not None:
+            self._warmup_timer.cancel()
         try:
             self.sensor.close()
             logger.info("PIR传感器资源清理完成")
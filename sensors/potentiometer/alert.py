@@ -0,0 +1,111 @@
+# -*- coding: utf-8 -*-
+"""
+ADS1115 比较器唤醒（ALERT/RDY 引脚）
+ADS1115 工作在连续转换模式，窗口比较器的上下限设在最近一次读数两侧：
+- 旋钮不动时转换结果一直落在窗口内，ALERT/RDY 保持高电平，监控线程阻塞在 GPIO 边沿上，不访问 I2C 总线
+- 转换结果连续 QUEUE_LENGTH 次落在窗口外时 ALERT/RDY 拉低，唤醒监控线程恢复采样
+- 连续转换模式下同一通道的每次采样只读一次转换寄存器（不再写配置寄存器、等待单次转换）
+
+接线：ALERT/RDY 接任一 GPIO（开漏输出，使用树莓派内部上拉）。
+需要 gpiozero 和提供比较器配置的 adafruit-circuitpython-ads1x15（2.2.22 及以上）。
+"""
+
+import logging
+import threading
+from typing import Any, Dict
+
+from lazy_import import lazy_import
+
+try:
+    # 硬件库导入较慢，启用比较器唤醒时才加载
+    gpiozero = lazy_import('gpiozero')
+    ads1x15 = lazy_import('adafruit_ads1x15.ads1x15')
+except ImportError:
+    gpiozero = ads1x15 = None
+
+logger = logging.getLogger(__name__)
+
+# 连续几次转换落在窗口外才拉低 ALERT/RDY（ADS1115 支持 1/2/4），滤掉单次噪声
+QUEUE_LENGTH = 2
+# 转换结果（有符号 16 位）范围
+RAW_MIN = -32768
+RAW_MAX = 32767
+
+
+def _signed(raw: int) -> int:
+    return raw - 0x10000 if raw & 0x8000 else raw
+
+
+class ADS1115Alert:
+    """窗口比较器 + ALERT/RDY 边沿等待"""
+
+    def __init__(self, ads, channel, pin: Any, data_rate: int = 128):
+        """
+        Args:
+            ads: adafruit_ads1x15 的 ADS1115 对象
+            channel: 该 ADS1115 上的 AnalogIn 通道（比较器只对当前转换的通道生效）
+            pin: ALERT/RDY 所接的 GPIO（BCM 编号或 gpiozero 引脚名）
+            data_rate: 连续转换速率（次/秒）
+        """
+        if gpiozero is None or ads1x15 is None:
+            raise RuntimeError("比较器唤醒需要 gpiozero 和 adafruit_ads1x15")
+        if not hasattr(ads, 'comparator_low_threshold'):
+            raise RuntimeError("adafruit_ads1x15 版本过旧，不支持比较器配置（需要 2.2.22 及以上）")
+        self.ads = ads
+        self.channel = channel
+        self.pin = pin
+        # 唤醒原因计数：edge（ALERT/RDY 边沿）、outside（设置窗口时读数已在窗口外）、timeout（等待超时）
+        self.stats: Dict[str, int] = {'edge': 0, 'outside': 0, 'timeout': 0}
+        self._edge = threading.Event()
+        self._closed = False
+
+        ads.data_rate = data_rate
+        ads.comparator_mode = ads1x15.Comp_Mode.WINDOW
+        ads.comparator_polarity = ads1x15.Comp_Polarity.ACTIVE_LOW
+        ads.comparator_latch = ads1x15.Comp_Latch.NONLATCHING
+        ads.comparator_queue_length = QUEUE_LENGTH
+        ads.mode = ads1x15.Mode.CONTINUOUS
+        # 首次读取写入配置寄存器，启动连续转换
+        channel.value
+
+        # 开漏、低电平有效：内部上拉，低电平即为 active
+        self.device = gpiozero.DigitalInputDevice(pin, pull_up=True)
+        self.device.when_activated = self._edge.set
+        logger.info(f"ADS1115 比较器唤醒已启用: ALERT/RDY -> GPIO {pin}，连续转换 {data_rate} 次/秒")
+
+    def wait_outside(self, center: int, half_width: int, timeout: float) -> str:
+        """
+        把比较器窗口设在 center ± half_width（转换结果原始值），等待转换结果离开窗口
+
+        Returns:
+            唤醒原因：edge / outside / timeout；close() 后返回 closed
+        """
+        if self._closed:
+            return 'closed'
+        low = max(RAW_MIN, center - half_width)
+        high = min(RAW_MAX, center + half_width)
+        self._edge.clear()
+        self.ads.comparator_low_threshold = low
+        self.ads.comparator_high_threshold = high
+        # 写阈值寄存器后地址指针停在阈值寄存器上：完整读一次转换寄存器把指针拨回，之后的采样仍只需一次读。
+        # 这次读取同时处理设置窗口前旋钮已经转动的情况（ALERT/RDY 已是低电平，不会再有边沿）
+        raw = _signed(self.ads.get_last_result(False))
+        if not low <= raw <= high or self.device.is_active:
+            self.stats['outside'] += 1
+            return 'outside'
+        if not self._edge.wait(timeout):
+            self.stats['timeout'] += 1
+            return 'timeout'
+        if self._closed:
+            return 'closed'
+        self.stats['edge'] += 1
+        return 'edge'
+
+    def close(self):
+        """释放 GPIO，并唤醒正在等待的线程"""
+        self._closed = True
+        self._edge.set()
+        try:
+            self.device.close()
+        except Exception as e:
+            logger.warning(f"释放 ALERT/RDY 引脚失败: {e}")
@@ -5,62 +5,46 @@
 """
 
 import os
-import configparser
-from typing import Dict, Any
+import sys
 
-class ConfigManager:
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', '..', 'common'))
+from config_store import (ConfigManager as BaseConfigManager, MQTT_COMMON, MQTT_PUBLISHER, MQTT_PUBLISH_QUEUE,
+                          Option, Schema, fraction)
+
+SCHEMA = Schema('potentiometer', MQTT_COMMON + MQTT_PUBLISHER + MQTT_PUBLISH_QUEUE + (
+    # 电位器配置
+    Option('i2c_address', 'potentiometer'),
+    Option('channel', 'potentiometer', type=int),
+    Option('gain', 'potentiometer', type=fraction),  # 支持 2/3 这样的分数
+    Option('min_voltage', 'potentiometer', type=float),
+    Option('max_voltage', 'potentiometer', type=float),
+    Option('min_value', 'potentiometer', type=int),
+    Option('max_value', 'potentiometer', type=int),
+    Option('value_threshold', 'potentiometer', type=int),
+    Option('sensor_type', 'potentiometer'),
+    Option('read_interval', 'potentiometer', type=float),
+    Option('stabilize_samples', 'potentiometer', type=int),
+    # 电压滤波
+    Option('filter', 'potentiometer', default='trimmed_mean'),
+    Option('ema_alpha', 'potentiometer', type=float, default=0.3),
+    Option('one_euro_min_cutoff', 'potentiometer', type=float, default=1.0),
+    Option('one_euro_beta', 'potentiometer', type=float, default=0.5),
+    Option('one_euro_d_cutoff', 'potentiometer', type=float, default=1.0),
+    Option('kalman_process_noise', 'potentiometer', type=float, default=1e-4),
+    Option('kalman_measurement_noise', 'potentiometer', type=float, default=4e-4),
+    # 比较器唤醒（ALERT/RDY 接 GPIO，留空为轮询）
+    Option('alert_pin', 'potentiometer', default=''),
+    Option('alert_data_rate', 'potentiometer', type=int, default=128),
+    Option('alert_window', 'potentiometer', type=float, default=0.0),
+    Option('alert_timeout', 'potentiometer', type=float, default=60.0),
+))
+
+
+class ConfigManager(BaseConfigManager):
     """配置管理器 - 支持保存校准结果"""
-    
-    def __init__(self, config_file: str = "config.ini"):
-        """
-        初始化配置管理器
-        
-        Args:
-            config_file: 配置文件路径
-        """
-        self.config_file = config_file
-        self.config = configparser.ConfigParser()
-        self.load_config()
-    
-    def load_config(self) -> None:
-        """加载配置文件"""
-        if not os.path.exists(self.config_file):
-            raise FileNotFoundError(f"配置文件不存在: {self.config_file}")
-        
-        self.config.read(self.config_file, encoding='utf-8')
-    
-    def save_config(self) -> None:
-        """保存配置到文件"""
-        try:
-            with open(self.config_file, 'w', encoding='utf-8') as f:
-                self.config.write(f)
-        except Exception as e:
-            raise IOError(f"保存配置文件失败: {e}")
-    
-    def get_mqtt_config(self) -> Dict[str, Any]:
-        """获取MQTT配置"""
-        return {
-            'mqtt_broker': self.config.get('mqtt', 'broker'),
-            'mqtt_port': self.config.getint('mqtt', 'port'),
-            'topic_prefix': self.config.get('mqtt', 'topic_prefix')
-        }
-    
-    def get_potentiometer_config(self) -> Dict[str, Any]:
-        """获取电位器配置"""
-        return {
-            'i2c_address': self.config.get('potentiometer', 'i2c_address'),
-            'channel': self.config.getint('potentiometer', 'channel'),
-            'gain': eval(self.config.get('potentiometer', 'gain')),  # 处理2/3这样的分数
-            'min_voltage': self.config.getfloat('potentiometer', 'min_voltage'),
-            'max_voltage': self.config.getfloat('potentiometer', 'max_voltage'),
-            'min_value': self.config.getint('potentiometer', 'min_value'),
-            'max_value': self.config.getint('potentiometer', 'max_value'),
-            'value_threshold': self.config.getint('potentiometer', 'value_threshold'),
-            'sensor_type': self.config.get('potentiometer', 'sensor_type'),
-            'read_interval': self.config.getfloat('potentiometer', 'read_interval'),
-            'stabilize_samples': self.config.getint('potentiometer', 'stabilize_samples')
-        }
-    
+
+    SCHEMA = SCHEMA
+
     def update_potentiometer_calibration(self, min_voltage: float, max_voltage: float) -> None:
         """
         更新电位器校准结果并保存到配置文件
@@ -101,10 +85,3 @@ class ConfigManager:
         print("\n✅ 校准完成！现在可以启动服务了：")
         print("   sudo systemctl start potentiometer-publisher")
         print("   sudo systemctl status potentiometer-publisher")
-    
-    def get_all_config(self) -> Dict[str, Any]:
-        """获取所有配置"""
-        config = {}
-        config.update(self.get_mqtt_config())
-        config.update(self.get_potentiometer_config())
-        return config
\ No newline at end of file
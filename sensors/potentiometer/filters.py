@@ -0,0 +1,263 @@
+# -*- coding: utf-8 -*-
+"""
+电位器电压滤波器
+每次采样调用 update(电压, 采样时刻)，返回滤波后的电压；各实现的单次开销与窗口长度无关或按对数增长：
+
+- trimmed_mean: 窗口内去掉最大、最小值后取平均（原有算法），以滑动窗口最值队列和累加和实现，均摊 O(1)
+- median:       滑动窗口中位数，双堆 + 延迟删除，O(log n)
+- ema:          指数移动平均，O(1)
+- one_euro:     1€ 滤波（静止时强平滑，快速转动时低延迟），O(1)
+- kalman:       一维卡尔曼滤波（随机游走模型），O(1)
+
+    f = create_filter({'filter': 'one_euro', 'one_euro_beta': 0.5})
+    stable = f.update(voltage, time.monotonic())
+"""
+
+import collections
+import heapq
+import math
+from typing import Any, Deque, Dict, List, Optional, Tuple
+
+# 影响滤波器的配置项（热加载时任一变化都会重建滤波器）
+FILTER_CONFIG = ('filter', 'stabilize_samples', 'ema_alpha', 'one_euro_min_cutoff', 'one_euro_beta',
+                 'one_euro_d_cutoff', 'kalman_process_noise', 'kalman_measurement_noise')
+
+
+class TrimmedMeanFilter:
+    """窗口去极值平均：窗口未满时直接返回当前读数，窗口满后返回去掉最大、最小值后的平均"""
+
+    name = 'trimmed_mean'
+    # 每隔多少次重新精确求和，消除增量加减累积的浮点误差
+    RESUM_EVERY = 1024
+
+    def __init__(self, window: int = 5):
+        self.window = max(1, int(window))
+        self.reset()
+
+    def reset(self):
+        self._values: Deque[float] = collections.deque()
+        # 单调队列：(序号, 值)，队首为窗口内的最大/最小值
+        self._max: Deque[Tuple[int, float]] = collections.deque()
+        self._min: Deque[Tuple[int, float]] = collections.deque()
+        self._sum = 0.0
+        self._count = 0
+
+    def update(self, value: float, t: Optional[float] = None) -> float:
+        index = self._count
+        self._count += 1
+        self._values.append(value)
+        self._sum += value
+        while self._max and self._max[-1][1] <= value:
+            self._max.pop()
+        self._max.append((index, value))
+        while self._min and self._min[-1][1] >= value:
+            self._min.pop()
+        self._min.append((index, value))
+        if len(self._values) > self.window:
+            self._sum -= self._values.popleft()
+            oldest = index - self.window
+            if self._max[0][0] <= oldest:
+                self._max.popleft()
+            if self._min[0][0] <= oldest:
+                self._min.popleft()
+        if self._count % self.RESUM_EVERY == 0:
+            self._sum = math.fsum(self._values)
+
+        n = len(self._values)
+        if n < self.window:
+            return value
+        if n <= 2:
+            return self._sum / n
+        return (self._sum - self._max[0][1] - self._min[0][1]) / (n - 2)
+
+
+class RunningMedianFilter:
+    """滑动窗口中位数：低半区为最大堆（存负值）、高半区为最小堆，移出窗口的值延迟到出现在堆顶时再删除"""
+
+    name = 'median'
+
+    def __init__(self, window: int = 5):
+        self.window = max(1, int(window))
+        self.reset()
+
+    def reset(self):
+        self._values: Deque[float] = collections.deque()
+        self._low: List[float] = []
+        self._high: List[float] = []
+        # 两个半区的有效元素数（不含待删除的）
+        self._low_size = 0
+        self._high_size = 0
+        # 待删除的值 -> 次数
+        self._pending: Dict[float, int] = {}
+
+    def _prune(self, heap: List[float], sign: float):
+        while heap:
+            value = sign * heap[0]
+            count = self._pending.get(value)
+            if not count:
+                return
+            if count == 1:
+                del self._pending[value]
+            else:
+                self._pending[value] = count - 1
+            heapq.heappop(heap)
+
+    def _balance(self):
+        # 保持 low 比 high 多 0 或 1 个有效元素
+        if self._low_size > self._high_size + 1:
+            heapq.heappush(self._high, -heapq.heappop(self._low))
+            self._low_size -= 1
+            self._high_size += 1
+            self._prune(self._low, -1.0)
+        elif self._low_size < self._high_size:
+            heapq.heappush(self._low, -heapq.heappop(self._high))
+            self._high_size -= 1
+            self._low_size += 1
+            self._prune(self._high, 1.0)
+
+    def update(self, value: float, t: Optional[float] = None) -> float:
+        self._values.append(value)
+        if not self._low or value <= -self._low[0]:
+            heapq.heappush(self._low, -value)
+            self._low_size += 1
+        else:
+            heapq.heappush(self._high, value)
+            self._high_size += 1
+
+        if len(self._values) > self.window:
+            old = self._values.popleft()
+            self._pending[old] = self._pending.get(old, 0) + 1
+            if old <= -self._low[0]:
+                self._low_size -= 1
+                if old == -self._low[0]:
+                    self._prune(self._low, -1.0)
+            else:
+                self._high_size -= 1
+                if self._high and old == self._high[0]:
+                    self._prune(self._high, 1.0)
+        self._balance()
+        # 堆顶必须是有效元素
+        self._prune(self._low, -1.0)
+        self._prune(self._high, 1.0)
+
+        if self._low_size > self._high_size:
+            return -self._low[0]
+        return (-self._low[0] + self._high[0]) / 2
+
+
+class EMAFilter:
+    """指数移动平均：y = y + alpha * (x - y)"""
+
+    name = 'ema'
+
+    def __init__(self, alpha: float = 0.3):
+        if not 0 < alpha <= 1:
+            raise ValueError(f"ema_alpha 必须在 (0, 1] 之间: {alpha}")
+        self.alpha = float(alpha)
+        self.reset()
+
+    def reset(self):
+        self._y: Optional[float] = None
+
+    def update(self, value: float, t: Optional[float] = None) -> float:
+        if self._y is None:
+            self._y = value
+        else:
+            self._y += self.alpha * (value - self._y)
+        return self._y
+
+
+class OneEuroFilter:
+    """
+    1€ 滤波（Casiez 等，CHI 2012）：截止频率随变化速度自适应，
+    cutoff = min_cutoff + beta * |平滑后的变化率|，静止时抑制抖动，转动时减小滞后
+    """
+
+    name = 'one_euro'
+
+    def __init__(self, min_cutoff: float = 1.0, beta: float = 0.5, d_cutoff: float = 1.0,
+                 default_dt: float = 0.1):
+        """
+        Args:
+            min_cutoff: 静止时的截止频率（Hz），越小越平滑
+            beta: 速度系数（1/V），越大转动时滞后越小
+            d_cutoff: 变化率的截止频率（Hz）
+            default_dt: 未提供采样时刻时使用的采样间隔（秒）
+        """
+        self.min_cutoff = float(min_cutoff)
+        self.beta = float(beta)
+        self.d_cutoff = float(d_cutoff)
+        self.default_dt = float(default_dt)
+        self.reset()
+
+    def reset(self):
+        self._x: Optional[float] = None
+        self._dx = 0.0
+        self._t: Optional[float] = None
+
+    @staticmethod
+    def _alpha(cutoff: float, dt: float) -> float:
+        tau = 1.0 / (2 * math.pi * cutoff)
+        return 1.0 / (1.0 + tau / dt)
+
+    def update(self, value: float, t: Optional[float] = None) -> float:
+        if self._x is None:
+            self._x, self._t = value, t
+            return value
+        dt = t - self._t if t is not None and self._t is not None else 0.0
+        if dt <= 0:
+            dt = self.default_dt
+        self._t = t
+        dx = (value - self._x) / dt
+        self._dx += self._alpha(self.d_cutoff, dt) * (dx - self._dx)
+        cutoff = self.min_cutoff + self.beta * abs(self._dx)
+        self._x += self._alpha(cutoff, dt) * (value - self._x)
+        return self._x
+
+
+class KalmanFilter:
+    """一维卡尔曼滤波：状态为电压（随机游走），process_noise 为每次采样的状态方差增量，measurement_noise 为读数方差"""
+
+    name = 'kalman'
+
+    def __init__(self, process_noise: float = 1e-4, measurement_noise: float = 4e-4):
+        if process_noise <= 0 or measurement_noise <= 0:
+            raise ValueError(f"kalman_process_noise / kalman_measurement_noise 必须大于 0: "
+                             f"{process_noise}, {measurement_noise}")
+        self.q = float(process_noise)
+        self.r = float(measurement_noise)
+        self.reset()
+
+    def reset(self):
+        self._x: Optional[float] = None
+        self._p = 1.0
+
+    def update(self, value: float, t: Optional[float] = None) -> float:
+        if self._x is None:
+            self._x, self._p = value, self.r
+            return value
+        p = self._p + self.q
+        k = p / (p + self.r)
+        self._x += k * (value - self._x)
+        self._p = (1 - k) * p
+        return self._x
+
+
+FILTERS = ('trimmed_mean', 'median', 'ema', 'one_euro', 'kalman')
+
+
+def create_filter(config: Dict[str, Any]):
+    """按配置创建滤波器（filter 为空时使用 trimmed_mean）"""
+    name = (config.get('filter') or 'trimmed_mean').strip().lower()
+    if name == 'trimmed_mean':
+        return TrimmedMeanFilter(config.get('stabilize_samples', 5))
+    if name == 'median':
+        return RunningMedianFilter(config.get('stabilize_samples', 5))
+    if name == 'ema':
+        return EMAFilter(config.get('ema_alpha', 0.3))
+    if name == 'one_euro':
+        return OneEuroFilter(config.get('one_euro_min_cutoff', 1.0), config.get('one_euro_beta', 0.5),
+                             config.get('one_euro_d_cutoff', 1.0), config.get('read_interval', 0.1))
+    if name == 'kalman':
+        return KalmanFilter(config.get('kalman_process_noise', 1e-4), config.get('kalman_measurement_noise', 4e-4))
+    raise ValueError(f"未知的滤波器: {name}（可选: {', '.join(FILTERS)}）")
@@ -12,28 +12,27 @@ import signal
 
 # 添加common模块路径
 sys.path.append(os.path.join(os.path.dirname(__file__), '..', '..', 'common'))
+import startup_profiler  # 先于其余模块导入，--profile-startup 时统计导入耗时
 
 from config import ConfigManager
 from publish import PotentiometerPublisher
-
-def setup_logging(level=logging.INFO):
-    """设置日志配置"""
-    logging.basicConfig(
-        level=level,
-        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-        handlers=[
-            logging.StreamHandler(),
-            logging.FileHandler('potentiometer.log', encoding='utf-8')
-        ]
-    )
+from log_setup import setup_logging, load_logging_config
 
 def signal_handler(signum, frame):
     """信号处理器"""
-    logging.info(f"收到信号 {signum}，正在退出...")
+    logging.info("收到信号 %s，正在退出...", signum)
     sys.exit(0)
 
+def create_module(config_file: str = "config.ini", **overrides) -> PotentiometerPublisher:
+    """创建发布者实例（供模块宿主以插件方式加载）"""
+    config_manager = ConfigManager(config_file)
+    config = config_manager.get_all_config()
+    config.update(overrides)
+    return PotentiometerPublisher(config, config_manager)
+
 def main():
     """主函数"""
+    profiler = startup_profiler.StartupProfiler('potentiometer', target='published')
     parser = argparse.ArgumentParser(
         description='电位器传感器 MQTT 发布者',
         formatter_class=argparse.RawDescriptionHelpFormatter,
@@ -44,6 +43,7 @@ def main():
   python potentiometer_pub.py --status          # 显示当前状态
   python potentiometer_pub.py --test            # 测试模式
   python potentiometer_pub.py --config config.ini # 使用指定配置文件
+  python potentiometer_pub.py --profile-startup # 分析启动耗时后退出
         """
     )
     
@@ -59,12 +59,16 @@ def main():
                        help='详细日志输出')
     parser.add_argument('--daemon', '-d', action='store_true',
                        help='后台运行模式')
+    parser.add_argument('--profile-startup', nargs='?', const=startup_profiler.DEFAULT_TIMEOUT, type=float,
+                       metavar='秒', help='输出各阶段启动耗时（到首次发布为止）后退出')
     
     args = parser.parse_args()
     
-    # 设置日志级别
-    log_level = logging.DEBUG if args.verbose else logging.INFO
-    setup_logging(log_level)
+    # 设置日志（[logging] 段），--verbose 时输出 DEBUG
+    log_config = load_logging_config(args.config)
+    if args.verbose:
+        log_config['level'] = logging.DEBUG
+    setup_logging(**log_config)
     
     # 注册信号处理器
     signal.signal(signal.SIGINT, signal_handler)
@@ -74,6 +78,7 @@ def main():
         # 加载配置
         config_manager = ConfigManager(args.config)
         config = config_manager.get_all_config()
+        profiler.mark('读取配置')
         
         # 创建发布者实例
         # 在校准模式下，跳过校准验证
@@ -82,6 +87,7 @@ def main():
             config['skip_calibration_check'] = True
             
         publisher = PotentiometerPublisher(config, config_manager)
+        profiler.mark('创建模块')
         
         if args.calibrate:
             # 校准模式
@@ -160,7 +166,7 @@ def main():
                 # 这里可以添加后台运行的逻辑
                 
             # 启动发布者
-            publisher.start()
+            profiler.run(publisher, publisher.start)
             
     except KeyboardInterrupt:
         logging.info("收到中断信号，正在退出...")
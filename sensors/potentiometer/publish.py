@@ -11,10 +11,14 @@ import time
 import threading
 from mqtt_base import EventPublisher
 from sensor import PotentiometerSensor
+from filters import FILTER_CONFIG
 
 class PotentiometerPublisher(EventPublisher):
     """电位器事件驱动发布者 - 统一数据格式"""
 
+    RELOADABLE_CONFIG = (EventPublisher.RELOADABLE_CONFIG | {'value_threshold', 'read_interval'}
+                         | {'alert_window', 'alert_timeout'} | set(FILTER_CONFIG))
+
     def __init__(self, config, config_manager=None):
         super().__init__(config)
 
@@ -25,18 +29,79 @@ class PotentiometerPublisher(EventPublisher):
         self.threshold = config.get('value_threshold', 2)
         self.read_interval = config.get('read_interval', 0.1)
 
+        # 比较器唤醒：窗口半宽（V，0 表示取变化阈值对应电压的一半）与无边沿时的最长等待（秒）
+        self.alert_window = config.get('alert_window', 0.0)
+        self.alert_timeout = config.get('alert_timeout', 60.0)
+        # 读数稳定判定：连续读数都落在 _quiet_anchor ± 窗口半宽内的次数
+        self._quiet_anchor = None
+        self._quiet_count = 0
+
         # 监控控制
         self.monitoring = True
         self.monitor_thread = None
 
+        self.metrics.counter_callback('potentiometer_adc_reads_total', 'ADS1115 读取次数', lambda: self.sensor.reads)
+        if self.sensor.alert is not None:
+            self.metrics.counter_callback('potentiometer_alert_wakeups_total',
+                                          '比较器模式下监控线程的唤醒次数（edge/outside/timeout）',
+                                          lambda: self.sensor.alert.stats, labelname='reason')
+
         logging.info("电位器发布者初始化完成")
 
+    def apply_config(self, changes):
+        """热加载变化阈值、采样间隔、滤波与比较器唤醒参数（监控线程下一次循环起生效）"""
+        super().apply_config(changes)
+        if 'value_threshold' in changes:
+            self.threshold = changes['value_threshold']
+        if 'read_interval' in changes:
+            self.read_interval = changes['read_interval']
+        if 'alert_window' in changes:
+            self.alert_window = changes['alert_window']
+        if 'alert_timeout' in changes:
+            self.alert_timeout = changes['alert_timeout']
+        if any(key in changes for key in FILTER_CONFIG):
+            # self.config 已合并本次变化
+            self.sensor.set_filter(self.config)
+
+    def _alert_half_width(self):
+        """比较器窗口半宽（V）：alert_window，未设置时取变化阈值对应电压的一半"""
+        if self.alert_window > 0:
+            return self.alert_window
+        sensor = self.sensor
+        value_range = sensor.max_value - sensor.min_value
+        return self.threshold * (sensor.max_voltage - sensor.min_voltage) / value_range / 2 if value_range else 0.0
+
+    def _settled(self, data, half_width):
+        """
+        旋钮是否已停止：连续 stabilize_samples 次读数都在窗口内，且滤波输出已跟上读数
+        （停下后滤波器还在收敛时继续采样，避免最终位置没有发布）
+        """
+        voltage = data['voltage']
+        if (self._quiet_anchor is None or abs(voltage - self._quiet_anchor) > half_width
+                or abs(data['stable_voltage'] - voltage) > half_width):
+            self._quiet_anchor = voltage
+            self._quiet_count = 0
+            return False
+        self._quiet_count += 1
+        return self._quiet_count >= self.config.get('stabilize_samples', 5)
+
+    def _wait_for_knob(self, data, half_width):
+        """比较器模式：旋钮停止后阻塞到电压离开窗口（ALERT/RDY 边沿）或 alert_timeout 超时"""
+        reason = self.sensor.wait_for_change(data['voltage'], half_width, self.alert_timeout)
+        logging.debug("电位器监控唤醒: %s", reason)
+        if reason != 'timeout':
+            # 超时唤醒时读数多半仍在窗口内，保留稳定状态，下一次读数后直接重新等待
+            self._quiet_anchor = None
+            self._quiet_count = 0
+
     def start_monitoring(self):
         """启动后台监控线程"""
         def monitor():
-            logging.info("电位器监控线程已启动")
+            mode = f"比较器唤醒（GPIO {self.sensor.alert.pin}）" if self.sensor.alert is not None else "轮询"
+            logging.info(f"电位器监控线程已启动（{mode}）")
 
             while self.monitoring and self.running:
+                data = None
                 try:
                     # 读取电位器数据
                     data = self.sensor.read_potentiometer()
@@ -44,20 +109,30 @@ class PotentiometerPublisher(EventPublisher):
                     if data:
                         # 检查是否有显著变化
                         if self.sensor.has_significant_change(data['value'], self.threshold):
+                            trace = self.tracer.start(self.sensor_type)
                             # 构建标准化的电位器数据
                             potentiometer_data = {
                                 "value": data['value']
                             }
                             
                             # 发布传感器数据
-                            self.publish_sensor_data(potentiometer_data, retain=True)
-                            logging.info(f"电位器值变化: {data['value']}%")
+                            self.publish_sensor_data(potentiometer_data, retain=True, trace=trace)
+                            logging.debug("电位器值变化: %s%%", data['value'])
                     else:
                         logging.warning("读取电位器数据失败")
 
                 except Exception as e:
                     logging.error(f"监控电位器时发生错误: {e}")
 
+                if data and self.sensor.alert is not None:
+                    try:
+                        half_width = self._alert_half_width()
+                        if self._settled(data, half_width):
+                            self._wait_for_knob(data, half_width)
+                            continue
+                    except Exception as e:
+                        logging.error(f"等待比较器唤醒时发生错误: {e}")
+
                 time.sleep(self.read_interval)
 
             logging.info("电位器监控线程已停止")
@@ -87,15 +162,9 @@ class PotentiometerPublisher(EventPublisher):
     def cleanup_sensor(self):
         """清理传感器 - 重写父类方法"""
         self.monitoring = False
+        self.sensor.cleanup()
         logging.info("电位器监控已停止")
 
     def start(self):
         """启动发布者 - 使用父类的标准实现"""
         super().start()
-
-def setup_logging() -> None:
-    """设置日志"""
-    logging.basicConfig(
-        level=logging.INFO,
-        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
-    )
\ No newline at end of file
@@ -8,19 +8,24 @@
 import time
 import logging
 from typing import Dict, Any, Optional
-from collections import deque
+
+from lazy_import import lazy_import
+from filters import create_filter
+from alert import ADS1115Alert
 
 try:
-    import board
-    import busio
-    import adafruit_ads1x15.ads1115 as ADS
-    from adafruit_ads1x15.analog_in import AnalogIn
+    # 硬件库导入较慢，初始化 ADS1115 时才加载
+    board = lazy_import('board')
+    busio = lazy_import('busio')
+    ADS = lazy_import('adafruit_ads1x15.ads1115')
+    analog_in = lazy_import('adafruit_ads1x15.analog_in')
 except ImportError as e:
     logging.warning(f"ADS1115库导入失败: {e}，使用模拟模式")
     
     # 模拟模式用于开发测试
     class MockAnalogIn:
         def __init__(self, ads, channel):
+            self.ads = ads
             self.channel = channel
             self._voltage = 2.5  # 模拟中间值
             
@@ -33,7 +38,7 @@ except ImportError as e:
             
         @property
         def value(self):
-            return int(self.voltage / 5.0 * 65535)
+            return int(self.voltage / PGA_RANGE[self.ads.gain] * 32767)
     
     class MockADS:
         def __init__(self, i2c, address=0x48):
@@ -63,13 +68,20 @@ except ImportError as e:
         def I2C(scl, sda):
             return "mock_i2c"
     
-    AnalogIn = MockAnalogIn
+    # 创建模拟analog_in模块
+    class MockAnalogInModule:
+        AnalogIn = MockAnalogIn
+    
+    analog_in = MockAnalogInModule
     ADS = MockADSModule
     board = MockBoard
     busio = MockBusio
 
 logger = logging.getLogger(__name__)
 
+# ADS1115 各增益对应的满量程电压（V），转换结果 32767 对应满量程
+PGA_RANGE = {2/3: 6.144, 1: 4.096, 2: 2.048, 4: 1.024, 8: 0.512, 16: 0.256}
+
 class PotentiometerSensor:
     """电位器传感器类（基于ADS1115）"""
     
@@ -92,9 +104,13 @@ class PotentiometerSensor:
         self.max_value = config.get('max_value', 100)
         self.stabilize_samples = config.get('stabilize_samples', 5)
         
-        # 历史值缓存用于稳定性处理
-        self.voltage_history = deque(maxlen=self.stabilize_samples)
+        # 电压滤波器（filter 配置项，默认为窗口去极值平均），单次采样开销与窗口长度无关
+        self.filter = create_filter(config)
         self.last_value = None
+        # ADS1115 读取次数（每次采样一次 I2C 读取）
+        self.reads = 0
+        # 比较器唤醒（alert_pin 配置项，可选）
+        self.alert: Optional[ADS1115Alert] = None
         
         # 🔥 关键：检查校准状态，拒绝无效值
         # 在校准模式下跳过校准验证
@@ -134,13 +150,22 @@ class PotentiometerSensor:
             if self.channel not in channel_map:
                 raise ValueError(f"无效的通道号: {self.channel}")
                 
-            self.ads_channel = AnalogIn(ads, channel_map[self.channel])
+            self.ads_channel = analog_in.AnalogIn(ads, channel_map[self.channel])
+            self.full_scale = PGA_RANGE[ads.gain]
             
             logger.info(f"ADS1115初始化成功，增益: {ads.gain}x")
             
         except Exception as e:
             logger.error(f"ADS1115初始化失败: {e}")
             raise
+        
+        alert_pin = str(config.get('alert_pin', '')).strip()
+        if alert_pin:
+            try:
+                pin = int(alert_pin) if alert_pin.isdigit() else alert_pin
+                self.alert = ADS1115Alert(ads, self.ads_channel, pin, config.get('alert_data_rate', 128))
+            except Exception as e:
+                logger.warning(f"比较器唤醒不可用，改为按 read_interval 轮询: {e}")
     
     def read_raw_data(self) -> Dict[str, Any]:
         """
@@ -150,8 +175,10 @@ class PotentiometerSensor:
             包含原始ADC值和电压的字典
         """
         try:
-            voltage = self.ads_channel.voltage
+            # 只读一次转换结果，电压按增益换算（AnalogIn.voltage 会再读一次）
             raw_value = self.ads_channel.value
+            voltage = raw_value * self.full_scale / 32767
+            self.reads += 1
             
             return {
                 'voltage': round(voltage, 3),
@@ -173,17 +200,27 @@ class PotentiometerSensor:
         Returns:
             稳定后的电压值
         """
-        self.voltage_history.append(voltage)
-        
-        if len(self.voltage_history) < self.stabilize_samples:
-            return voltage
-            
-        # 计算平均值，去除异常值
-        sorted_values = sorted(self.voltage_history)
-        # 去掉最高和最低值，取平均
-        stable_values = sorted_values[1:-1] if len(sorted_values) > 2 else sorted_values
+        return self.filter.update(voltage, time.monotonic())
+    
+    def set_filter(self, config: Dict[str, Any]):
+        """按配置更换滤波器（热加载），历史读数不保留"""
+        self.filter = create_filter(config)
+        logger.info(f"电压滤波器已切换为 {self.filter.name}")
+    
+    def wait_for_change(self, voltage: float, half_width: float, timeout: float) -> str:
+        """
+        比较器模式：阻塞到电压离开 voltage ± half_width（V）或超时
         
-        return sum(stable_values) / len(stable_values)
+        Returns:
+            唤醒原因（edge / outside / timeout / closed）
+        """
+        scale = 32767 / self.full_scale
+        return self.alert.wait_outside(round(voltage * scale), max(1, round(half_width * scale)), timeout)
+    
+    def cleanup(self):
+        """释放比较器唤醒引脚"""
+        if self.alert is not None:
+            self.alert.close()
     
     def voltage_to_value(self, voltage: float) -> int:
         """
@@ -228,6 +265,8 @@ class PotentiometerSensor:
         
         return {
             'value': value,
+            'voltage': raw_data['voltage'],
+            'stable_voltage': stable_voltage,
             'timestamp': raw_data['timestamp']
         }
     
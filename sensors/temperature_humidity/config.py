@@ -5,51 +5,30 @@
 """
 
 import os
-import configparser
-from typing import Dict, Any
+import sys
 
-class ConfigManager:
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', '..', 'common'))
+from config_store import ConfigManager as BaseConfigManager, MQTT_COMMON, MQTT_PUBLISHER, Option, Schema
+
+SCHEMA = Schema('temperature_humidity', MQTT_COMMON + MQTT_PUBLISHER + (
+    Option('publish_interval', 'mqtt', type=int),
+    # DHT22传感器配置
+    Option('pin', 'dht22', type=int),
+    Option('sensor_type', 'dht22'),
+    Option('retry_count', 'dht22', type=int),
+    Option('retry_delay', 'dht22', type=int),
+    # 后台采样与死区发布
+    Option('sampler', 'dht22', type=bool, default=False),
+    Option('sample_interval', 'dht22', type=float, default=2.0),
+    Option('median_window', 'dht22', type=int, default=5),
+    Option('max_temperature_jump', 'dht22', type=float, default=2.0),
+    Option('max_humidity_jump', 'dht22', type=float, default=10.0),
+    Option('temperature_deadband', 'dht22', type=float, default=0.2),
+    Option('humidity_deadband', 'dht22', type=float, default=1.0),
+))
+
+
+class ConfigManager(BaseConfigManager):
     """配置管理器"""
-    
-    def __init__(self, config_file: str = "config.ini"):
-        """
-        初始化配置管理器
-        
-        Args:
-            config_file: 配置文件路径
-        """
-        self.config_file = config_file
-        self.config = configparser.ConfigParser()
-        self.load_config()
-    
-    def load_config(self) -> None:
-        """加载配置文件"""
-        if not os.path.exists(self.config_file):
-            raise FileNotFoundError(f"配置文件不存在: {self.config_file}")
-        
-        self.config.read(self.config_file, encoding='utf-8')
-    
-    def get_mqtt_config(self) -> Dict[str, Any]:
-        """获取MQTT配置"""
-        return {
-            'mqtt_broker': self.config.get('mqtt', 'broker'),
-            'mqtt_port': self.config.getint('mqtt', 'port'),
-            'topic_prefix': self.config.get('mqtt', 'topic_prefix'),
-            'publish_interval': self.config.getint('mqtt', 'publish_interval')
-        }
-    
-    def get_dht22_config(self) -> Dict[str, Any]:
-        """获取DHT22传感器配置"""
-        return {
-            'pin': self.config.getint('dht22', 'pin'),
-            'sensor_type': self.config.get('dht22', 'sensor_type'),
-            'retry_count': self.config.getint('dht22', 'retry_count'),
-            'retry_delay': self.config.getint('dht22', 'retry_delay')
-        }
-    
-    def get_all_config(self) -> Dict[str, Any]:
-        """获取所有配置"""
-        config = {}
-        config.update(self.get_mqtt_config())
-        config.update(self.get_dht22_config())
-        return config 
\ No newline at end of file
+
+    SCHEMA = SCHEMA
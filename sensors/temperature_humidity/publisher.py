@@ -7,7 +7,8 @@ DHT22发布者模块
 import logging
 import sys
 import os
-from typing import Dict, Any
+import threading
+from typing import Dict, Any, Optional
 import time
 
 # 添加common目录到路径
@@ -15,12 +16,16 @@ sys.path.append(os.path.join(os.path.dirname(__file__), '..', '..', 'common'))
 
 from mqtt_base import PeriodicPublisher
 from sensor import DHT22Sensor
+from sampler import DHT22Sampler, MIN_SAMPLE_INTERVAL
 
 logger = logging.getLogger(__name__)
 
 class DHT22Publisher(PeriodicPublisher):
     """DHT22温湿度传感器发布者 - 统一数据格式"""
 
+    RELOADABLE_CONFIG = PeriodicPublisher.RELOADABLE_CONFIG | {
+        'retry_count', 'retry_delay', 'sample_interval', 'temperature_deadband', 'humidity_deadband'}
+
     def __init__(self, config: Dict[str, Any]):
         """
         初始化发布者
@@ -39,27 +44,116 @@ class DHT22Publisher(PeriodicPublisher):
         }
 
         self.sensor = DHT22Sensor(sensor_config)
-        
+
+        # 后台采样（可选）：采样线程按传感器允许的最高频率读取并做中位数滤波，
+        # 温度或湿度相对上次发布的变化超过死区时立即发布；publish_interval 内没有发布时按心跳补发一次
+        self.sampler: Optional[DHT22Sampler] = None
+        self.temperature_deadband = config.get('temperature_deadband', 0.2)
+        self.humidity_deadband = config.get('humidity_deadband', 1.0)
+        self._last_published: Optional[Dict[str, float]] = None
+        self._last_published_at: Optional[float] = None
+        self._publish_lock = threading.Lock()
+        if config.get('sampler', False):
+            self.sampler = DHT22Sampler(
+                self.sensor,
+                sample_interval=config.get('sample_interval', 2.0),
+                window=config.get('median_window', 5),
+                max_temperature_jump=config.get('max_temperature_jump', 2.0),
+                max_humidity_jump=config.get('max_humidity_jump', 10.0),
+                on_sample=self._on_sample,
+            )
+            self.metrics.counter_callback('dht22_samples_total', 'DHT22 采样次数（accepted/failed/out_of_range/outlier）',
+                                          lambda: self.sampler.stats, labelname='result')
+            self.metrics.gauge_callback('dht22_sample_age_seconds', '最近一次有效读数距今的秒数', self.sampler.age)
+            # 心跳只读取采样线程的最新结果，不会阻塞，直接在调度线程中执行
+            self.blocking_cycle = False
+
         logger.info("DHT22发布者初始化完成")
 
     def publish_cycle(self):
         """发布周期 - 实现具体的DHT22数据发布逻辑"""
+        if self.sampler is not None:
+            self._publish_heartbeat()
+            return
         # 读取传感器数据
         data = self.sensor.read()
 
         if data:
-            # 直接使用传感器数据
-            self.publish_sensor_data(data, retain=True)
+            # 直接使用传感器数据；追踪从读数完成时开始（DHT22 读取本身可能耗时数秒）
+            trace = self.tracer.start(self.sensor_type)
+            self.publish_sensor_data(data, retain=True, trace=trace)
             logger.info(f"已发布温湿度数据: 温度={data['temperature']}°C, 湿度={data['humidity']}%")        
         else:
             logger.warning("跳过本次发布，传感器数据读取失败")
 
+    def next_cycle_delay(self) -> float:
+        """后台采样时按上次发布时刻安排心跳：变化触发的发布推迟下一次心跳"""
+        if self.sampler is None or self._last_published_at is None:
+            return self.publish_interval
+        return max(0.0, self._last_published_at + self.publish_interval - time.monotonic())
+
+    def _on_sample(self, data: Dict[str, float]):
+        """采样线程回调：变化超过死区时立即发布"""
+        with self._publish_lock:
+            last = self._last_published
+            if last is not None and \
+                    abs(data['temperature'] - last['temperature']) < self.temperature_deadband and \
+                    abs(data['humidity'] - last['humidity']) < self.humidity_deadband:
+                return
+            self._publish_sample(data, 'change')
+        # 心跳从本次发布起重新计时
+        self.reschedule_cycle()
+
+    def _publish_heartbeat(self):
+        """心跳：publish_interval 内没有发布时补发最近一次有效读数"""
+        with self._publish_lock:
+            # 只跳过刚因变化发布过的周期；按时到来的心跳与上次发布的间隔会因调度误差略小于 publish_interval
+            if self._last_published_at is not None and \
+                    time.monotonic() - self._last_published_at < self.publish_interval * 0.9:
+                return
+            data = self.sampler.latest()
+            if data is None:
+                logger.info("等待传感器的首个有效读数")
+                return
+            # 长时间没有有效读数时不补发旧值
+            if self.sampler.age() > max(self.publish_interval, 10 * self.sampler.sample_interval):
+                logger.warning("跳过本次发布，传感器长时间没有有效读数")
+                return
+            self._publish_sample(data, 'heartbeat')
+
+    def _publish_sample(self, data: Dict[str, float], reason: str):
+        """发布滤波后的读数（调用方持有 _publish_lock）"""
+        trace = self.tracer.start(self.sensor_type)
+        self.publish_sensor_data(data, retain=True, trace=trace)
+        self._last_published = data
+        self._last_published_at = time.monotonic()
+        logger.info(f"已发布温湿度数据（{'变化' if reason == 'change' else '心跳'}）: "
+                    f"温度={data['temperature']}°C, 湿度={data['humidity']}%")
+
+    def apply_config(self, changes: Dict[str, Any]):
+        """热加载重试、采样间隔与死区参数"""
+        super().apply_config(changes)
+        if 'retry_count' in changes:
+            self.sensor.retry_count = changes['retry_count']
+        if 'retry_delay' in changes:
+            self.sensor.retry_delay = changes['retry_delay']
+        if 'temperature_deadband' in changes:
+            self.temperature_deadband = changes['temperature_deadband']
+        if 'humidity_deadband' in changes:
+            self.humidity_deadband = changes['humidity_deadband']
+        if 'sample_interval' in changes and self.sampler is not None:
+            self.sampler.sample_interval = max(MIN_SAMPLE_INTERVAL, float(changes['sample_interval']))
+
     def init_sensor(self):
         """初始化传感器 - 重写父类方法"""
+        if self.sampler is not None:
+            self.sampler.start()
         logger.info("DHT22传感器已初始化")
 
     def cleanup_sensor(self):
         """清理传感器 - 重写父类方法"""
+        if self.sampler is not None:
+            self.sampler.stop()
         logger.info("DHT22传感器已清理")
 
     def start(self):
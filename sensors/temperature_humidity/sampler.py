@@ -0,0 +1,170 @@
+# -*- coding: utf-8 -*-
+"""
+DHT22 后台采样
+独立线程按传感器允许的最高频率（两次读取间隔不少于 2 秒）读取，读数经滤波后交给发布者：
+- 超出量程（-40~80°C、0~100%RH）或校验失败的读数直接丢弃
+- 与滑动窗口中位数相差超过 max_temperature_jump / max_humidity_jump 的读数视为毛刺丢弃；
+  连续 window 次都被判为毛刺时认为是真实的突变，清空窗口重新开始
+- 对外提供窗口中位数
+按固定时刻表采样（time.monotonic()），单次读取失败不影响下一次采样的时间。
+"""
+
+import collections
+import logging
+import threading
+import time
+from typing import Any, Callable, Deque, Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# DHT22 两次读取的最小间隔（秒），更快读取时 adafruit_dht 直接返回上一次的数值
+MIN_SAMPLE_INTERVAL = 2.0
+# DHT22 量程
+TEMPERATURE_RANGE = (-40.0, 80.0)
+HUMIDITY_RANGE = (0.0, 100.0)
+
+
+def _median(values) -> float:
+    ordered = sorted(values)
+    mid = len(ordered) // 2
+    return ordered[mid] if len(ordered) % 2 else (ordered[mid - 1] + ordered[mid]) / 2
+
+
+class MedianFilter:
+    """温湿度滑动中位数滤波（带毛刺剔除）"""
+
+    def __init__(self, window: int = 5, max_temperature_jump: float = 2.0, max_humidity_jump: float = 10.0):
+        """
+        Args:
+            window: 窗口长度（读数个数）
+            max_temperature_jump: 与中位数相差超过该值（°C）的温度读数视为毛刺，0 表示不剔除
+            max_humidity_jump: 与中位数相差超过该值（%RH）的湿度读数视为毛刺，0 表示不剔除
+        """
+        self.window = max(1, int(window))
+        self.max_temperature_jump = float(max_temperature_jump)
+        self.max_humidity_jump = float(max_humidity_jump)
+        self._samples: Deque[Tuple[float, float]] = collections.deque(maxlen=self.window)
+        # 连续被判为毛刺的次数
+        self._rejected_run = 0
+
+    def _median(self) -> Tuple[float, float]:
+        return (_median(t for t, _ in self._samples), _median(h for _, h in self._samples))
+
+    def _is_outlier(self, temperature: float, humidity: float) -> bool:
+        # 窗口内少于 3 个读数时中位数不可靠，不做剔除
+        if len(self._samples) < 3:
+            return False
+        median_t, median_h = self._median()
+        return ((self.max_temperature_jump > 0 and abs(temperature - median_t) > self.max_temperature_jump) or
+                (self.max_humidity_jump > 0 and abs(humidity - median_h) > self.max_humidity_jump))
+
+    def add(self, temperature: float, humidity: float) -> Optional[Tuple[float, float]]:
+        """
+        加入一个读数
+
+        Returns:
+            (温度中位数, 湿度中位数)；读数被判为毛刺时返回 None
+        """
+        if self._is_outlier(temperature, humidity):
+            self._rejected_run += 1
+            if self._rejected_run < self.window:
+                return None
+            # 持续偏离：真实突变（如传感器被移动），以新读数重新开始
+            logger.info(f"DHT22读数持续偏离 {self._rejected_run} 次，重置滤波窗口")
+            self._samples.clear()
+        self._rejected_run = 0
+        self._samples.append((temperature, humidity))
+        return self._median()
+
+
+class DHT22Sampler:
+    """DHT22 后台采样线程"""
+
+    def __init__(self, sensor, sample_interval: float = MIN_SAMPLE_INTERVAL, window: int = 5,
+                 max_temperature_jump: float = 2.0, max_humidity_jump: float = 10.0,
+                 on_sample: Optional[Callable[[Dict[str, Any]], None]] = None):
+        """
+        Args:
+            sensor: DHT22Sensor
+            sample_interval: 采样间隔（秒），不小于 2 秒
+            window: 中位数窗口长度
+            max_temperature_jump / max_humidity_jump: 毛刺判定阈值，见 MedianFilter
+            on_sample: 每得到一个滤波后的读数时在采样线程中调用 on_sample(读数)
+        """
+        self.sensor = sensor
+        self.sample_interval = max(MIN_SAMPLE_INTERVAL, float(sample_interval))
+        self.filter = MedianFilter(window, max_temperature_jump, max_humidity_jump)
+        self.on_sample = on_sample
+        self._latest: Optional[Dict[str, Any]] = None
+        self._latest_at: Optional[float] = None
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        # 采样结果计数（运行指标）：accepted 通过滤波，failed 读取失败（校验错误、超时），
+        # out_of_range 超出量程，outlier 被判为毛刺
+        self.stats = {'accepted': 0, 'failed': 0, 'out_of_range': 0, 'outlier': 0}
+
+    def start(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name='dht22-sampler', daemon=True)
+        self._thread.start()
+        logger.info(f"DHT22后台采样已启动，采样间隔 {self.sample_interval:g} 秒，"
+                    f"中位数窗口 {self.filter.window}")
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5.0)
+            self._thread = None
+
+    def latest(self) -> Optional[Dict[str, Any]]:
+        """最近一次滤波后的读数（副本），尚无读数时返回 None"""
+        with self._lock:
+            return dict(self._latest) if self._latest is not None else None
+
+    def age(self) -> Optional[float]:
+        """最近一次滤波后读数距今的秒数，尚无读数时返回 None"""
+        with self._lock:
+            return time.monotonic() - self._latest_at if self._latest_at is not None else None
+
+    def _run(self):
+        next_at = time.monotonic()
+        while not self._stop.is_set():
+            self.sample_once()
+            # 固定时刻表：读取耗时不累积；读取超时导致错过的采样点直接跳过
+            next_at += self.sample_interval
+            now = time.monotonic()
+            if next_at < now:
+                next_at = now + self.sample_interval
+            self._stop.wait(next_at - now)
+
+    def sample_once(self) -> Optional[Dict[str, Any]]:
+        """读取一次并滤波，返回滤波后的读数（读取失败或被剔除时返回 None）"""
+        data = self.sensor.read_once()
+        if data is None:
+            self.stats['failed'] += 1
+            return None
+        temperature, humidity = data['temperature'], data['humidity']
+        if not (TEMPERATURE_RANGE[0] <= temperature <= TEMPERATURE_RANGE[1] and
+                HUMIDITY_RANGE[0] <= humidity <= HUMIDITY_RANGE[1]):
+            self.stats['out_of_range'] += 1
+            logger.warning(f"DHT22读数超出量程，已丢弃: {data}")
+            return None
+        filtered = self.filter.add(temperature, humidity)
+        if filtered is None:
+            self.stats['outlier'] += 1
+            logger.debug("DHT22读数偏离中位数，已丢弃: %s", data)
+            return None
+        self.stats['accepted'] += 1
+        sample = {'temperature': round(filtered[0], 2), 'humidity': round(filtered[1], 2)}
+        with self._lock:
+            self._latest = sample
+            self._latest_at = time.monotonic()
+        if self.on_sample is not None:
+            try:
+                self.on_sample(dict(sample))
+            except Exception as e:
+                logger.error(f"处理DHT22采样结果时发生错误: {e}")
+        return sample
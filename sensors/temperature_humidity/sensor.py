@@ -4,11 +4,15 @@ DHT22传感器模块（基于adafruit-circuitpython-dht）
 """
 
 import time
-import board
-import adafruit_dht
 import logging
 from typing import Dict, Any, Optional
 
+from lazy_import import lazy_import
+
+# 硬件库导入较慢，创建传感器时才加载
+board = lazy_import('board')
+adafruit_dht = lazy_import('adafruit_dht')
+
 logger = logging.getLogger(__name__)
 
 class DHT22Sensor:
@@ -55,6 +59,25 @@ class DHT22Sensor:
         logger.error("所有重试都失败了，无法读取传感器数据")
         return None
 
+    def read_once(self) -> Optional[Dict[str, float]]:
+        """
+        单次读取（不重试、不等待），供后台采样线程按固定间隔调用；
+        校验失败、超时等读取错误返回 None
+        """
+        try:
+            temperature = self.sensor.temperature
+            humidity = self.sensor.humidity
+        except RuntimeError as e:
+            # DHT22 偶发校验错误或超时，下一次采样重读即可
+            logger.debug("读取传感器数据时发生错误: %s", e)
+            return None
+        except Exception as e:
+            logger.error(f"读取传感器数据时发生致命错误: {e}")
+            return None
+        if temperature is None or humidity is None:
+            return None
+        return {'temperature': round(temperature, 2), 'humidity': round(humidity, 2)}
+
     def exit(self):
         """释放传感器资源"""
         try:
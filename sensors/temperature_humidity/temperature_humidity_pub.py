@@ -5,34 +5,41 @@
 """
 
 import logging
+import os
 import sys
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', '..', 'common'))
+import startup_profiler  # 先于其余模块导入，--profile-startup 时统计导入耗时
 from typing import Dict, Any
 
 from config import ConfigManager
 from publisher import DHT22Publisher
+from log_setup import setup_logging, load_logging_config
 
-def setup_logging() -> None:
-    """设置日志配置"""
-    logging.basicConfig(
-        level=logging.INFO,
-        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
-    )
+def create_module(config_file: str = "config.ini", **overrides) -> DHT22Publisher:
+    """创建发布者实例（供模块宿主以插件方式加载）"""
+    config = ConfigManager(config_file).get_all_config()
+    config.update(overrides)
+    return DHT22Publisher(config)
 
 def main():
     """主函数"""
+    profiler = startup_profiler.StartupProfiler('temperature_humidity', target='published')
     try:
         # 加载配置
         config_manager = ConfigManager()
         config = config_manager.get_all_config()
         
         # 设置日志
-        setup_logging()
+        setup_logging(**load_logging_config(config_manager.config_file))
         logger = logging.getLogger(__name__)
+        profiler.mark('读取配置')
         
         logger.info("启动温湿度传感器发布者...")
         
         # 创建发布者实例
         publisher = DHT22Publisher(config)
+        profiler.mark('创建模块')
         
         # 显示状态信息
         status = publisher.get_status()
@@ -40,7 +47,7 @@ def main():
         logger.info(f"MQTT配置: {status['mqtt_config']}")
         
         # 运行发布者
-        publisher.start()
+        profiler.run(publisher, publisher.start)
         
     except FileNotFoundError as e:
         print(f"配置文件错误: {e}")
@@ -0,0 +1,162 @@
+# -*- coding: utf-8 -*-
+"""
+端到端延迟报告
+订阅各模块发布的 span（trace/#），或读取保存的 JSONL 文件，按“起点 → 输出”统计延迟分位数，
+例如 pir_motion → oled.render（运动到像素）、button → audio.play（按键到声音）。
+
+用法:
+    python3 trace_report.py --broker localhost --duration 300 --save spans.jsonl
+    python3 trace_report.py --input spans.jsonl
+"""
+
+import argparse
+import json
+import math
+import os
+import sys
+import time
+from collections import defaultdict
+from typing import Any, Dict, Iterable, List, Optional
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'common'))
+
+
+def collect(broker: str, port: int, topic: str, duration: float) -> List[Dict[str, Any]]:
+    """从代理订阅 span 记录，持续 duration 秒（Ctrl+C 提前结束）"""
+    import paho.mqtt.client as mqtt
+    from payload_codec import CodecSelector
+
+    codecs = CodecSelector()
+    spans: List[Dict[str, Any]] = []
+
+    def on_connect(client, userdata, flags, rc):
+        if rc == 0:
+            client.subscribe(topic, qos=0)
+
+    def on_message(client, userdata, msg):
+        try:
+            record = codecs.decode(msg.topic, msg.payload)
+        except Exception:
+            return
+        if isinstance(record, dict) and record.get('trace_id'):
+            spans.append(record)
+
+    client = mqtt.Client()
+    client.on_connect = on_connect
+    client.on_message = on_message
+    client.connect(broker, port, 60)
+    client.loop_start()
+    print(f"正在收集 {topic} 上的 span，{duration:.0f} 秒后输出报告（Ctrl+C 提前结束）...", file=sys.stderr)
+    try:
+        time.sleep(duration)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        client.loop_stop()
+        client.disconnect()
+    return spans
+
+
+def load(path: str) -> List[Dict[str, Any]]:
+    with open(path, encoding='utf-8') as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def save(path: str, spans: Iterable[Dict[str, Any]]):
+    with open(path, 'w', encoding='utf-8') as f:
+        for span in spans:
+            f.write(json.dumps(span, ensure_ascii=False) + '\n')
+
+
+def offset(span: Dict[str, Any]) -> Optional[float]:
+    """span 结束时刻相对追踪起点的延迟（秒）
+
+    与起点同一主机时用单调时钟（不受对时影响），跨主机时退回墙钟。
+    """
+    if span.get('host') == span.get('trace_host') and span.get('m0') is not None:
+        return span['end'] - span['m0']
+    if span.get('t0') is not None and span.get('wall') is not None:
+        return span['wall'] - span['t0']
+    return None
+
+
+def percentile(values: List[float], q: float) -> float:
+    """最近秩法分位数"""
+    ordered = sorted(values)
+    index = max(0, math.ceil(q / 100.0 * len(ordered)) - 1)
+    return ordered[index]
+
+
+def build_report(spans: List[Dict[str, Any]]) -> Dict[str, Dict[str, Any]]:
+    """
+    汇总延迟
+
+    Returns:
+        {"起点 → 输出": {'latencies': [...], 'hops': {span名: [...]}}}
+    """
+    traces: Dict[str, List[Dict[str, Any]]] = defaultdict(list)
+    for span in spans:
+        traces[span['trace_id']].append(span)
+
+    report: Dict[str, Dict[str, Any]] = {}
+    for trace_spans in traces.values():
+        origin = trace_spans[0].get('origin') or '?'
+        # 每个输出只取最早的一次（同一事件可能触发多次刷新）
+        outputs: Dict[str, float] = {}
+        for span in trace_spans:
+            value = offset(span)
+            if span.get('kind') == 'output' and value is not None:
+                outputs[span['name']] = min(value, outputs.get(span['name'], value))
+        for output, latency in outputs.items():
+            entry = report.setdefault(f"{origin} → {output}", {'latencies': [], 'hops': defaultdict(list)})
+            entry['latencies'].append(latency)
+            for span in trace_spans:
+                value = offset(span)
+                # 开始于输出之前的环节（包含记录输出的那个处理器）
+                if (span.get('kind') != 'output' and value is not None
+                        and value - (span['end'] - span['start']) <= latency):
+                    entry['hops'][f"{span.get('module')}/{span['name']}"].append(value)
+    return report
+
+
+def format_ms(seconds: float) -> str:
+    return f"{seconds * 1000:8.1f}"
+
+
+def print_report(report: Dict[str, Dict[str, Any]]):
+    if not report:
+        print("没有完整的追踪（请确认起点传感器与输出模块都开启了 tracing）")
+        return
+    print(f"{'链路':<36}{'次数':>6}{'p50(ms)':>10}{'p99(ms)':>10}{'max(ms)':>10}")
+    for name, entry in sorted(report.items()):
+        values = entry['latencies']
+        print(f"{name:<36}{len(values):>6}{format_ms(percentile(values, 50)):>10}"
+              f"{format_ms(percentile(values, 99)):>10}{format_ms(max(values)):>10}")
+        # 各环节完成时刻相对起点的中位数，按先后排序，便于定位耗时集中在哪一跳
+        hops = sorted(entry['hops'].items(), key=lambda item: percentile(item[1], 50))
+        for hop, hop_values in hops:
+            print(f"    {hop:<48}p50 {format_ms(percentile(hop_values, 50))} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='端到端延迟报告')
+    parser.add_argument('--broker', default='localhost', help='MQTT代理地址')
+    parser.add_argument('--port', type=int, default=1883, help='MQTT代理端口')
+    parser.add_argument('--topic', default='trace/#', help='span 主题')
+    parser.add_argument('--duration', type=float, default=60.0, help='收集时长（秒）')
+    parser.add_argument('--input', help='读取保存的 span 文件（JSONL），不连接代理')
+    parser.add_argument('--save', help='把收集到的 span 保存为 JSONL')
+    args = parser.parse_args()
+
+    if args.input:
+        spans = load(args.input)
+    else:
+        spans = collect(args.broker, args.port, args.topic, args.duration)
+        if args.save:
+            save(args.save, spans)
+    print(f"共 {len(spans)} 个 span", file=sys.stderr)
+    print_report(build_report(spans))
+
+
+if __name__ == '__main__':
+    main()